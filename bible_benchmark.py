@@ -0,0 +1,430 @@
+"""
+Benchmarks for looking up passages from the user's bible. A synthetic bible of realistic size (the 1,189 chapters of
+the canon with about as many verses and words as an English translation) is generated in Zefania, OSIS, or USFM
+format, then the time taken to compile it, to open it cold, and to look up single verses, long ranges, and references
+of several passages is measured, along with the memory used. Each lookup is timed both through the compiled index
+(BibleIndex and GetScripture) and through the ElementTree approach the program used before the index, which parses the
+whole document and walks it for every passage.
+
+Run from the program's folder:
+
+    python bible_benchmark.py [--format zefania|osis|usfm] [--scale 1.0] [--lookups 200] [--save results.json]
+        [--compare results.json]
+
+With --compare, any timing more than --tolerance percent slower than the saved results is reported as a regression
+and the benchmark exits with a non-zero status.
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from statistics import median
+from types import SimpleNamespace
+
+from bible_formats import OSIS_BOOKS, USFM_BOOKS, detect_format
+from bible_index import BibleIndex
+from get_scripture import GetScripture
+from scripture_reference import BOOKS, CHAPTER_COUNTS, format_reference, parse_reference, split_ordinal, \
+    verse_ordinal
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# a vocabulary in the rough proportions of an English bible; words are drawn with Zipf-like weights
+WORDS = (
+    'the and of to that in he shall unto for i his a lord they be is him not them it with all thou thy was god which '
+    'my me said but ye their have will thee from as are when this out were upon man by you israel king son up there '
+    'hath then people came had house into on her come one we children before your also day land men against go hand '
+    'saying made went even do behold because let things every earth father came mine brought sons heart over away '
+    'name days place great now may no own how did city jerusalem david after say our us before glory word life '
+    'spirit faith grace love light truth way law covenant mercy righteousness peace blood fire water bread heaven'
+).split()
+WEIGHTS = [1 / (rank + 1) for rank in range(len(WORDS))]
+
+# the smallest slowdown, in milliseconds, that counts as a regression
+MIN_REGRESSION_MS = 0.1
+
+# every synthetic chapter has at least ten verses, so these are always found
+LONG_RANGES = ['Psalms 119', 'Genesis 1-3', 'Isaiah 40:1-55:10', 'Matthew 5:1-7:10']
+MULTI_PASSAGES = ['Psalms 23:1-6; John 10:1-10; Romans 8:1-10', 'Isaiah 53; Luke 24:1-10; 1 Corinthians 15:1-10']
+
+
+def synthetic_verses(scale=1.0, seed=1):
+    """
+    Function to generate the verses of a synthetic bible: every book and chapter of the canon, with 10 to 40 verses
+    per chapter (times the scale) of 8 to 40 words each.
+
+    :param float scale: The multiple of a normal number of verses per chapter
+    :param int seed: The seed of the random generator, so that the same bible is generated each time
+    :return: a generator of tuples of book number, chapter number, verse number, and verse text
+    """
+    rnd = random.Random(seed)
+    for book in range(1, len(BOOKS) + 1):
+        for chapter in range(1, CHAPTER_COUNTS[book - 1] + 1):
+            for verse in range(1, max(1, int(rnd.randint(10, 40) * scale)) + 1):
+                text = ' '.join(rnd.choices(WORDS, WEIGHTS, k=rnd.randint(8, 40)))
+                yield book, chapter, verse, text[0].upper() + text[1:] + '.'
+
+
+def write_bible(path, bible_format, scale=1.0, seed=1):
+    """
+    Function to write a synthetic bible to a file, one verse at a time.
+
+    :param str path: The location of the file
+    :param str bible_format: 'zefania', 'osis', or 'usfm'
+    :param float scale: The multiple of a normal number of verses per chapter
+    :param int seed: The seed of the random generator
+    :return: the number of verses written
+    """
+    num_verses = 0
+    last_book = None
+    last_chapter = None
+    with open(path, 'w', encoding='utf-8') as file:
+        if bible_format == 'zefania':
+            file.write('<?xml version="1.0" encoding="utf-8"?>\n<XMLBIBLE biblename="Synthetic Bible">\n')
+        elif bible_format == 'osis':
+            file.write(
+                '<?xml version="1.0" encoding="utf-8"?>\n'
+                '<osis xmlns="http://www.bibletechnologies.net/2003/OSIS/namespace">'
+                '<osisText osisIDWork="Synthetic"><header><work osisWork="Synthetic"><title>Synthetic Bible</title>'
+                '</work></header>\n')
+
+        for book, chapter, verse, text in synthetic_verses(scale, seed):
+            if book != last_book or chapter != last_chapter:
+                if bible_format == 'zefania':
+                    if last_chapter:
+                        file.write('</CHAPTER>\n')
+                    if book != last_book:
+                        if last_book:
+                            file.write('</BIBLEBOOK>\n')
+                        file.write('<BIBLEBOOK bnumber="' + str(book) + '" bname="' + BOOKS[book - 1][0] + '">\n')
+                    file.write('<CHAPTER cnumber="' + str(chapter) + '">\n')
+                elif bible_format == 'osis':
+                    if last_chapter:
+                        file.write('</chapter>\n')
+                    if book != last_book:
+                        if last_book:
+                            file.write('</div>\n')
+                        file.write('<div type="book" osisID="' + OSIS_BOOKS[book - 1] + '">\n')
+                    file.write('<chapter osisID="' + OSIS_BOOKS[book - 1] + '.' + str(chapter) + '">\n')
+                else:
+                    if book != last_book:
+                        file.write('\\id ' + USFM_BOOKS[book - 1] + ' Synthetic Bible\n')
+                        file.write('\\h ' + BOOKS[book - 1][0] + '\n')
+                    file.write('\\c ' + str(chapter) + '\n\\p\n')
+                last_book = book
+                last_chapter = chapter
+
+            if bible_format == 'zefania':
+                file.write('<VERS vnumber="' + str(verse) + '">' + text + '</VERS>\n')
+            elif bible_format == 'osis':
+                osis_id = OSIS_BOOKS[book - 1] + '.' + str(chapter) + '.' + str(verse)
+                file.write('<verse osisID="' + osis_id + '">' + text + '</verse>\n')
+            else:
+                file.write('\\v ' + str(verse) + ' ' + text + '\n')
+            num_verses += 1
+
+        if bible_format == 'zefania':
+            file.write('</CHAPTER>\n</BIBLEBOOK>\n</XMLBIBLE>\n')
+        elif bible_format == 'osis':
+            file.write('</chapter>\n</div>\n</osisText>\n</osis>\n')
+    return num_verses
+
+
+class ElementTreeBible:
+    """
+    ElementTreeBible looks up passages the way GetScripture did before the compiled index: the whole document is
+    parsed into an ElementTree when opened, and every lookup walks the tree to the book and chapter. It only reads the
+    XML formats.
+    """
+    def __init__(self, bible_file):
+        """
+        :param str bible_file: The location of a Zefania or OSIS bible
+        """
+        self.bible_format = detect_format(bible_file)
+        self.root = ET.parse(bible_file).getroot()
+
+    def get_chapter(self, book, chapter):
+        """
+        Method to find the verses of a chapter by walking the tree.
+
+        :return: a list of tuples of verse number and text
+        """
+        if self.bible_format == 'zefania':
+            for book_element in self.root:
+                if book_element.get('bnumber') == str(book):
+                    for chapter_element in book_element:
+                        if chapter_element.get('cnumber') == str(chapter):
+                            return [(int(verse.get('vnumber')), verse.text or '') for verse in chapter_element]
+            return []
+
+        prefix = OSIS_BOOKS[book - 1] + '.' + str(chapter) + '.'
+        verses = []
+        for verse in self.root.iter('{http://www.bibletechnologies.net/2003/OSIS/namespace}verse'):
+            osis_id = verse.get('osisID') or ''
+            if osis_id.startswith(prefix):
+                verses.append((int(osis_id[len(prefix):]), ''.join(verse.itertext())))
+        return verses
+
+    def get_passage(self, reference):
+        """
+        Method to look up every verse of a reference.
+
+        :return: the text of the passage in the same form as GetScripture's
+        """
+        ranges = parse_reference(reference)
+        passages = []
+        for start, end in ranges:
+            book, start_chapter = split_ordinal(start)[:2]
+            end_chapter = split_ordinal(end)[1]
+            text = ''
+            for chapter in range(start_chapter, min(end_chapter, CHAPTER_COUNTS[book - 1]) + 1):
+                for verse, verse_text in self.get_chapter(book, chapter):
+                    if start <= verse_ordinal(book, chapter, verse) <= end:
+                        if chapter != start_chapter and verse == 1:
+                            text += str(chapter) + ':'
+                        text += str(verse) + ' ' + verse_text + ' '
+            if len(ranges) > 1:
+                text = format_reference([(start, end)]) + '\n' + text
+            passages.append(text.strip())
+        return '\n\n'.join(passages)
+
+
+def measure(function, *args):
+    """
+    Function to time a call and the peak memory it allocates.
+
+    :return: a tuple of the call's result, the seconds it took, and the peak bytes allocated
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def time_lookups(get_passage, references, clear=None):
+    """
+    Function to time each of a list of lookups.
+
+    :param function get_passage: Looks up a reference
+    :param list of str references: The references to look up
+    :param function clear: Called before each lookup to empty any cache, or None
+    :return: a dict of the 'median' and 'p95' milliseconds of the lookups
+    """
+    times = []
+    for reference in references:
+        if clear:
+            clear()
+        start = time.perf_counter()
+        get_passage(reference)
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return {'median': median(times), 'p95': times[min(len(times) - 1, int(len(times) * 0.95))]}
+
+
+def random_verses(count, seed=2):
+    """
+    Function to pick random single-verse references that exist in every synthetic bible (verses 1 to 10 of any
+    chapter).
+    """
+    rnd = random.Random(seed)
+    references = []
+    for i in range(count):
+        book = rnd.randint(1, len(BOOKS))
+        ordinal = verse_ordinal(book, rnd.randint(1, CHAPTER_COUNTS[book - 1]), rnd.randint(1, 10))
+        references.append(format_reference([(ordinal, ordinal)]))
+    return references
+
+
+def run(bible_format='zefania', scale=1.0, lookups=200, folder=None):
+    """
+    Function to generate a synthetic bible and run every benchmark on it.
+
+    :param str bible_format: 'zefania', 'osis', or 'usfm'
+    :param float scale: The multiple of a normal number of verses per chapter
+    :param int lookups: The number of random single verses to look up
+    :param str folder: Where to write the bible and its index, or None for a temporary folder that is then removed
+    :return: a dict of results
+    """
+    temp_folder = None
+    if not folder:
+        temp_folder = folder = tempfile.mkdtemp()
+    extension = '.usfm' if bible_format == 'usfm' else '.xml'
+    bible_file = os.path.join(folder, 'synthetic_bible' + extension)
+    index_loc = os.path.join(folder, 'synthetic_bible.db')
+
+    results = {'format': bible_format, 'scale': scale}
+    try:
+        results['verses'], seconds, peak = measure(write_bible, bible_file, bible_format, scale)
+        results['file_mb'] = os.path.getsize(bible_file) / 1048576
+
+        index = BibleIndex(bible_file, index_loc)
+        results['index'] = {}
+        seconds, peak = measure(index.build)[1:]
+        results['index']['compile_s'] = seconds
+        results['index']['compile_peak_mb'] = peak / 1048576
+        results['index']['index_mb'] = os.path.getsize(index_loc) / 1048576
+
+        def open_index():
+            gs = GetScripture(SimpleNamespace(bible_file=bible_file, bible_index=index, bible_library=None))
+            gs.get_passage('Genesis 1:1')
+            return gs
+        gs, seconds, peak = measure(open_index)
+        results['index']['cold_open_ms'] = seconds * 1000
+        results['index']['cold_open_peak_mb'] = peak / 1048576
+        results['index']['single_verse_ms'] = time_lookups(
+            gs.get_passage, random_verses(lookups), gs.passage_cache.clear)
+        results['index']['long_range_ms'] = time_lookups(gs.get_passage, LONG_RANGES, gs.passage_cache.clear)
+        results['index']['multi_passage_ms'] = time_lookups(gs.get_passage, MULTI_PASSAGES, gs.passage_cache.clear)
+        for reference in LONG_RANGES:
+            gs.get_passage(reference)
+        results['index']['cached_ms'] = time_lookups(gs.get_passage, LONG_RANGES)
+
+        # the ElementTree approach has no compile step; it parses the whole document when opened
+        if bible_format != 'usfm':
+            def open_tree():
+                bible = ElementTreeBible(bible_file)
+                bible.get_passage('Genesis 1:1')
+                return bible
+            bible, seconds, peak = measure(open_tree)
+            results['elementtree'] = {
+                'cold_open_ms': seconds * 1000,
+                'cold_open_peak_mb': peak / 1048576,
+                # walking the tree is slow enough that a smaller sample gives the same picture
+                'single_verse_ms': time_lookups(bible.get_passage, random_verses(min(lookups, 50))),
+                'long_range_ms': time_lookups(bible.get_passage, LONG_RANGES),
+                'multi_passage_ms': time_lookups(bible.get_passage, MULTI_PASSAGES)
+            }
+
+        if resource:
+            # ru_maxrss is in kilobytes on Linux but bytes on macOS
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            results['max_rss_mb'] = max_rss / (1048576 if sys.platform == 'darwin' else 1024)
+    finally:
+        if temp_folder:
+            shutil.rmtree(temp_folder, ignore_errors=True)
+
+    return results
+
+
+def flatten(results, prefix=''):
+    """
+    Function to flatten nested results into a dict of 'path.to.value' -> value.
+    """
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, prefix + key + '.'))
+        elif isinstance(value, (int, float)):
+            flat[prefix + key] = value
+    return flat
+
+
+def report(results):
+    """
+    Function to print the results as a table comparing the compiled index with ElementTree.
+    """
+    print(
+        'Synthetic ' + results['format'] + ' bible: ' + format(results['verses'], ',') + ' verses, '
+        + format(results['file_mb'], '.1f') + ' MB')
+    index = results['index']
+    print(
+        'Compile: ' + format(index['compile_s'], '.2f') + ' s, peak ' + format(index['compile_peak_mb'], '.1f')
+        + ' MB, index ' + format(index['index_mb'], '.1f') + ' MB')
+    tree = results.get('elementtree', {})
+
+    print()
+    print(format('', '<28') + format('Index', '>14') + format('ElementTree', '>14'))
+    rows = [
+        ('Cold open (ms)', 'cold_open_ms', None),
+        ('Cold open peak (MB)', 'cold_open_peak_mb', None),
+        ('Single verse median (ms)', 'single_verse_ms', 'median'),
+        ('Single verse p95 (ms)', 'single_verse_ms', 'p95'),
+        ('Long range median (ms)', 'long_range_ms', 'median'),
+        ('Multi-passage median (ms)', 'multi_passage_ms', 'median'),
+        ('Cached lookup median (ms)', 'cached_ms', 'median')
+    ]
+    for label, key, statistic in rows:
+        values = []
+        for side in (index, tree):
+            value = side.get(key)
+            if isinstance(value, dict):
+                value = value[statistic]
+            values.append(format(value, '>14.3f') if value is not None else format('-', '>14'))
+        print(format(label, '<28') + ''.join(values))
+    if 'max_rss_mb' in results:
+        print()
+        print('Peak resident memory: ' + format(results['max_rss_mb'], '.1f') + ' MB')
+
+
+def compare(results, saved, tolerance):
+    """
+    Function to find the timings that are slower than saved results by more than the tolerance.
+
+    :param dict results: The results of this run
+    :param dict saved: The results of an earlier run
+    :param float tolerance: The percentage by which a timing may be slower
+    :return: a list of tuples of the timing's name, its saved value, and its value now
+    """
+    now = flatten(results)
+    regressions = []
+    for key, value in flatten(saved).items():
+        if key.startswith('index.') and key.endswith(('_ms', '_s', '.median', '.p95')) and key in now:
+            # sub-millisecond timings vary by more than the tolerance from run to run, so small differences are ignored
+            difference = (now[key] - value) * (1000 if key.endswith('_s') else 1)
+            if now[key] > value * (1 + tolerance / 100) and difference > MIN_REGRESSION_MS:
+                regressions.append((key, value, now[key]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark looking up passages from the bible.')
+    parser.add_argument('--format', choices=['zefania', 'osis', 'usfm'], default='zefania')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiple of a normal number of verses per chapter')
+    parser.add_argument('--lookups', type=int, default=200, help='number of random single verses to look up')
+    parser.add_argument('--keep', help='folder in which to keep the synthetic bible and its index')
+    parser.add_argument('--save', help='file to save the results to, as JSON')
+    parser.add_argument('--compare', help='file of saved results to check this run against')
+    parser.add_argument('--tolerance', type=float, default=25, help='percent slower that counts as a regression')
+    args = parser.parse_args()
+
+    if args.keep and not os.path.exists(args.keep):
+        os.makedirs(args.keep)
+    results = run(args.format, args.scale, args.lookups, args.keep)
+    report(results)
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            file.write(json.dumps(results, indent=4))
+
+    if args.compare:
+        with open(args.compare) as file:
+            saved = json.loads(file.read())
+        print()
+        if (saved.get('format'), saved.get('scale')) != (results['format'], results['scale']):
+            print('The results in ' + args.compare + ' are for a different format or scale; run with --format '
+                  + str(saved.get('format')) + ' --scale ' + str(saved.get('scale')) + ' to compare them')
+            sys.exit(2)
+        regressions = compare(results, saved, args.tolerance)
+        if len(regressions) == 0:
+            print('No regressions against ' + args.compare)
+        for key, saved, now in regressions:
+            print('Regression: ' + key + ' ' + format(saved, '.3f') + ' -> ' + format(now, '.3f'))
+        if len(regressions) > 0:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
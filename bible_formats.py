@@ -0,0 +1,336 @@
+import os
+import re
+import shutil
+import xml.etree.ElementTree as ET
+import xml.sax
+
+from scripture_reference import BOOK_ALIASES, BOOKS, book_key
+
+# the book abbreviations used in OSIS osisIDs, in the same order as BOOKS
+OSIS_BOOKS = [
+    'Gen', 'Exod', 'Lev', 'Num', 'Deut', 'Josh', 'Judg', 'Ruth', '1Sam', '2Sam', '1Kgs', '2Kgs', '1Chr', '2Chr', 'Ezra',
+    'Neh', 'Esth', 'Job', 'Ps', 'Prov', 'Eccl', 'Song', 'Isa', 'Jer', 'Lam', 'Ezek', 'Dan', 'Hos', 'Joel', 'Amos',
+    'Obad', 'Jonah', 'Mic', 'Nah', 'Hab', 'Zeph', 'Hag', 'Zech', 'Mal', 'Matt', 'Mark', 'Luke', 'John', 'Acts', 'Rom',
+    '1Cor', '2Cor', 'Gal', 'Eph', 'Phil', 'Col', '1Thess', '2Thess', '1Tim', '2Tim', 'Titus', 'Phlm', 'Heb', 'Jas',
+    '1Pet', '2Pet', '1John', '2John', '3John', 'Jude', 'Rev'
+]
+
+# the book codes used in USFM \id markers, in the same order as BOOKS
+USFM_BOOKS = [
+    'GEN', 'EXO', 'LEV', 'NUM', 'DEU', 'JOS', 'JDG', 'RUT', '1SA', '2SA', '1KI', '2KI', '1CH', '2CH', 'EZR', 'NEH',
+    'EST', 'JOB', 'PSA', 'PRO', 'ECC', 'SNG', 'ISA', 'JER', 'LAM', 'EZK', 'DAN', 'HOS', 'JOL', 'AMO', 'OBA', 'JON',
+    'MIC', 'NAM', 'HAB', 'ZEP', 'HAG', 'ZEC', 'MAL', 'MAT', 'MRK', 'LUK', 'JHN', 'ACT', 'ROM', '1CO', '2CO', 'GAL',
+    'EPH', 'PHP', 'COL', '1TH', '2TH', '1TI', '2TI', 'TIT', 'PHM', 'HEB', 'JAS', '1PE', '2PE', '1JN', '2JN', '3JN',
+    'JUD', 'REV'
+]
+
+USFM_EXTENSIONS = ('.usfm', '.sfm', '.ptx')
+
+# usfm notes, cross references, figures and alternate numbers, which aren't part of the verse text
+USFM_NOTE_PATTERN = re.compile('\\\\(f|fe|x|ef|ex|fig|va|vp|ca)\\s.*?\\\\\\1\\*')
+# the attributes of a usfm word, i.e. \w grace|strong="G5485"\w*
+USFM_ATTRIBUTE_PATTERN = re.compile('\\|[^\\\\]*(?=\\\\\\+?[a-z0-9]+\\*)')
+USFM_MARKER_PATTERN = re.compile('\\\\\\+?[a-z0-9]+\\*?')
+# the markers that start a book, chapter, or verse, which may come anywhere in a line (i.e. "\\p \\v 1 In the...")
+USFM_SEGMENT_PATTERN = re.compile('\\\\(id|c|v)\\s+')
+# paragraph markers that begin headings and other text that isn't part of a verse
+USFM_HEADING_PATTERN = re.compile('(s|ms|mr|r|d|sp|cl|cp|rem|toc|mt|imt|ip|is|h)\\d*$')
+
+
+def to_int(value):
+    """
+    Function to read the leading number of a verse or chapter number (some bibles number verses like "3a").
+    """
+    match = re.match('\\d+', str(value or '').strip())
+    return int(match.group()) if match else None
+
+
+def clean_text(text):
+    return re.sub('\\s+', ' ', text).strip()
+
+
+def detect_format(bible_file):
+    """
+    Function to recognize the format of a bible file by its extension or, for xml files, its root element.
+
+    :param str bible_file: The location of the bible file
+    :return: 'zefania', 'osis', or 'usfm', or None if the format isn't recognized
+    """
+    if bible_file.lower().endswith(USFM_EXTENSIONS):
+        return 'usfm'
+
+    with open(bible_file, 'rb') as file:
+        start = file.read(4096).decode('utf-8', 'ignore')
+    if re.search('<osis[\\s>]', start):
+        return 'osis'
+    if re.search('<xmlbible[\\s>]', start, re.IGNORECASE):
+        return 'zefania'
+    if re.search('^\\\\id\\s', start.lstrip('﻿'), re.MULTILINE):
+        return 'usfm'
+    return None
+
+
+def detect_files_format(files):
+    """
+    Function to recognize the format of the file or files the user has chosen as a bible.
+
+    :param list of str files: The bible's file, or files for a USFM bible given one book per file
+    :return: the bible's format, from detect_format
+    :raises ValueError: if the format isn't recognized, or several files are given for a bible that isn't USFM
+    """
+    bible_format = detect_format(files[0])
+    if not bible_format:
+        raise ValueError('The bible is not in a recognized format (Zefania XML, OSIS XML, or USFM)')
+    if len(files) > 1 and any(detect_format(file) != 'usfm' for file in files):
+        raise ValueError('Only a USFM bible can be imported from more than one file')
+    return bible_format
+
+
+def copy_bible(files, destination):
+    """
+    Function to copy a bible into the program's folder. A USFM bible is often given as one file per book, in which
+    case the files are joined into one; each book's \\id marker starts it afresh.
+
+    :param list of str files: The bible's file, or files for a USFM bible
+    :param str destination: The location to copy the bible to
+    """
+    if len(files) == 1:
+        shutil.copy(files[0], destination)
+        return
+    with open(destination, 'wb') as out_file:
+        for file in files:
+            with open(file, 'rb') as in_file:
+                shutil.copyfileobj(in_file, out_file)
+            out_file.write(b'\n')
+
+
+def read_zefania(source, info):
+    """
+    Function to stream the verses of a Zefania XML bible. Books are recognized by name first, as GetScripture always
+    has, then by their bnumber.
+
+    :param file source: The bible file, opened in binary mode
+    :param dict info: Filled in with the bible's 'name', if it gives one
+    :return: a generator of tuples of book number, book name, chapter, verse, and text
+    """
+    book = chapter = book_name = None
+    book_count = 0
+    for event, element in ET.iterparse(source, events=('start', 'end')):
+        tag = element.tag.upper()
+        if event == 'start':
+            if tag == 'XMLBIBLE' and element.get('biblename'):
+                info['name'] = element.get('biblename')
+            elif tag == 'BIBLEBOOK':
+                book_count += 1
+                book_name = element.get('bname')
+                book = BOOK_ALIASES.get(book_key(book_name or '')) or to_int(element.get('bnumber')) or book_count
+            elif tag == 'CHAPTER':
+                chapter = to_int(element.get('cnumber'))
+            continue
+
+        if tag == 'VERS' and book and chapter:
+            verse = to_int(element.get('vnumber'))
+            if verse is not None:
+                yield book, book_name, chapter, verse, clean_text(''.join(element.itertext()))
+            element.clear()
+        elif tag in ('CHAPTER', 'BIBLEBOOK'):
+            element.clear()
+
+
+class OSISHandler(xml.sax.ContentHandler):
+    """
+    OSISHandler collects the verses of an OSIS document as it is parsed. OSIS marks verses either as containers
+    (<verse osisID="John.3.16">...</verse>) or as milestones (<verse sID="John.3.16"/>...<verse eID="John.3.16"/>),
+    whose text runs across other elements, so the document is read as a stream of events rather than a tree.
+    """
+    # elements whose text isn't part of the verse
+    skipped = {'note', 'title', 'rdg'}
+    # elements that break the text, so that the words on either side of them aren't run together
+    blocks = {'p', 'l', 'lg', 'lb', 'div', 'list', 'item'}
+
+    def __init__(self, info):
+        super().__init__()
+        self.info = info
+        self.verses = []
+        self.path = []
+        self.skip_depth = 0
+        self.verse_id = None
+        self.container = False
+        self.text = []
+
+    def startElement(self, name, attrs):
+        name = name.split(':')[-1]
+        self.path.append(name)
+        if self.skip_depth > 0 or (name in self.skipped and self.verse_id):
+            self.skip_depth += 1
+            return
+        if name in self.blocks:
+            self.text.append(' ')
+
+        if name == 'verse':
+            self.container = not attrs.get('sID') and not attrs.get('eID')
+            if attrs.get('eID'):
+                self.end_verse()
+            else:
+                # a verse may stand for several, i.e. osisID="Rom.3.23 Rom.3.24"; it is stored under the first
+                osis_id = attrs.get('osisID') or attrs.get('sID') or ''
+                self.end_verse()
+                self.verse_id = osis_id.split()[0] if osis_id.split() else None
+        elif name == 'title' and 'work' in self.path and 'name' not in self.info:
+            self.text = []
+
+    def endElement(self, name):
+        name = name.split(':')[-1]
+        self.path.pop()
+        if self.skip_depth > 0:
+            self.skip_depth -= 1
+            return
+        if name in self.blocks:
+            self.text.append(' ')
+
+        if name == 'verse':
+            # a milestone ends at its eID rather than where its empty element closes
+            if self.container:
+                self.end_verse()
+        elif name == 'title' and 'work' in self.path and 'name' not in self.info:
+            self.info['name'] = clean_text(''.join(self.text))
+            self.text = []
+        elif name == 'chapter':
+            self.end_verse()
+
+    def characters(self, content):
+        if self.skip_depth == 0:
+            self.text.append(content)
+
+    def end_verse(self):
+        if self.verse_id:
+            parts = self.verse_id.split('.')
+            if len(parts) >= 3 and parts[0] in OSIS_BOOKS:
+                chapter = to_int(parts[1])
+                verse = to_int(parts[2])
+                if chapter and verse is not None:
+                    book = OSIS_BOOKS.index(parts[0]) + 1
+                    self.verses.append((book, None, chapter, verse, clean_text(''.join(self.text))))
+        self.verse_id = None
+        self.text = []
+
+
+def read_osis(source, info):
+    """
+    Function to stream the verses of an OSIS XML bible. The file is fed to the parser in blocks, and the verses found
+    in each block are given out before the next is read.
+
+    :param file source: The bible file, opened in binary mode
+    :param dict info: Filled in with the bible's 'name', if it gives one
+    :return: a generator of tuples of book number, book name (None; OSIS names books by abbreviation), chapter,
+        verse, and text
+    """
+    handler = OSISHandler(info)
+    parser = xml.sax.make_parser()
+    parser.setContentHandler(handler)
+    while True:
+        block = source.read(65536)
+        if not block:
+            break
+        parser.feed(block)
+        yield from handler.verses
+        handler.verses = []
+    parser.close()
+    handler.end_verse()
+    yield from handler.verses
+
+
+def usfm_text(text):
+    """
+    Function to reduce a line of USFM to its plain text, leaving out notes, cross references, word attributes, and
+    markers.
+    """
+    text = USFM_NOTE_PATTERN.sub('', text)
+    text = USFM_ATTRIBUTE_PATTERN.sub('', text)
+    return USFM_MARKER_PATTERN.sub('', text)
+
+
+def read_usfm(source, info):
+    """
+    Function to stream the verses of a USFM bible, one or more books, line by line. Books outside the 66 of BOOKS
+    (i.e. front matter or the deuterocanon) are passed over.
+
+    :param file source: The bible file, opened in binary mode
+    :param dict info: Not filled in; USFM doesn't name the translation
+    :return: a generator of tuples of book number, book name, chapter, verse, and text
+    """
+    book = chapter = verse = book_name = None
+    text = []
+    for line in source:
+        line = line.decode('utf-8-sig', 'replace').strip()
+        parts = USFM_SEGMENT_PATTERN.split(line)
+
+        # whatever comes before the first book, chapter, or verse marker continues the current verse, unless it's a
+        # heading or the book's name
+        if parts[0].startswith('\\'):
+            marker, _, rest = parts[0].partition(' ')
+            marker = marker[1:]
+            if marker in ('h', 'toc2') and book and not book_name:
+                book_name = clean_text(usfm_text(rest)) or None
+            elif verse is not None and not USFM_HEADING_PATTERN.match(marker):
+                text.append(rest)
+        elif verse is not None:
+            text.append(parts[0])
+
+        for i in range(1, len(parts), 2):
+            marker, rest = parts[i], parts[i + 1]
+            if book and chapter and verse is not None:
+                yield book, book_name, chapter, verse, clean_text(usfm_text(' '.join(text)))
+            verse = None
+            text = []
+
+            if marker == 'id':
+                code = rest.strip()[:3].upper()
+                book = USFM_BOOKS.index(code) + 1 if code in USFM_BOOKS else None
+                book_name = None
+                chapter = None
+            elif marker == 'c':
+                chapter = to_int(rest)
+            else:
+                number, _, rest = rest.strip().partition(' ')
+                verse = to_int(number)
+                text.append(rest)
+
+    if book and chapter and verse is not None:
+        yield book, book_name, chapter, verse, clean_text(usfm_text(' '.join(text)))
+
+
+READERS = {'zefania': read_zefania, 'osis': read_osis, 'usfm': read_usfm}
+
+
+def read_bible(source, bible_format, info):
+    """
+    Function to stream the verses of a bible in any of the supported formats. A verse given more than once keeps the
+    last text given for it, and a book given no name by its file is named from BOOKS.
+
+    :param file source: The bible file, opened in binary mode
+    :param str bible_format: The bible's format, from detect_format
+    :param dict info: Filled in with the bible's 'name', if it gives one
+    :return: a generator of tuples of book number, book name, chapter, verse, and text
+    """
+    if bible_format not in READERS:
+        raise ValueError('The bible is not in a recognized format (Zefania XML, OSIS XML, or USFM)')
+    for book, book_name, chapter, verse, text in READERS[bible_format](source, info):
+        if not book_name:
+            book_name = BOOKS[book - 1][0] if book <= len(BOOKS) else str(book)
+        yield book, book_name, chapter, verse, text
+
+
+def bible_extension(bible_format):
+    """
+    Function to get the extension a bible of the given format is saved under in the program's folder.
+    """
+    return '.usfm' if bible_format == 'usfm' else '.xml'
+
+
+def bible_files(folder, name):
+    """
+    Function to list the saved bible files of the given name, in any format, in a folder.
+    """
+    files = [folder + '/' + name + extension for extension in ('.xml', '.usfm')]
+    return [file for file in files if os.path.exists(file)]
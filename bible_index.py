@@ -0,0 +1,356 @@
+import os
+import re
+import sqlite3
+from array import array
+from os.path import exists
+
+from bible_formats import bible_extension, copy_bible, detect_files_format, detect_format, read_bible
+from scripture_reference import BOOKS, CHAPTER_COUNTS, LAST_VERSE, split_ordinal, verse_ordinal
+from text_normalization import NORMALIZATION_VERSION, normalize_word, words
+
+# bump this whenever the layout of the compiled index changes so that it is rebuilt
+INDEX_VERSION = 2
+
+
+class BibleIndex:
+    """
+    BibleIndex compiles the user's bible (Zefania XML, OSIS XML, or USFM) into a SQLite file holding every verse under
+    its ordinal along with a concordance: the positions of every normalized word in the bible. Once built, verses and
+    concordance searches are answered from the compiled file without reading the bible file again. Books are stored
+    under their standard numbers, so the same ordinal is the same verse in every translation.
+    """
+    def __init__(self, bible_file, index_loc):
+        """
+        :param str bible_file: The location of the user's bible file
+        :param str index_loc: The location of the compiled index
+        """
+        self.bible_file = bible_file
+        self.index_loc = index_loc
+        self.name = None
+
+    def source_signature(self):
+        """
+        Method to describe the bible file so that a changed or replaced bible can be recognized.
+        """
+        stat = os.stat(self.bible_file)
+        return str(stat.st_size) + ':' + str(int(stat.st_mtime))
+
+    def is_current(self):
+        """
+        Method to check that the compiled index exists and was built from the current bible file with the current
+        normalization pipeline.
+        """
+        if not exists(self.index_loc) or not exists(self.bible_file):
+            return False
+        try:
+            conn = sqlite3.connect(self.index_loc)
+            cursor = conn.cursor()
+            info = dict(cursor.execute('SELECT key, value FROM info').fetchall())
+            conn.close()
+        except sqlite3.Error:
+            return False
+        return (
+            info.get('source') == self.source_signature()
+            and info.get('normalization_version') == str(NORMALIZATION_VERSION)
+            and info.get('index_version') == str(INDEX_VERSION)
+        )
+
+    def get_name(self):
+        """
+        Method to get the name of the translation, as given in the bible file or else by its file name.
+        """
+        if not self.name:
+            try:
+                conn = sqlite3.connect(self.index_loc)
+                cursor = conn.cursor()
+                row = cursor.execute('SELECT value FROM info WHERE key = \'name\'').fetchone()
+                conn.close()
+                self.name = row[0]
+            except (sqlite3.Error, TypeError):
+                self.name = os.path.splitext(os.path.basename(self.bible_file))[0]
+        return self.name
+
+    def build(self, progress=None):
+        """
+        Method to compile the bible, which may be in any of the formats of bible_formats. The file is streamed, each
+        verse being written in batches as it is read, so the whole document is never held in memory. The index is
+        written to a temporary file and moved into place when complete so that a failed build never leaves a partial
+        index behind.
+
+        :param function progress: Called now and then with the percentage of the file read so far, or None
+        :return: the number of verses indexed
+        """
+        bible_format = detect_format(self.bible_file)
+        temp_loc = self.index_loc + '.tmp'
+        if exists(temp_loc):
+            os.remove(temp_loc)
+
+        conn = sqlite3.connect(temp_loc)
+        cursor = conn.cursor()
+        cursor.execute('CREATE TABLE info (key TEXT PRIMARY KEY, value TEXT)')
+        cursor.execute('CREATE TABLE books (book INTEGER PRIMARY KEY, name TEXT)')
+        cursor.execute(
+            'CREATE TABLE verses (ordinal INTEGER PRIMARY KEY, book INTEGER, chapter INTEGER, verse INTEGER, '
+            'text TEXT)')
+        cursor.execute('CREATE TABLE concordance (term TEXT PRIMARY KEY, postings BLOB)')
+
+        # postings are flat pairs of verse ordinal and word position within the verse; verses are written in batches
+        postings = {}
+        verse_rows = []
+        num_verses = 0
+        books = set()
+        info = {'name': os.path.splitext(os.path.basename(self.bible_file))[0]}
+        size = max(os.path.getsize(self.bible_file), 1)
+        with open(self.bible_file, 'rb') as source:
+            for book, book_name, chapter, verse, text in read_bible(source, bible_format, info):
+                if book not in books:
+                    books.add(book)
+                    cursor.execute('INSERT OR REPLACE INTO books VALUES (?, ?)', (book, book_name))
+
+                ordinal = verse_ordinal(book, chapter, verse)
+                verse_rows.append((ordinal, book, chapter, verse, text))
+                if len(verse_rows) >= 1000:
+                    cursor.executemany('INSERT OR REPLACE INTO verses VALUES (?, ?, ?, ?, ?)', verse_rows)
+                    num_verses += len(verse_rows)
+                    verse_rows = []
+                    if progress:
+                        progress(min(99, int(100 * source.tell() / size)))
+                verse_words = words(text)
+                for position in range(len(verse_words)):
+                    term = normalize_word(verse_words[position][0])
+                    postings.setdefault(term, array('I')).extend((ordinal, position))
+
+        cursor.executemany('INSERT OR REPLACE INTO verses VALUES (?, ?, ?, ?, ?)', verse_rows)
+        num_verses += len(verse_rows)
+        cursor.executemany(
+            'INSERT INTO concordance VALUES (?, ?)', [(term, value.tobytes()) for term, value in postings.items()])
+        cursor.execute('INSERT INTO info VALUES (?, ?)', ('source', self.source_signature()))
+        cursor.execute('INSERT INTO info VALUES (?, ?)', ('normalization_version', str(NORMALIZATION_VERSION)))
+        cursor.execute('INSERT INTO info VALUES (?, ?)', ('index_version', str(INDEX_VERSION)))
+        cursor.execute('INSERT INTO info VALUES (?, ?)', ('name', info['name']))
+        cursor.execute('INSERT INTO info VALUES (?, ?)', ('format', bible_format))
+        conn.commit()
+        conn.close()
+
+        os.replace(temp_loc, self.index_loc)
+        self.name = info['name']
+        if progress:
+            progress(100)
+        return num_verses
+
+    def validate(self):
+        """
+        Method to check the compiled bible for missing books, chapters, and verses. A chapter is missing if a book has
+        fewer chapters than it should or skips one; a verse is missing if a chapter skips a verse number.
+
+        :return: a dict of 'verses': the number of verses, 'missing_books': a list of book numbers, 'missing_chapters':
+            a list of (book, [chapters]) tuples, and 'missing_verses': a list of (book, chapter, [verses]) tuples
+        """
+        conn = sqlite3.connect(self.index_loc)
+        cursor = conn.cursor()
+        num_verses = cursor.execute('SELECT COUNT(*) FROM verses').fetchone()[0]
+        verse_counts = cursor.execute(
+            'SELECT book, chapter, COUNT(*), MAX(verse) FROM verses GROUP BY book, chapter ORDER BY book, chapter'
+        ).fetchall()
+        chapters = {}
+        gaps = []
+        for book, chapter, count, last_verse in verse_counts:
+            chapters.setdefault(book, set()).add(chapter)
+            if count < last_verse:
+                present = set(row[0] for row in cursor.execute(
+                    'SELECT verse FROM verses WHERE ordinal BETWEEN ? AND ?',
+                    (verse_ordinal(book, chapter, 0), verse_ordinal(book, chapter, LAST_VERSE))))
+                gaps.append((book, chapter, [verse for verse in range(1, last_verse) if verse not in present]))
+        conn.close()
+
+        missing_chapters = []
+        for book in sorted(chapters):
+            if book <= len(CHAPTER_COUNTS):
+                expected = set(range(1, CHAPTER_COUNTS[book - 1] + 1))
+                missing = sorted(expected - chapters[book])
+                if len(missing) > 0:
+                    missing_chapters.append((book, missing))
+
+        return {
+            'verses': num_verses,
+            'missing_books': [book for book in range(1, len(BOOKS) + 1) if book not in chapters],
+            'missing_chapters': missing_chapters,
+            'missing_verses': gaps
+        }
+
+    def preload(self):
+        """
+        Method to read every page of the index once, bringing it into the operating system's disk cache.
+        """
+        if not exists(self.index_loc):
+            return
+        conn = sqlite3.connect(self.index_loc)
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*), SUM(LENGTH(text)) FROM verses').fetchone()
+        cursor.execute('SELECT COUNT(*) FROM books').fetchone()
+        conn.close()
+
+    def get_verses(self, start, end, cursor=None):
+        """
+        Method to read a range of verses from the compiled index.
+
+        :param int start: The ordinal of the first verse of the range
+        :param int end: The ordinal of the last verse of the range
+        :param sqlite3.Cursor cursor: An open cursor on the index to use when reading many ranges, or None to open one
+        :return: a list of tuples of chapter number, verse number, and verse text
+        """
+        conn = None
+        if not cursor:
+            conn = sqlite3.connect(self.index_loc)
+            cursor = conn.cursor()
+        verses = cursor.execute(
+            'SELECT chapter, verse, text FROM verses WHERE ordinal BETWEEN ? AND ? ORDER BY ordinal', (start, end)
+        ).fetchall()
+        if conn:
+            conn.close()
+        return verses
+
+    def get_postings(self, cursor, term):
+        """
+        Method to read the positions of a term from the concordance.
+
+        :return: a dict of verse ordinal -> list of word positions
+        """
+        row = cursor.execute('SELECT postings FROM concordance WHERE term = ?', (term,)).fetchone()
+        if not row:
+            return {}
+        values = array('I')
+        values.frombytes(row[0])
+        postings = {}
+        for i in range(0, len(values), 2):
+            postings.setdefault(values[i], []).append(values[i + 1])
+        return postings
+
+    def search(self, text, limit=None):
+        """
+        Method to find every verse containing a word or phrase.
+
+        :param str text: The word or phrase to search for
+        :param int limit: The greatest number of verses to return, or None for all of them
+        :return: a tuple of the total number of verses found and a list of tuples of the verse's reference, text, and
+            the word positions of each match within the verse, in canonical order
+        """
+        terms = [normalize_word(word[0]) for word in words(text)]
+        if len(terms) == 0:
+            return 0, []
+
+        conn = sqlite3.connect(self.index_loc)
+        cursor = conn.cursor()
+        first = self.get_postings(cursor, terms[0])
+        others = [self.get_postings(cursor, term) for term in terms[1:]]
+
+        found = []
+        for ordinal in sorted(first):
+            if not all(ordinal in other for other in others):
+                continue
+            matches = []
+            for position in first[ordinal]:
+                if all(position + i + 1 in others[i][ordinal] for i in range(len(others))):
+                    matches.append(range(position, position + len(terms)))
+            if len(matches) > 0:
+                found.append((ordinal, matches))
+
+        book_names = dict(cursor.execute('SELECT book, name FROM books').fetchall())
+        results = []
+        for ordinal, matches in found[:limit]:
+            row = cursor.execute('SELECT text FROM verses WHERE ordinal = ?', (ordinal,)).fetchone()
+            book, chapter, verse = split_ordinal(ordinal)
+            reference = book_names.get(book, str(book)) + ' ' + str(chapter) + ':' + str(verse)
+            positions = set()
+            for match in matches:
+                positions.update(match)
+            results.append((reference, row[0], positions))
+        conn.close()
+
+        return len(found), results
+
+
+class BibleLibrary:
+    """
+    BibleLibrary keeps the user's bible translations: the main bible (my_bible.xml or my_bible.usfm) and any others
+    imported into the bibles folder of the app directory, each compiled into its own index. Because every index uses
+    the same verse ordinals, a passage is read from N translations with N direct range queries.
+    """
+    def __init__(self, library_dir, main_index):
+        """
+        :param str library_dir: The folder holding the additional translations
+        :param BibleIndex main_index: The index of the user's main bible
+        """
+        self.library_dir = library_dir
+        self.main_index = main_index
+        self.indexes = None
+
+    def get_indexes(self):
+        """
+        Method to get the index of every translation, the main bible first.
+        """
+        if self.indexes is None:
+            self.indexes = []
+            if exists(self.main_index.bible_file):
+                self.indexes.append(self.main_index)
+            if exists(self.library_dir):
+                for file in sorted(os.listdir(self.library_dir)):
+                    if file.lower().endswith(('.xml', '.usfm')):
+                        bible_file = self.library_dir + '/' + file
+                        self.indexes.append(BibleIndex(bible_file, os.path.splitext(bible_file)[0] + '.db'))
+        return self.indexes
+
+    def get_stale(self):
+        """
+        Method to get the translations whose compiled index is missing or out of date.
+        """
+        return [index for index in self.get_indexes() if not index.is_current()]
+
+    def add(self, files):
+        """
+        Method to copy a bible into the library. The bible is compiled separately (see BibleIndex.build), and should
+        be removed again if that fails.
+
+        :param list of str files: The bible's file, or files for a USFM bible given one book per file
+        :return: the new translation's index
+        """
+        bible_format = detect_files_format(files)
+        if not exists(self.library_dir):
+            os.mkdir(self.library_dir)
+
+        file_name = re.sub('[^\\w\\-]+', '_', os.path.splitext(os.path.basename(files[0]))[0])
+        library_file = self.library_dir + '/' + file_name + bible_extension(bible_format)
+        copy_bible(files, library_file)
+
+        self.indexes = None
+        return BibleIndex(library_file, self.library_dir + '/' + file_name + '.db')
+
+    def remove(self, index):
+        """
+        Method to remove a translation, and its compiled index, from the library.
+
+        :param BibleIndex index: The translation's index
+        """
+        for file in [index.bible_file, index.index_loc]:
+            if exists(file):
+                os.remove(file)
+        self.indexes = None
+
+    def get_parallel(self, ranges, indexes):
+        """
+        Method to read the same passage from several translations.
+
+        :param list of tuple ranges: The first and last verse ordinals of each range of the passage
+        :param list of BibleIndex indexes: The translations to read
+        :return: a list of tuples of chapter, verse, and a list of that verse's text in each translation ('' where a
+            translation doesn't have the verse)
+        """
+        rows = []
+        for start, end in ranges:
+            texts = {}
+            for i in range(len(indexes)):
+                for chapter, verse, text in indexes[i].get_verses(start, end):
+                    texts.setdefault((chapter, verse), [''] * len(indexes))[i] = text
+            for key in sorted(texts):
+                rows.append((key[0], key[1], texts[key]))
+        return rows
@@ -4,7 +4,16 @@ import shutil
 import sqlite3
 from os.path import exists
 
-from PyQt6.QtWidgets import QFileDialog, QDialog, QGridLayout, QLabel, QProgressBar, QPushButton, QMessageBox
+from PyQt6.QtWidgets import QApplication, QFileDialog, QDialog, QGridLayout, QLabel, QProgressBar, QPushButton, \
+    QMessageBox
+
+from search_index import FIELDS
+
+# the position in the old version's sermon_prep_database of each of FIELDS, after its ID
+OLD_POSITIONS = [2, 3, 5, 4, 9, 10, 7, 8, 11, 12, 18, 6, 14, 15, 17, 13, 1, 19, 21, 20, 16]
+
+# the records are copied this many at a time, to show the conversion's progress
+CHUNK_SIZE = 1000
 
 
 class ConvertDatabase(QDialog):
@@ -34,7 +43,7 @@ class ConvertDatabase(QDialog):
 
             self.progress_bar = QProgressBar()
             self.progress_bar.setMinimum(0)
-            self.progress_bar.setMaximum(100)
+            self.progress_bar.setMaximum(0)
             self.progress_layout.addWidget(self.progress_bar, 1, 0)
 
             self.show()
@@ -81,113 +90,70 @@ class ConvertDatabase(QDialog):
             else:
                 self.spd.write_to_log('ConvertDatabase.__init__: Converting database from ' + file)
 
-                # retrieve all the data from the user's previous database
-                # do this first in case the old database is the same name and location as self.spd.db_loc
-                conn = sqlite3.connect(file)
-                cur = conn.cursor()
-                sql = 'SELECT * FROM sermon_prep_database'
-                results = cur.execute(sql)
-                self.all_data = results.fetchall()
-
                 if not exists(self.spd.app_dir):
                     os.mkdir(self.spd.app_dir)
 
-                shutil.copy('resources/database_template.db', self.spd.db_loc)
+                # the old database is read from where it is, unless it's in the place of the database being created
+                self.old_file = file
+                self.copied_file = None
+                if exists(self.spd.db_loc) and os.path.samefile(file, self.spd.db_loc):
+                    self.copied_file = self.spd.app_dir + '/database-being-converted.db'
+                    shutil.copy(file, self.copied_file)
+                    self.old_file = self.copied_file
 
-                # remove the new user introduction record from the database template
-                conn = sqlite3.connect(self.spd.db_loc)
-                cur = conn.cursor()
-                sql = 'DELETE FROM sermon_prep_database WHERE ID = 1'  # remove the initial entry from the database template
-                cur.execute(sql)
-                conn.commit()
+                shutil.copy('resources/database_template.db', self.spd.db_loc)
                 return 1
 
     def convert_database(self):
+        """
+        Method to copy the records of the old database into the new one. The old database is attached to the new
+        one's connection and its records are copied across by SQL, a chunk at a time so that the progress bar can
+        follow, all in a single transaction so that the conversion is either finished or not begun.
+        """
+        conn = None
         try:
-            id = []
-            pericope_entry = []
-            pericope_text = []
-            reference_entry = []
-            scripture_text = []
-            fcft_entry = []
-            gat_entry = []
-            cpt_entry = []
-            pb_entry = []
-            fcfs_entry = []
-            gas_entry = []
-            cps_entry = []
-            scripture_outline_text = []
-            sermon_outline_text = []
-            illustration_text = []
-            research_text = []
-            title_entry = []
-            date_entry = []
-            location_entry = []
-            ctw_entry = []
-            hor_entry = []
-            sermon_text = []
-
-            for row in self.all_data:
-                self.progress_label.setText('Converting id # ' + str(row[0]))
-                self.progress_bar.setValue(self.progress_bar.value() + 1)
-
-                # add the data from the items in each row to the above declared lists
-                id.append(row[0])
-                pericope_entry.append(self.clean_and_strip(row[2]))
-                pericope_text.append(self.clean_and_strip(row[3]))
-                reference_entry.append(self.clean_and_strip(row[5]))
-                scripture_text.append(self.clean_and_strip(row[4]))
-                fcft_entry.append(self.clean_and_strip(row[9]))
-                gat_entry.append(self.clean_and_strip(row[10]))
-                cpt_entry.append(self.clean_and_strip(row[7]))
-                pb_entry.append(self.clean_and_strip(row[8]))
-                fcfs_entry.append(self.clean_and_strip(row[11]))
-                gas_entry.append(self.clean_and_strip(row[12]))
-                cps_entry.append(self.clean_and_strip(row[18]))
-                scripture_outline_text.append(self.clean_and_strip(row[6]))
-                sermon_outline_text.append(self.clean_and_strip(row[14]))
-                illustration_text.append(self.clean_and_strip(row[15]))
-                research_text.append(self.clean_and_strip(row[17]))
-                title_entry.append(self.clean_and_strip(row[13]))
-                date_entry.append(self.clean_and_strip(row[1]))
-                location_entry.append(self.clean_and_strip(row[19]))
-                ctw_entry.append(self.clean_and_strip(row[21]))
-                hor_entry.append(self.clean_and_strip(row[20]))
-                sermon_text.append(self.clean_and_strip(row[16]))
-
-            for i in range(0, len(id)):
-                self.progress_label.setText('Inserting id #' + str(id[i]) + ' into database')
-                self.progress_bar.setValue(self.progress_bar.value() + 1)
-
-                # build an SQL statement to add the data from the arrays to new records in the new database
-                conn = sqlite3.connect(self.spd.db_loc)
-                cur = conn.cursor()
-                sql = 'INSERT INTO sermon_prep_database ("ID","pericope","pericope_texts","sermon_reference","sermon_scripture","fcft","gat","cpt","pb","fcfs","gas","cps","scripture_outline","sermon_outline","illustrations","research","sermon_title","date","location","call_to_worship","hymn_of_response","manuscript") VALUES ('
-                sql += '"' + str(id[i]) + '",'
-                sql += '"' + pericope_entry[i] + '",'
-                sql += '"' + pericope_text[i] + '",'
-                sql += '"' + reference_entry[i] + '",'
-                sql += '"' + scripture_text[i] + '",'
-                sql += '"' + fcft_entry[i] + '",'
-                sql += '"' + gat_entry[i] + '",'
-                sql += '"' + cpt_entry[i] + '",'
-                sql += '"' + pb_entry[i] + '",'
-                sql += '"' + fcfs_entry[i] + '",'
-                sql += '"' + gas_entry[i] + '",'
-                sql += '"' + cps_entry[i] + '",'
-                sql += '"' + scripture_outline_text[i] + '",'
-                sql += '"' + sermon_outline_text[i] + '",'
-                sql += '"' + illustration_text[i] + '",'
-                sql += '"' + research_text[i] + '",'
-                sql += '"' + title_entry[i] + '",'
-                sql += '"' + date_entry[i] + '",'
-                sql += '"' + location_entry[i] + '",'
-                sql += '"' + ctw_entry[i] + '",'
-                sql += '"' + hor_entry[i] + '",'
-                sql += '"' + sermon_text[i] + '");'
-                cur.execute(sql)
-                conn.commit()
-        except sqlite3.OperationalError as err:  # catch problems with the opening of the old database
+            conn = sqlite3.connect(self.spd.db_loc, isolation_level=None)
+            conn.create_function('clean_and_strip', 1, self.clean_and_strip, deterministic=True)
+            cur = conn.cursor()
+            cur.execute('ATTACH DATABASE ? AS old', (self.old_file,))
+
+            # the old table's columns are known by their position, as they were named differently
+            old_columns = [row[1] for row in cur.execute('PRAGMA old.table_info(sermon_prep_database)')]
+            if len(old_columns) <= max(OLD_POSITIONS):
+                raise sqlite3.OperationalError('The old database does not have the expected sermon_prep_database table')
+            columns = '"ID", ' + ', '.join('"' + field + '"' for field in FIELDS)
+            values = '"' + old_columns[0] + '", ' + ', '.join(
+                'clean_and_strip("' + old_columns[position] + '")' for position in OLD_POSITIONS)
+
+            total = cur.execute('SELECT COUNT(*) FROM old.sermon_prep_database').fetchone()[0]
+            self.progress_bar.setMaximum(max(total, 1))
+            converted = 0
+
+            cur.execute('BEGIN')
+            # remove the new user introduction record from the database template
+            cur.execute('DELETE FROM main.sermon_prep_database WHERE ID = 1')
+            last_row = -1
+            while True:
+                chunk_end = cur.execute(
+                    'SELECT MAX(rowid) FROM (SELECT rowid FROM old.sermon_prep_database WHERE rowid > ? '
+                    'ORDER BY rowid LIMIT ?)', (last_row, CHUNK_SIZE)).fetchone()[0]
+                if chunk_end is None:
+                    break
+                cur.execute(
+                    'INSERT INTO main.sermon_prep_database (' + columns + ') SELECT ' + values
+                    + ' FROM old.sermon_prep_database WHERE rowid > ? AND rowid <= ?', (last_row, chunk_end))
+                converted += cur.rowcount
+                last_row = chunk_end
+
+                self.progress_label.setText('Converted ' + str(converted) + ' of ' + str(total) + ' records')
+                self.progress_bar.setValue(converted)
+                QApplication.processEvents()
+            cur.execute('COMMIT')
+            cur.execute('DETACH DATABASE old')
+            conn.close()
+        except sqlite3.Error as err:  # catch problems with the opening of the old database
+            if conn:
+                conn.close()
             self.spd.write_to_log('ConvertDatabase.convertDatabase: ' + str(err))
             QMessageBox.critical(
                 None,
@@ -197,23 +163,29 @@ class ConvertDatabase(QDialog):
             )
 
             os.remove(self.spd.db_loc)
+            self.remove_copied_file()
 
             quit()
 
         else:  # if no errors, confirm database conversion
+            self.remove_copied_file()
             self.progress_label.setText('Database successfully imported')
-            self.progress_bar.setValue(100)
+            self.progress_bar.setValue(self.progress_bar.maximum())
 
             continue_button = QPushButton('Continue')
             continue_button.pressed.connect(self.close)
             self.progress_layout.addWidget(continue_button, 2, 0)
 
+    def remove_copied_file(self):
+        if self.copied_file and exists(self.copied_file):
+            os.remove(self.copied_file)
+
     def clean_and_strip(self, string_in):
         """
         Method to convert any characters that won't work properly with the new version
         """
         if string_in:
-            string_out = string_in.strip()
+            string_out = str(string_in).strip()
             string_out = re.sub('"', '\'', string_out)
             string_out = re.sub(' +', ' ', string_out)
             string_out = re.sub('\n', '<br />', string_out)
@@ -0,0 +1,236 @@
+import re
+import sqlite3
+
+from scripture_reference import BOOKS, CHAPTER_COUNTS, OLD_TESTAMENT_BOOKS, parse_reference, split_ordinal
+
+
+def record_chapters(reference):
+    """
+    Function to find every chapter a sermon reference touches. A range spanning chapters (i.e. John 3:16-5:2) touches
+    every chapter from its first to its last.
+
+    :param str reference: The sermon reference as stored
+    :return: a set of tuples of book and chapter numbers
+    """
+    chapters = set()
+    for start, end in parse_reference(reference.replace('&quot;', '"')):
+        book, start_chapter = split_ordinal(start)[:2]
+        end_chapter = min(split_ordinal(end)[1], CHAPTER_COUNTS[book - 1])
+        for chapter in range(start_chapter, end_chapter + 1):
+            chapters.add((book, chapter))
+    return chapters
+
+
+def record_year(date):
+    """
+    Function to get the year a sermon was preached from its stored date (yyyy-MM-dd), or None if it has no date.
+    """
+    match = re.match('\\d{4}', str(date or '').strip())
+    return int(match.group()) if match else None
+
+
+class CoverageIndex:
+    """
+    CoverageIndex keeps materialized summaries of how much of the canon the user has preached. Each record's reference
+    is parsed once, when it is saved, into the chapters it covers; the summary tables (sermons and last date preached
+    per chapter and per book, and sermons per year) are then updated for only the chapters, books, and years the
+    record touched, so that the coverage report reads a few hundred summary rows instead of re-parsing every reference.
+    """
+    # above this many changed records, it's faster to rebuild the summaries outright than key by key
+    bulk_size = 100
+
+    def __init__(self, db_loc):
+        """
+        :param str db_loc: The location of the user's database
+        """
+        self.db_loc = db_loc
+        self.synced = False
+
+    def create_tables(self, cursor):
+        cursor.execute(
+            'CREATE TABLE IF NOT EXISTS coverage_records (record_id INTEGER PRIMARY KEY, date TEXT, year INTEGER)')
+        cursor.execute(
+            'CREATE TABLE IF NOT EXISTS coverage_record_chapters (record_id INTEGER, book INTEGER, chapter INTEGER)')
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS coverage_record_chapters_record ON coverage_record_chapters (record_id)')
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS coverage_record_chapters_chapter ON coverage_record_chapters (book, chapter)')
+        cursor.execute(
+            'CREATE TABLE IF NOT EXISTS coverage_chapters (book INTEGER, chapter INTEGER, sermons INTEGER, '
+            'last_date TEXT, PRIMARY KEY (book, chapter))')
+        cursor.execute(
+            'CREATE TABLE IF NOT EXISTS coverage_books (book INTEGER PRIMARY KEY, sermons INTEGER, '
+            'chapters_preached INTEGER, last_date TEXT)')
+        cursor.execute('CREATE TABLE IF NOT EXISTS coverage_years (year INTEGER PRIMARY KEY, sermons INTEGER)')
+
+    def sync(self):
+        """
+        Method to add any records that haven't been summarized yet and remove any that were deleted.
+        """
+        conn = sqlite3.connect(self.db_loc, timeout=30)
+        cursor = conn.cursor()
+        self.create_tables(cursor)
+        conn.commit()
+        record_ids = set(row[0] for row in cursor.execute('SELECT ID FROM sermon_prep_database'))
+        indexed_ids = set(row[0] for row in cursor.execute('SELECT record_id FROM coverage_records'))
+        conn.close()
+
+        stale_ids = list(indexed_ids - record_ids)
+        if len(stale_ids) > 0:
+            self.remove_records(stale_ids)
+        missing_ids = list(record_ids - indexed_ids)
+        if len(missing_ids) > 0:
+            self.update_records(missing_ids)
+        self.synced = True
+
+    def update_records(self, record_ids):
+        """
+        Method to re-parse the references and dates of the given records and update the summaries they affect.
+
+        :param list of int record_ids: The ID numbers of the records that have changed
+        """
+        conn = sqlite3.connect(self.db_loc, timeout=30)
+        cursor = conn.cursor()
+        self.create_tables(cursor)
+
+        bulk = len(record_ids) > self.bulk_size
+        chapters, years = self.clear_records(cursor, record_ids)
+        if bulk:
+            # read the whole table in one pass rather than looking up thousands of records one at a time
+            wanted = set(record_ids)
+            records = [
+                row for row in cursor.execute('SELECT ID, sermon_reference, date FROM sermon_prep_database').fetchall()
+                if row[0] in wanted]
+        else:
+            records = []
+            for record_id in record_ids:
+                records += cursor.execute(
+                    'SELECT ID, sermon_reference, date FROM sermon_prep_database WHERE ID = ?', (record_id,)).fetchall()
+
+        for record_id, reference, date in records:
+            date = str(date or '').strip() or None
+            year = record_year(date)
+            cursor.execute('INSERT INTO coverage_records VALUES (?, ?, ?)', (record_id, date, year))
+            years.add(year)
+
+            new_chapters = record_chapters(reference or '')
+            cursor.executemany(
+                'INSERT INTO coverage_record_chapters VALUES (?, ?, ?)',
+                [(record_id, book, chapter) for book, chapter in new_chapters])
+            chapters.update(new_chapters)
+
+        self.refresh_summaries(cursor, chapters, years, bulk)
+        conn.commit()
+        conn.close()
+
+    def remove_records(self, record_ids):
+        """
+        Method to remove deleted records from the summaries.
+
+        :param list of int record_ids: The ID numbers of the records that were deleted
+        """
+        conn = sqlite3.connect(self.db_loc, timeout=30)
+        cursor = conn.cursor()
+        self.create_tables(cursor)
+        chapters, years = self.clear_records(cursor, record_ids)
+        self.refresh_summaries(cursor, chapters, years, len(record_ids) > self.bulk_size)
+        conn.commit()
+        conn.close()
+
+    def clear_records(self, cursor, record_ids):
+        """
+        Method to remove records' chapters and dates, noting which summaries they counted toward.
+
+        :return: a tuple of the set of (book, chapter) tuples and the set of years the records were counted in
+        """
+        chapters = set()
+        years = set()
+        for record_id in record_ids:
+            chapters.update(cursor.execute(
+                'SELECT book, chapter FROM coverage_record_chapters WHERE record_id = ?', (record_id,)).fetchall())
+            years.update(row[0] for row in cursor.execute(
+                'SELECT year FROM coverage_records WHERE record_id = ?', (record_id,)))
+            cursor.execute('DELETE FROM coverage_record_chapters WHERE record_id = ?', (record_id,))
+            cursor.execute('DELETE FROM coverage_records WHERE record_id = ?', (record_id,))
+        return chapters, years
+
+    def refresh_summaries(self, cursor, chapters, years, rebuild=False):
+        """
+        Method to recount the summaries of the given chapters, their books, and the given years.
+
+        :param sqlite3.Cursor cursor: A cursor on the user's database
+        :param set of tuple chapters: The (book, chapter) tuples whose counts may have changed
+        :param set of int years: The years whose counts may have changed
+        :param boolean rebuild: True to recount every summary rather than only the given ones
+        """
+        chapter_sql = (
+            'SELECT c.book, c.chapter, COUNT(DISTINCT c.record_id), MAX(r.date) FROM coverage_record_chapters c '
+            'JOIN coverage_records r ON r.record_id = c.record_id')
+        book_sql = (
+            'SELECT c.book, COUNT(DISTINCT c.record_id), COUNT(DISTINCT c.chapter), MAX(r.date) '
+            'FROM coverage_record_chapters c JOIN coverage_records r ON r.record_id = c.record_id')
+        year_sql = 'SELECT year, COUNT(*) FROM coverage_records WHERE year IS NOT NULL'
+
+        if rebuild:
+            for table in ['coverage_chapters', 'coverage_books', 'coverage_years']:
+                cursor.execute('DELETE FROM ' + table)
+            cursor.execute('INSERT INTO coverage_chapters ' + chapter_sql + ' GROUP BY c.book, c.chapter')
+            cursor.execute('INSERT INTO coverage_books ' + book_sql + ' GROUP BY c.book')
+            cursor.execute('INSERT INTO coverage_years ' + year_sql + ' GROUP BY year')
+            return
+
+        for book, chapter in chapters:
+            cursor.execute('DELETE FROM coverage_chapters WHERE book = ? AND chapter = ?', (book, chapter))
+            cursor.execute(
+                'INSERT INTO coverage_chapters ' + chapter_sql + ' WHERE c.book = ? AND c.chapter = ? '
+                'GROUP BY c.book, c.chapter', (book, chapter))
+        for book in set(chapter[0] for chapter in chapters):
+            cursor.execute('DELETE FROM coverage_books WHERE book = ?', (book,))
+            cursor.execute('INSERT INTO coverage_books ' + book_sql + ' WHERE c.book = ? GROUP BY c.book', (book,))
+        for year in years:
+            if year is None:
+                continue
+            cursor.execute('DELETE FROM coverage_years WHERE year = ?', (year,))
+            cursor.execute('INSERT INTO coverage_years ' + year_sql + ' AND year = ? GROUP BY year', (year,))
+
+    def get_report(self):
+        """
+        Method to read the summaries for the coverage report.
+
+        :return: a dict of 'chapters': {(book, chapter): (sermons, last date)}, 'books': a list of (book, sermons,
+            chapters preached, chapter count, last date) tuples in canonical order, 'years': a list of (year, sermons)
+            tuples, 'testaments': a tuple of the sermons on Old and New Testament passages, and 'untouched': the books
+            ordered from the longest since preached on (never preached first)
+        """
+        if not self.synced:
+            self.sync()
+
+        conn = sqlite3.connect(self.db_loc, timeout=30)
+        cursor = conn.cursor()
+        chapters = dict(
+            ((book, chapter), (sermons, last_date)) for book, chapter, sermons, last_date in cursor.execute(
+                'SELECT book, chapter, sermons, last_date FROM coverage_chapters'))
+        book_rows = dict(
+            (row[0], row[1:]) for row in cursor.execute(
+                'SELECT book, sermons, chapters_preached, last_date FROM coverage_books'))
+        years = cursor.execute('SELECT year, sermons FROM coverage_years ORDER BY year').fetchall()
+        # a sermon on passages from both testaments counts toward each
+        testaments = cursor.execute(
+            'SELECT COUNT(DISTINCT CASE WHEN book <= ? THEN record_id END), '
+            'COUNT(DISTINCT CASE WHEN book > ? THEN record_id END) FROM coverage_record_chapters',
+            (OLD_TESTAMENT_BOOKS, OLD_TESTAMENT_BOOKS)).fetchone()
+        conn.close()
+
+        books = []
+        for book in range(1, len(BOOKS) + 1):
+            sermons, chapters_preached, last_date = book_rows.get(book, (0, 0, None))
+            books.append((book, sermons, chapters_preached, CHAPTER_COUNTS[book - 1], last_date))
+        untouched = sorted(books, key=lambda row: (row[4] is not None, row[4] or '', row[0]))
+
+        return {
+            'chapters': chapters,
+            'books': books,
+            'years': years,
+            'testaments': testaments,
+            'untouched': untouched
+        }
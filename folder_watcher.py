@@ -0,0 +1,106 @@
+from PyQt6.QtCore import QFileSystemWatcher, QTimer
+
+from runnables import ImportSermons
+
+
+class FolderWatcher:
+    """
+    FolderWatcher imports sermons saved into the user's watched folder as they appear or change. The folder is watched
+    for changes, and also looked through every few minutes, since changes in its subfolders or on a network drive
+    aren't always reported. Either way, the looking and importing is done by an ImportSermons job on the import thread
+    pool, and the import manifest means only new or changed files are ever read.
+    """
+    # word processors write a document in several steps, so the import waits for a pause in the folder's changes
+    settle_interval = 5000
+    scan_interval = 5 * 60 * 1000
+
+    def __init__(self, gui):
+        """
+        :param GUI gui: The program's GUI object
+        """
+        self.gui = gui
+        self.folder = None
+        self.import_runnable = None
+        self.pending = False
+
+        # files that couldn't be imported are passed over until they change, rather than failing on every look
+        self.failed = {}
+
+        self.watcher = QFileSystemWatcher()
+        self.watcher.directoryChanged.connect(self.folder_changed)
+
+        self.settle_timer = QTimer()
+        self.settle_timer.setSingleShot(True)
+        self.settle_timer.setInterval(self.settle_interval)
+        self.settle_timer.timeout.connect(self.import_changes)
+
+        self.scan_timer = QTimer()
+        self.scan_timer.setInterval(self.scan_interval)
+        self.scan_timer.timeout.connect(self.import_changes)
+
+    def start(self, folder):
+        """
+        Method to begin watching a folder, first importing anything saved there since it was last looked at.
+
+        :param str folder: The folder to watch
+        """
+        self.stop()
+        self.folder = folder
+        self.failed = {}
+        if not self.watcher.addPath(folder):
+            self.gui.main.write_to_log('FolderWatcher.start: unable to watch ' + folder)
+        self.scan_timer.start()
+        self.import_changes()
+
+    def stop(self):
+        """
+        Method to stop watching the folder. An import already under way is left to finish.
+        """
+        if len(self.watcher.directories()) > 0:
+            self.watcher.removePaths(self.watcher.directories())
+        self.settle_timer.stop()
+        self.scan_timer.stop()
+        self.folder = None
+        self.pending = False
+
+    def folder_changed(self, path):
+        self.settle_timer.start()
+
+    def import_changes(self):
+        """
+        Method to import whatever is new or changed in the watched folder, unless an import is already under way, in
+        which case the folder is looked at again once it's done.
+        """
+        if not self.folder:
+            return
+        if self.import_runnable or self.gui.sermon_import:
+            self.pending = True
+            return
+
+        self.import_runnable = ImportSermons(self.gui.main, self.folder, True, self.failed)
+        self.import_runnable.signals.finished.connect(self.import_done)
+        self.gui.import_thread_pool.start(self.import_runnable)
+
+    def import_done(self, result):
+        """
+        Method called when an import from the watched folder has finished, to show its sermons without interrupting
+        the user.
+
+        :param dict result: The import's results, as given by ImportSermons
+        """
+        self.import_runnable = None
+        self.failed.update(result['failed'])
+        if len(result['new_ids']) + len(result['updated_ids']) + len(result['errors']) > 0:
+            self.gui.main.insert_imports(result, quiet=True)
+
+        if self.pending:
+            self.pending = False
+            self.settle_timer.start()
+
+    def cancel(self):
+        """
+        Method to stop watching and stop any import under way, as when the program is closing.
+        """
+        self.stop()
+        if self.import_runnable:
+            self.import_runnable.cancel()
@@ -1,81 +1,38 @@
-import datetime
 import os.path
-import re
-import tempfile
-import zipfile
-from os.path import exists
-from xml.etree import ElementTree
+import time
 
-from PyQt6.QtWidgets import QFileDialog, QMessageBox
+from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QFileDialog, QMessageBox, QProgressDialog
+
+from runnables import ImportSermons
+
+
+def describe_time(seconds):
+    """
+    Function to describe roughly how long the rest of an import will take.
+
+    :param float seconds: The estimated number of seconds remaining
+    """
+    if seconds < 60:
+        return 'Less than a minute remaining'
+    minutes = round(seconds / 60)
+    if minutes == 1:
+        return 'About a minute remaining'
+    if minutes < 90:
+        return 'About ' + str(minutes) + ' minutes remaining'
+    return 'About ' + str(round(minutes / 60, 1)) + ' hours remaining'
 
 
 class GetFromDocx:
     """
     GetFromDocx is a class that will parse data from .docx, .odt, or .txt files so they can be imported as
-    database entries
+    database entries. The import runs in the background, showing its progress in a dialog that can cancel it, so the
+    program can still be used while a large folder is imported.
     """
     def __init__(self, gui):
         self.gui = gui
-        self.books = [
-            'genesis',
-            'exodus',
-            'leviticus',
-            'numbers',
-            'deuteronomy',
-            'joshua',
-            'judges',
-            'ruth',
-            'samuel',
-            'kings',
-            'chronicles',
-            'ezra',
-            'nehemiah',
-            'esther',
-            'job',
-            'psalms',
-            'psalm',
-            'proverbs',
-            'ecclesiastes',
-            'song',
-            'isaiah',
-            'jeremiah',
-            'lamentations',
-            'ezekiel',
-            'daniel',
-            'hosea',
-            'joel',
-            'amos',
-            'obadiah',
-            'jonah',
-            'micah',
-            'nahum',
-            'habakkuk',
-            'zephaniah',
-            'haggai',
-            'zechariah',
-            'malachi',
-            'matthew',
-            'mark',
-            'luke',
-            'john',
-            'acts',
-            'romans',
-            'corinthians',
-            'galatians',
-            'ephesians',
-            'philippians',
-            'colossians',
-            'thessalonians',
-            'timothy',
-            'titus',
-            'philemon',
-            'hebrews',
-            'james',
-            'peter',
-            'john',
-            'jude',
-            'revelation'
-        ]
+        self.import_runnable = None
+        self.progress_dialog = None
         folder = self.get_folder()
         if folder:
             # give the option to also recurse subdirectories of the user's folder
@@ -105,177 +62,106 @@ class GetFromDocx:
 
     def parse_files(self, folder, recurse):
         """
-        Method to parse the files contained in the user's directory.
+        Method to start importing the files contained in the user's directory. The files are parsed in parallel by a
+        pool of worker processes as they are found, and the sermons are written to the database in batches as they
+        are parsed. Files already imported are skipped, so a cancelled or interrupted import carries on where it left
+        off.
 
         :param str folder: The user's chosen directory.
         :param boolean recurse: Recurse subdirectories.
         """
-        self.gui.open_import_splash.emit()
-        file_list = []
-
-        # get a list of file names located in the user's directory
-        if recurse:
-            walk = os.walk(folder, True, None, True)
-            for item in walk:
-                self.gui.change_import_splash_dir.emit('Looking in ' + item[0])
-                if len(item[2]) > 0:
-                    for file in item[2]:
-                        if '.docx' in file and not '~' in file: # skip over MS temporary files
-                            file_list.append(item[0] + '/' + file)
-                            self.gui.change_import_splash_file.emit('Found ' + file)
-                        elif '.txt' in file or '.odt' in file:
-                            file_list.append(item[0] + '/' + file)
-                            self.gui.change_import_splash_file.emit('Found ' + file)
-        else:
-            self.gui.change_import_splash_dir.emit('Looking in ' + folder)
-            for file in os.listdir(folder):
-                if '.docx' in file and not '~' in file:
-                    file_list.append(folder + '/' + file)
-                    self.gui.change_import_splash_file.emit('Found ' + file)
-                elif '.txt' in file or '.odt' in file:
-                    file_list.append(folder + '/' + file)
-                    self.gui.change_import_splash_file.emit('Found ' + file)
-
-        errors = []
-        sermons = []
-        self.gui.change_import_splash_dir.emit('Converting')
-        for i in range(0, len(file_list)):
-            # first, attempt to extract reference and date from file name
-            self.gui.change_import_splash_file.emit(file_list[i])
-            file_name_split = file_list[i].split('/')
-            file_name = file_name_split[len(file_name_split) - 1]
-            period_split = file_name.split('.')
-            if len(period_split) > 2:
-                split = period_split
-            else:
-                split = file_name.split(' ')
-
-            index = 0
-            date = ''
-            reference = ''
-            date_error = True
-            reference_error = True
-            for item in split:
-                try:
-                    date = datetime.datetime.strptime(item, '%Y-%m-%d')
-                    date = item
-                    date_error = False
-                except ValueError:
-                    pass
-
-                for book in self.books:
-                    if book in item.lower():
-                        try:
-                            item = item[0].upper() + item[1:len(item)]
-                            reference = item + ' ' + period_split[index + 1] + ':' + period_split[index + 2]
-                            reference_error = False
-                        except IndexError:
-                            pass
-                index += 1
-
-            if date_error and reference_error:
-                errors.append([file_list[i], 'Unable to parse date or scripture reference from file name'])
-            elif date_error:
-                errors.append([file_list[i], 'Unable to parse date from file name'])
-            elif reference_error:
-                errors.append([file_list[i], 'Unable to parse scripture reference from file name'])
-
-            if '.docx' in file_list[i].lower():
-                # first, unzip the .docx file and extract the document.xml file
-                file_loc = file_list[i]
-                unzip_folder = tempfile.gettempdir() + '/spd_zip'
-                if not exists(unzip_folder):
-                    os.mkdir(unzip_folder)
-                unzip_success = False
-                try:
-                    with zipfile.ZipFile(file_loc, 'r') as zipped:
-                        zipped.extractall(unzip_folder)
-                        unzip_success = True
-                except zipfile.BadZipfile:
-                    errors.append([file_list[i], 'Not a valid .docx file'])
-                    unzip_success = False
-
-                if unzip_success:
-                    document_file = unzip_folder + '/word/document.xml'
-
-                    tree = ElementTree.parse(document_file)
-                    root = tree.getroot()
-
-                    sermon_text = ''
-                    text_found = False
-                    # iterate through the tags in document.xml and extract the paragraphs therein
-                    for elem in root.iter():
-                        tag = re.sub('{.*?}', '', elem.tag)
-                        if tag == 'p':
-                            for p_elem in elem.iter():
-                                tag = re.sub('{.*?}', '', p_elem.tag)
-                                if tag == 'r':
-                                    for r_elem in p_elem.iter():
-                                        tag = re.sub('{.*?}', '', r_elem.tag)
-                                        if tag == 't':
-                                            for t_elem in r_elem.iter():
-                                                if len(sermon_text.strip()) > 0:
-                                                    text_found = True
-                                                sermon_text += str(t_elem.text)
-                            sermon_text += '\n\n'
-
-                    if not text_found:
-                        errors.append([file_list[i], 'Unable to find any text in file'])
-                    else:
-                        sermons.append([date, reference, sermon_text, file_name])
+        self.found = 0
+        self.parsed = 0
+        self.inserted = 0
+        self.errors = 0
+        self.directory = folder
+        self.discovery_done = False
+        self.start_time = time.monotonic()
+
+        self.progress_dialog = QProgressDialog('Looking for sermon files...', 'Cancel', 0, 0, self.gui)
+        self.progress_dialog.setWindowTitle('Importing Sermons')
+        self.progress_dialog.setWindowModality(Qt.WindowModality.NonModal)
+        self.progress_dialog.setAutoClose(False)
+        self.progress_dialog.setAutoReset(False)
+        self.progress_dialog.setMinimumDuration(0)
+        self.progress_dialog.setMinimumWidth(500)
+
+        self.import_runnable = ImportSermons(self.gui.main, folder, recurse)
+        self.import_runnable.signals.discovered.connect(self.files_discovered)
+        self.import_runnable.signals.parsed.connect(self.files_parsed)
+        self.import_runnable.signals.inserted.connect(self.sermons_inserted)
+        self.import_runnable.signals.errors.connect(self.errors_found)
+        self.import_runnable.signals.finished.connect(self.import_done)
+        self.progress_dialog.canceled.connect(self.cancel)
+        self.gui.sermon_import = self
+        self.gui.import_thread_pool.start(self.import_runnable)
+
+    def cancel(self):
+        """
+        Method to stop the import once the files being parsed are done.
+        """
+        self.import_runnable.cancel()
+        self.progress_dialog.setLabelText('Stopping after the files being read...')
+        self.progress_dialog.setCancelButton(None)
 
-            elif '.odt' in file_list[i].lower():
-                # first, unzip the .odt file and extract content.xml
-                file_loc = file_list[i]
-                unzip_folder = tempfile.gettempdir() + '/spd_zip'
-                if not exists(unzip_folder):
-                    os.mkdir(unzip_folder)
-                unzip_success = False
-                try:
-                    with zipfile.ZipFile(file_loc, 'r') as zipped:
-                        zipped.extractall(unzip_folder)
-                        unzip_success = True
-                except zipfile.BadZipfile:
-                    errors.append([file_list[i], 'Not a valid .odt file'])
-                    unzip_success = False
+    def files_discovered(self, found, directory):
+        """
+        Method called as files to import are found.
 
-                if unzip_success:
-                    document_file = unzip_folder + '/content.xml'
+        :param int found: The number of files found so far
+        :param str directory: The folder being looked in, or an empty string once every file has been found
+        """
+        self.found = found
+        if directory:
+            self.directory = directory
+        else:
+            self.discovery_done = True
+        self.progress_dialog.setMaximum(max(found, 1))
+        self.show_progress()
 
-                    tree = ElementTree.parse(document_file)
-                    root = tree.getroot()
+    def files_parsed(self, parsed):
+        self.parsed = parsed
+        self.progress_dialog.setValue(min(parsed, self.progress_dialog.maximum()))
+        self.show_progress()
 
-                    sermon_text = ''
-                    # iterate through the tags in content.xml and extract the paragraphs therein
-                    for elem in root.iter():
-                        tag = re.sub('{.*?}', '', elem.tag)
-                        if tag == 'document-content':
-                            for doc_con in elem.iter():
-                                tag = re.sub('{.*?}', '', doc_con.tag)
-                                if tag == 'body':
-                                    for bod in doc_con.iter():
-                                        tag = re.sub('{.*?}', '', bod.tag)
-                                        if tag == 'p':
-                                            for p in bod.iter():
-                                                for item in p.iter():
-                                                    if item.text:
-                                                        if not item.text in sermon_text:
-                                                            sermon_text += item.text
-                                            sermon_text += '\n'
-                    if len(sermon_text) > 0:
-                        sermons.append([date, reference, sermon_text, file_name])
-                    else:
-                        errors.append([file_list[i], 'Unable to find any text in file'])
+    def sermons_inserted(self, inserted):
+        self.inserted = inserted
 
-            elif '.txt' in file_list[i].lower():
-                with open(file_list[i]) as file:
-                    sermon_text = file.read()
-                if len(sermon_text) > 0:
-                    sermons.append([date, reference, sermon_text, file_name])
-                else:
-                    errors.append([file_list[i], 'Unable to find any text in file'])
+    def errors_found(self, errors):
+        self.errors = errors
 
-        self.gui.main.insert_imports(errors, sermons)
-        self.gui.close_import_splash.emit()
+    def show_progress(self):
+        """
+        Method to show how far the import has come and, once every file has been found, about how long it has left,
+        going by how quickly the files so far have been read.
+        """
+        if self.import_runnable.cancelled:
+            return
+        lines = []
+        if self.discovery_done:
+            lines.append('Found ' + str(self.found) + ' new or changed files')
+        else:
+            lines.append('Looking in ' + self.directory)
+            lines.append('Found ' + str(self.found) + ' files so far')
+        lines.append(
+            'Read ' + str(self.parsed) + ', imported ' + str(self.inserted) + ', ' + str(self.errors) + ' with errors')
+        if self.discovery_done and self.parsed >= 10:
+            elapsed = time.monotonic() - self.start_time
+            lines.append(describe_time(elapsed / self.parsed * (self.found - self.parsed)))
+        self.progress_dialog.setLabelText('\n'.join(lines))
+
+    def import_done(self, result):
+        """
+        Method called when the import has finished, been cancelled, or stopped on an error, to report how it went.
 
-        self.gui.tab_widget.setCurrentWidget(self.gui.sermon_widget)
+        :param dict result: The import's results, as given by ImportSermons
+        """
+        self.progress_dialog.close()
+        self.progress_dialog.deleteLater()
+        self.progress_dialog = None
+        self.import_runnable = None
+        self.gui.sermon_import = None
+
+        self.gui.main.insert_imports(result)
+        if len(result['new_ids']) > 0:
+            self.gui.tab_widget.setCurrentWidget(self.gui.sermon_widget)
@@ -0,0 +1,183 @@
+import os.path
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QComboBox, QDialog, QDialogButtonBox, QFileDialog, QGridLayout, QLabel, QMessageBox, \
+    QProgressDialog, QScrollArea, QWidget
+
+from record_files import RecordFile, guess_mapping
+from runnables import ImportRecords
+from search_index import FIELDS
+
+
+class GetFromRecords:
+    """
+    GetFromRecords imports sermons exported from other programs as a .csv file or a JSON Lines file. The user matches
+    the file's columns to the program's fields, and the rows are then read and written in the background, showing
+    their progress in a dialog that can cancel the import.
+    """
+    def __init__(self, gui):
+        self.gui = gui
+        self.import_runnable = None
+        self.progress_dialog = None
+
+        file_loc = QFileDialog.getOpenFileName(
+            self.gui,
+            'Choose File',
+            os.path.expanduser('~/Documents'),
+            'Sermon Records (*.csv *.jsonl *.ndjson);;All Files (*)'
+        )[0]
+        if not file_loc:
+            return
+
+        try:
+            record_file = RecordFile(file_loc)
+            columns = record_file.columns()
+            sample = record_file.sample()
+        except Exception as ex:
+            self.gui.main.write_to_log('GetFromRecords.__init__: ' + str(ex))
+            QMessageBox.warning(
+                self.gui,
+                'Import Error',
+                'An error occurred while reading the file ' + file_loc + ':\n\n' + str(ex),
+                QMessageBox.StandardButton.Ok
+            )
+            return
+        if len(columns) == 0:
+            QMessageBox.warning(
+                self.gui,
+                'Import Error',
+                'No columns were found in ' + file_loc + '. A .csv file needs a header row naming its columns, and a '
+                'JSON Lines file needs one object of named values on each line.',
+                QMessageBox.StandardButton.Ok
+            )
+            return
+
+        mapping = self.ask_for_mapping(columns, sample)
+        if mapping:
+            self.import_records(record_file, mapping)
+
+    def ask_for_mapping(self, columns, sample):
+        """
+        Method to ask the user which field each of the file's columns is to be imported into, starting from the
+        columns whose names match a field.
+
+        :param list of str columns: The names of the file's columns
+        :param dict sample: The first row of the file, to show what each column holds
+        :return: a dict of column -> field, or None if the user cancelled or didn't choose any fields
+        """
+        labels = [self.gui.main.user_settings['label' + str(index + 1)] for index in range(len(FIELDS))]
+        guessed = guess_mapping(columns, labels)
+
+        dialog = QDialog(self.gui)
+        dialog.setWindowTitle('Choose Fields')
+        layout = QGridLayout()
+        dialog.setLayout(layout)
+
+        layout.addWidget(QLabel(
+            'Choose the field each column of the file will be imported into. Each row of the file becomes a new '
+            'record, numbered after your existing records.'), 0, 0)
+
+        column_widget = QWidget()
+        column_layout = QGridLayout()
+        column_widget.setLayout(column_layout)
+        column_layout.addWidget(QLabel('<strong>Column</strong>'), 0, 0)
+        column_layout.addWidget(QLabel('<strong>First Row</strong>'), 0, 1)
+        column_layout.addWidget(QLabel('<strong>Import Into</strong>'), 0, 2)
+
+        combo_boxes = []
+        for row, column in enumerate(columns, 1):
+            column_layout.addWidget(QLabel(column), row, 0)
+
+            value = ' '.join(str(sample.get(column, '')).split())
+            if len(value) > 50:
+                value = value[:50] + '...'
+            sample_label = QLabel(value)
+            sample_label.setTextFormat(Qt.TextFormat.PlainText)
+            column_layout.addWidget(sample_label, row, 1)
+
+            combo_box = QComboBox()
+            combo_box.addItem('(Don\'t Import)', None)
+            for field, label in zip(FIELDS, labels):
+                combo_box.addItem(label, field)
+            if column in guessed:
+                combo_box.setCurrentIndex(FIELDS.index(guessed[column]) + 1)
+            column_layout.addWidget(combo_box, row, 2)
+            combo_boxes.append(combo_box)
+
+        scroll_area = QScrollArea()
+        scroll_area.setWidget(column_widget)
+        scroll_area.setWidgetResizable(True)
+        scroll_area.setMinimumWidth(column_widget.sizeHint().width() + 40)
+        layout.addWidget(scroll_area, 1, 0)
+
+        button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        button_box.accepted.connect(dialog.accept)
+        button_box.rejected.connect(dialog.reject)
+        layout.addWidget(button_box, 2, 0)
+
+        while True:
+            if dialog.exec() != QDialog.DialogCode.Accepted:
+                return None
+
+            mapping = {}
+            fields = []
+            for column, combo_box in zip(columns, combo_boxes):
+                field = combo_box.currentData()
+                if field:
+                    mapping[column] = field
+                    fields.append(field)
+            if len(mapping) == 0:
+                message = 'Choose a field for at least one column, or Cancel to stop the import.'
+            elif len(set(fields)) < len(fields):
+                message = 'More than one column has been chosen for the same field. Choose a different field for each.'
+            else:
+                return mapping
+            QMessageBox.warning(self.gui, 'Choose Fields', message, QMessageBox.StandardButton.Ok)
+
+    def import_records(self, record_file, mapping):
+        """
+        Method to start importing the file's rows in the background.
+
+        :param RecordFile record_file: The file to import
+        :param dict mapping: The file's column -> the field it's imported into
+        """
+        self.progress_dialog = QProgressDialog('Importing records...', 'Cancel', 0, 100, self.gui)
+        self.progress_dialog.setWindowTitle('Importing Sermons')
+        self.progress_dialog.setWindowModality(Qt.WindowModality.NonModal)
+        self.progress_dialog.setAutoClose(False)
+        self.progress_dialog.setAutoReset(False)
+        self.progress_dialog.setMinimumDuration(0)
+        self.progress_dialog.setMinimumWidth(500)
+
+        self.import_runnable = ImportRecords(self.gui.main, record_file, mapping)
+        self.import_runnable.signals.progress.connect(self.progress_dialog.setValue)
+        self.import_runnable.signals.inserted.connect(self.records_inserted)
+        self.import_runnable.signals.finished.connect(self.import_done)
+        self.progress_dialog.canceled.connect(self.cancel)
+        self.gui.sermon_import = self
+        self.gui.import_thread_pool.start(self.import_runnable)
+
+    def cancel(self):
+        self.import_runnable.cancel()
+        self.progress_dialog.setLabelText('Stopping...')
+        self.progress_dialog.setCancelButton(None)
+
+    def records_inserted(self, inserted):
+        if not self.import_runnable.cancelled:
+            self.progress_dialog.setLabelText('Imported ' + str(inserted) + ' records')
+
+    def import_done(self, result):
+        """
+        Method called when the import has finished, been cancelled, or stopped on an error, to report how it went.
+
+        :param dict result: The import's results, as given by ImportRecords
+        """
+        self.progress_dialog.close()
+        self.progress_dialog.deleteLater()
+        self.progress_dialog = None
+        self.import_runnable = None
+        self.gui.sermon_import = None
+
+        self.gui.main.insert_imports(result)
+        if len(result['new_ids']) > 0:
+            self.gui.tab_widget.setCurrentWidget(self.gui.sermon_widget)
@@ -1,16 +1,17 @@
-from os.path import exists
+import sqlite3
 
-from PyQt6.QtCore import Qt, QSize, QDate, QDateTime, pyqtSignal, QThreadPool
+from PyQt6.QtCore import Qt, QSize, QDate, QDateTime, pyqtSignal, QThreadPool, QTimer
 from PyQt6.QtGui import QIcon, QFont, QPixmap, QCloseEvent, QAction, QUndoStack, QTextCursor, QTextBlockFormat
 from PyQt6.QtWidgets import QWidget, QTabWidget, QGridLayout, QLabel, QCheckBox, QDateEdit, QTextEdit, QMainWindow, \
     QVBoxLayout, QPushButton, QTabBar
 
+from folder_watcher import FolderWatcher
 from get_scripture import GetScripture
 from spell_check_widgets import SpellCheckTextEdit, SpellCheckLineEdit
 from widgets import MenuBar, StartupSplash
-from runnables import LoadDictionary
+from runnables import LoadDictionary, FindReusedParagraphs, BuildBibleIndex, PreloadBibleIndex, ResolvePassage
 from widgets import Toolbar
-from widgets import ScriptureBox, SermonView
+from widgets import ScriptureBox, SermonView, ParallelTextBox
 
 
 class GUI(QMainWindow):
@@ -19,6 +20,7 @@ class GUI(QMainWindow):
     changes = False
     gs = None
     spell_check = None
+    sermon_import = None
     
     def __init__(self, main):
         """
@@ -53,6 +55,18 @@ class GUI(QMainWindow):
         self.main.get_scripture_list()
         self.main.backup_db()
 
+        # compile the bibles' indexes in the background if any are missing or out of date, then read the main bible's
+        # index so that the first passage looked up doesn't wait on the disk
+        self.bible_index_thread_pool = QThreadPool()
+        self.bible_index_thread_pool.setMaxThreadCount(1)
+        self.import_thread_pool = QThreadPool()
+        self.import_thread_pool.setMaxThreadCount(1)
+        if len(self.main.bible_library.get_stale()) > 0:
+            self.bible_index_thread_pool.start(BuildBibleIndex(self.main))
+        if self.main.bible_file:
+            self.gs = GetScripture(self.main)
+            self.bible_index_thread_pool.start(PreloadBibleIndex(self.main))
+
         self.change_startup_splash_text('Finishing Up')
 
         self.standard_font = QFont(self.main.user_settings['font_family'], int(self.main.user_settings['font_size']))
@@ -68,6 +82,8 @@ class GUI(QMainWindow):
         self.sermon_reference_field = SpellCheckLineEdit(self)
         self.auto_fill_checkbox = QCheckBox('Auto-fill ' + self.main.user_settings['label4'])
         self.sermon_text_edit = SpellCheckTextEdit(self)
+        self.parallel_checkbox = QCheckBox('Show Parallel Translations')
+        self.parallel_box = ParallelTextBox(self)
         self.exegesis_widget = QWidget()
         self.exegesis_layout = QGridLayout(self.exegesis_widget)
         self.outline_widget = QWidget()
@@ -77,6 +93,35 @@ class GUI(QMainWindow):
         self.sermon_widget = QWidget()
         self.sermon_layout = QGridLayout(self.sermon_widget)
         self.sermon_date_edit = QDateEdit()
+        self.illustration_text_edit = SpellCheckTextEdit(self)
+        self.illustration_reuse_label = QLabel()
+        self.manuscript_text_edit = SpellCheckTextEdit(self)
+        self.manuscript_reuse_label = QLabel()
+
+        # wait for a pause in typing before checking for reused paragraphs
+        self.reuse_thread_pool = QThreadPool()
+        self.reuse_thread_pool.setMaxThreadCount(1)
+        self.reuse_timer = QTimer()
+        self.reuse_timer.setSingleShot(True)
+        self.reuse_timer.setInterval(1500)
+        self.reuse_timer.timeout.connect(self.check_reuse)
+
+        # likewise, wait for a pause in typing a reference before looking up its passage
+        self.auto_fill_thread_pool = QThreadPool()
+        self.auto_fill_thread_pool.setMaxThreadCount(1)
+        self.auto_fill_timer = QTimer()
+        self.auto_fill_timer.setSingleShot(True)
+        self.auto_fill_timer.setInterval(300)
+        self.auto_fill_timer.timeout.connect(self.reference_settled)
+        self.auto_fill_request = 0
+        self.auto_fill_reference = None
+
+        # the pericope is filled from the lectionary when the sermon date changes, but not while a record is loading
+        # and never over a pericope the user has entered; the fills are kept to recognize them again
+        self.loading_record = False
+        self.pericope_fill = None
+        self.pericope_text_fill = None
+        self.pericope_request = 0
 
         self.light_tab_icons = [
             QIcon('resources/svg/spScriptureIcon.svg'),
@@ -95,6 +140,11 @@ class GUI(QMainWindow):
 
         self.create_gui()
 
+        # sermons saved into the watched folder are imported as they appear, starting with any saved while closed
+        self.folder_watcher = FolderWatcher(self)
+        if self.main.user_settings.get('watch_folder'):
+            self.folder_watcher.start(self.main.user_settings['watch_folder'])
+
         self.startup_splash.deleteLater()
 
     def change_startup_splash_text(self, text):
@@ -181,6 +231,7 @@ class GUI(QMainWindow):
         
         pericope_line_edit = SpellCheckLineEdit(self)
         self.scripture_layout.addWidget(pericope_line_edit, 1, 0)
+        self.pericope_field = pericope_line_edit
         
         pericope_text_label = QLabel(self.main.user_settings['label2'])
         self.scripture_layout.addWidget(pericope_text_label, 2, 0)
@@ -188,13 +239,14 @@ class GUI(QMainWindow):
         pericope_text_edit = SpellCheckTextEdit(self)
         pericope_text_edit.cursorPositionChanged.connect(self.set_style_buttons)
         self.scripture_layout.addWidget(pericope_text_edit, 3, 0)
+        self.pericope_text_edit = pericope_text_edit
         
         sermon_reference_label = QLabel(self.main.user_settings['label3'])
         self.scripture_layout.addWidget(sermon_reference_label, 0, 1)
 
-        if exists(self.main.app_dir + '/my_bible.xml'):
+        if self.main.bible_file:
             self.scripture_layout.addWidget(self.sermon_reference_field, 1, 1)
-            self.sermon_reference_field.textChanged.connect(self.auto_fill)
+            self.sermon_reference_field.textChanged.connect(self.reference_changes)
 
             self.auto_fill_checkbox.setChecked(True)
             self.scripture_layout.addWidget(self.auto_fill_checkbox, 1, 2)
@@ -203,6 +255,11 @@ class GUI(QMainWindow):
             else:
                 self.auto_fill_checkbox.setChecked(False)
             self.auto_fill_checkbox.stateChanged.connect(self.auto_fill)
+
+            self.scripture_layout.addWidget(self.parallel_checkbox, 0, 2)
+            self.parallel_checkbox.stateChanged.connect(self.toggle_parallel)
+            self.parallel_box.hide()
+            self.scripture_layout.addWidget(self.parallel_box, 0, 3, 4, 1)
         else:
             self.scripture_layout.addWidget(self.sermon_reference_field, 1, 1, 1, 2)
         
@@ -286,7 +343,7 @@ class GUI(QMainWindow):
         cps_text.cursorPositionChanged.connect(self.set_style_buttons)
         self.exegesis_layout.addWidget(cps_text, 7, 4)
 
-        scripture_box = ScriptureBox()
+        scripture_box = ScriptureBox(self)
         self.exegesis_layout.addWidget(scripture_box, 0, 6, 8, 1)
         
         self.tab_widget.addTab(self.exegesis_widget, self.light_tab_icons[1], 'Exegesis')
@@ -316,11 +373,17 @@ class GUI(QMainWindow):
         illustration_label = QLabel(self.main.user_settings['label14'])
         self.outline_layout.addWidget(illustration_label, 0, 4)
         
-        illustration_text = SpellCheckTextEdit(self)
-        illustration_text.cursorPositionChanged.connect(self.set_style_buttons)
-        self.outline_layout.addWidget(illustration_text, 1, 4)
+        self.illustration_text_edit.cursorPositionChanged.connect(self.set_style_buttons)
+        self.illustration_text_edit.textChanged.connect(self.reuse_timer.start)
+        self.outline_layout.addWidget(self.illustration_text_edit, 1, 4)
 
-        scripture_box = ScriptureBox()
+        self.illustration_reuse_label.setObjectName('reuse_label')
+        self.illustration_reuse_label.setWordWrap(True)
+        self.illustration_reuse_label.linkActivated.connect(self.open_record)
+        self.illustration_reuse_label.hide()
+        self.outline_layout.addWidget(self.illustration_reuse_label, 2, 4)
+
+        scripture_box = ScriptureBox(self)
         self.outline_layout.addWidget(scripture_box, 0, 6, 5, 1)
 
         self.tab_widget.addTab(self.outline_widget, self.light_tab_icons[2], 'Outlines')
@@ -338,7 +401,7 @@ class GUI(QMainWindow):
         research_text_edit.cursorPositionChanged.connect(self.set_style_buttons)
         self.research_layout.addWidget(research_text_edit, 1, 0)
 
-        scripture_box = ScriptureBox()
+        scripture_box = ScriptureBox(self)
         self.research_layout.addWidget(scripture_box, 0, 2, 2, 1)
         
         self.tab_widget.addTab(self.research_widget, self.light_tab_icons[3], 'Research')
@@ -384,10 +447,17 @@ class GUI(QMainWindow):
         hr_field = SpellCheckLineEdit(self)
         self.sermon_layout.addWidget(hr_field, 3, 2)
 
-        sermon_text = SpellCheckTextEdit(self)
+        sermon_text = self.manuscript_text_edit
         sermon_text.cursorPositionChanged.connect(self.set_style_buttons)
+        sermon_text.textChanged.connect(self.reuse_timer.start)
         self.sermon_layout.addWidget(sermon_text, 5, 0, 1, 4)
 
+        self.manuscript_reuse_label.setObjectName('reuse_label')
+        self.manuscript_reuse_label.setWordWrap(True)
+        self.manuscript_reuse_label.linkActivated.connect(self.open_record)
+        self.manuscript_reuse_label.hide()
+        self.sermon_layout.addWidget(self.manuscript_reuse_label, 6, 0, 1, 4)
+
         self.sermon_view_button = QPushButton()
         if self.main.user_settings['theme'] == 'dark':
             self.sermon_view_button.setIcon(QIcon('resources/svg/spSermonViewIconLight.svg'))
@@ -402,7 +472,7 @@ class GUI(QMainWindow):
         sermon_label = QLabel(self.main.user_settings['label21'])
         self.sermon_layout.addWidget(sermon_label, 4, 0)
 
-        scripture_box = ScriptureBox()
+        scripture_box = ScriptureBox(self)
         self.sermon_layout.addWidget(scripture_box, 0, 5, 6, 1)
         
         self.tab_widget.addTab(self.sermon_widget, self.light_tab_icons[4], 'Sermon')
@@ -515,6 +585,9 @@ class GUI(QMainWindow):
         :param list of str record: a list whose first element is a list of values in their proper order.
         """
         index = 1
+        self.loading_record = True
+        self.pericope_fill = None
+        self.pericope_text_fill = None
         self.setWindowTitle('Sermon Prep Database - ' + str(record[0][17]) + ' - ' + str(record[0][3]))
 
         for i in range(self.scripture_layout.count()):
@@ -637,9 +710,16 @@ class GUI(QMainWindow):
                 text_title.setText(self.sermon_reference_field.text())
 
         self.toolbar.id_label.setText('ID: ' + str(record[0][0]))
+        self.update_parallel_views()
+
+        # the loaded record's sermon text is kept rather than being replaced by a fresh lookup of its reference
+        self.auto_fill_timer.stop()
+        self.auto_fill_request += 1
+        self.auto_fill_reference = self.sermon_reference_field.text()
 
         self.apply_line_spacing()
 
+        self.loading_record = False
         self.changes = False
 
     def changes_detected(self):
@@ -651,8 +731,8 @@ class GUI(QMainWindow):
     def reference_changes(self):
         """
         When the sermon text reference TextEdit is changed, reflect those changes in the references combobox, the
-        optional sermon text box on each tab, and on the MainWindow's title. If user has imported a bible and has auto
-        fill turned on, use GetScripture to fill the sermon text TextEdit.
+        optional sermon text box on each tab, and on the MainWindow's title. Once the user pauses typing, the passage is
+        looked up (see reference_settled).
         """
         try:
             self.toolbar.references_cb.setItemText(self.toolbar.references_cb.currentIndex(), self.sermon_reference_field.text())
@@ -666,19 +746,137 @@ class GUI(QMainWindow):
                     text_title = widget.findChild(QLabel, 'text_title')
                     text_title.setText(self.sermon_reference_field.text())
 
-            if self.main.user_settings['auto_fill']:
-                if not self.gs: # only create one instance of GetScripture
-                    self.gs = GetScripture(self.main)
-
-                if ':' in self.sermon_reference_field.text(): # only attempt to get the text if there's enough to work with
-                    passage = self.gs.get_passage(self.sermon_reference_field.text())
-                    if passage and not passage == -1:
-                        self.sermon_text_edit.setText(passage)
-
+            # wait for a pause in typing before looking up the passage
+            self.auto_fill_timer.start()
             self.changes = True
         except Exception as ex:
             self.main.write_to_log(str(ex))
 
+    def reference_settled(self):
+        """
+        Method called once the user has paused typing a reference. Updates the parallel translations and, if user has
+        imported a bible and has auto fill turned on, looks up the passage in the background to fill the sermon text
+        TextEdit.
+        """
+        self.update_parallel_views()
+
+        reference = self.sermon_reference_field.text()
+        if not self.main.user_settings['auto_fill'] or not self.gs or reference == self.auto_fill_reference:
+            return
+
+        # only the result of the latest lookup is used; any still running are for references since changed
+        self.auto_fill_request += 1
+        resolve_passage = ResolvePassage(self.gs, reference, self.auto_fill_request)
+        resolve_passage.signals.finished.connect(self.show_auto_fill)
+        self.auto_fill_thread_pool.start(resolve_passage)
+
+    def show_auto_fill(self, request, reference, passage):
+        """
+        Method to put an auto-filled passage into the sermon text TextEdit, unless it is the passage already there.
+
+        :param int request: The number of the lookup that found the passage
+        :param str reference: The reference that was looked up
+        :param str passage: The text of the passage, or -1 if it wasn't found
+        """
+        if request != self.auto_fill_request or not passage or passage == -1:
+            return
+
+        self.auto_fill_reference = reference
+        if passage != self.sermon_text_edit.toPlainText():
+            self.sermon_text_edit.setText(passage)
+
+    def toggle_parallel(self):
+        """
+        Method to show or hide the parallel translations beside the Scripture tab's sermon text.
+        """
+        checked = self.parallel_checkbox.isChecked()
+        self.parallel_box.setVisible(checked)
+        self.scripture_layout.setColumnStretch(3, 1 if checked else 0)
+
+    def update_parallel_views(self, refresh_translations=False):
+        """
+        Method to show the current reference in every parallel-translation view.
+
+        :param boolean refresh_translations: True if translations have been added or removed
+        """
+        if refresh_translations:
+            for scripture_box in self.findChildren(ScriptureBox):
+                scripture_box.view_combo.setVisible(bool(self.main.bible_file))
+
+        for parallel_box in self.findChildren(ParallelTextBox):
+            if refresh_translations:
+                parallel_box.refresh_translations()
+            parallel_box.set_reference(self.sermon_reference_field.text())
+
+    def check_reuse(self):
+        """
+        Method to look, in the background, for paragraphs of the illustrations and manuscript that closely match
+        paragraphs of other sermons.
+        """
+        if len(self.main.ids) == 0 or not self.main.reuse_index:
+            return
+
+        record_id = self.main.ids[self.main.current_rec_index]
+        for field, text_edit in (('illustrations', self.illustration_text_edit),
+                                 ('manuscript', self.manuscript_text_edit)):
+            find_reused = FindReusedParagraphs(self.main, record_id, field, text_edit.toPlainText().split('\n'))
+            find_reused.signals.finished.connect(self.show_reuse)
+            self.reuse_thread_pool.start(find_reused)
+
+    def show_reuse(self, record_id, field, matches):
+        """
+        Method to list, beneath the field, the other sermons whose paragraphs closely match this field's paragraphs.
+
+        :param int record_id: The ID of the record that was checked
+        :param str field: The name of the field that was checked
+        :param list matches: The matches found by ReuseIndex.find_matches
+        """
+        if field == 'illustrations':
+            label = self.illustration_reuse_label
+        else:
+            label = self.manuscript_reuse_label
+
+        # the user may have moved on to another record while the check was running
+        if len(self.main.ids) == 0 or record_id != self.main.ids[self.main.current_rec_index]:
+            return
+
+        lines = []
+        listed = []
+        conn = sqlite3.connect(self.main.db_loc)
+        cur = conn.cursor()
+        for paragraph, other_id, other_field, similarity, preview in matches:
+            if (paragraph, other_id) in listed:
+                continue
+            listed.append((paragraph, other_id))
+            other = cur.execute(
+                'SELECT date, sermon_reference FROM sermon_prep_database WHERE ID = ?', (other_id,)).fetchone()
+            if other:
+                lines.append(
+                    'Paragraph ' + str(paragraph + 1) + ' closely matches <a href="' + str(other_id) + '">'
+                    + str(other[0]) + ' - ' + str(other[1]) + '</a> (' + str(round(similarity * 100)) + '%)')
+        conn.close()
+
+        if len(lines) > 0:
+            if len(lines) > 5:
+                lines = lines[:5] + ['...and ' + str(len(lines) - 5) + ' more']
+            label.setText('<br>'.join(lines))
+            label.show()
+        else:
+            label.clear()
+            label.hide()
+
+    def open_record(self, record_id):
+        """
+        Method to bring up a record by its ID, asking to save changes first.
+
+        :param str record_id: The ID of the record to show
+        """
+        goon = True
+        if self.changes:
+            goon = self.main.ask_save()
+        if goon and int(record_id) in self.main.ids:
+            self.main.get_by_index(self.main.ids.index(int(record_id)))
+
     def auto_fill(self):
         """
         Method to change the self.spd.auto_fill value based on user input then save that change to the database.
@@ -686,7 +884,8 @@ class GUI(QMainWindow):
         self.main.user_settings['auto_fill'] = self.auto_fill_checkbox.isChecked()
         self.main.save_user_settings()
         if self.auto_fill_checkbox.isChecked():
-            self.reference_changes()
+            self.auto_fill_reference = None
+            self.reference_settled()
 
     def text_changes(self):
         """
@@ -710,6 +909,62 @@ class GUI(QMainWindow):
             'Sermon Prep Database - ' + self.sermon_date_edit.text() + ' - ' + self.sermon_reference_field.text())
         self.changes = True
 
+        if not self.loading_record:
+            self.fill_pericope()
+
+    def fill_pericope(self):
+        """
+        Method to fill the pericope with the lectionary day of the sermon date and the pericope texts with its readings.
+        If user has imported a bible, the readings are then looked up in the background so that their text is filled
+        in as well. A pericope or texts the user has entered are left alone; ones filled for an earlier date are
+        replaced.
+        """
+        if not self.main.user_settings['auto_fill'] or not self.main.lectionary:
+            return
+        pericope = self.pericope_field.text().strip()
+        if len(pericope) > 0 and pericope != self.pericope_fill:
+            return
+
+        try:
+            day = self.main.lectionary.get_day(self.sermon_date_edit.date().toString('yyyy-MM-dd'))
+        except Exception as ex:
+            self.main.write_to_log(str(ex))
+            return
+        if not day:
+            return
+
+        name, year, readings = day
+        self.pericope_fill = name + ' (Year ' + year + ')'
+        self.pericope_field.setText(self.pericope_fill)
+
+        texts = self.pericope_text_edit.toPlainText().strip()
+        if len(texts) > 0 and texts != self.pericope_text_fill:
+            return
+        self.pericope_text_edit.setText(readings)
+        self.pericope_text_fill = self.pericope_text_edit.toPlainText().strip()
+        if self.gs:
+            self.pericope_request += 1
+            resolve_passage = ResolvePassage(self.gs, readings.replace('\n', '; '), self.pericope_request)
+            resolve_passage.signals.finished.connect(self.show_pericope_texts)
+            self.auto_fill_thread_pool.start(resolve_passage)
+
+    def show_pericope_texts(self, request, readings, passages):
+        """
+        Method to put the text of the lectionary readings into the pericope texts TextEdit, unless the user has
+        changed the texts since they were filled.
+
+        :param int request: The number of the lookup that found the passages
+        :param str readings: The readings that were looked up
+        :param str passages: The text of the readings, or -1 if they weren't found
+        """
+        if request != self.pericope_request or not passages or passages == -1:
+            return
+        if self.pericope_text_edit.toPlainText().strip() != self.pericope_text_fill:
+            return
+
+        self.pericope_text_edit.setText(passages)
+        self.pericope_text_fill = self.pericope_text_edit.toPlainText().strip()
+
     def do_exit(self, evt):
         """
         Method to ask if changes are to be saved before exiting the program.
@@ -718,6 +973,11 @@ class GUI(QMainWindow):
         if self.changes:
             goon = self.main.ask_save()
         if goon:
+            # a running import stops after the files being read; what it has read is kept for the next import
+            self.folder_watcher.cancel()
+            if self.sermon_import:
+                self.sermon_import.import_runnable.cancel()
+            self.import_thread_pool.waitForDone()
             self.deleteLater()
             evt.accept()
 
@@ -729,10 +989,19 @@ class GUI(QMainWindow):
         evt.ignore()
         self.do_exit(evt)
 
+    def expand_reference(self):
+        """
+        Method to expand the scripture reference at the cursor of the text field that has focus.
+        """
+        component = self.focusWidget()
+        if isinstance(component, SpellCheckTextEdit):
+            component.expand_reference()
+
     def keyPressEvent(self, event):
         """
         Add keyboard shortcuts for common user tasks:
             Ctrl-Shift-B: Turn on bullets
+            Ctrl-Shift-E: Expand the scripture reference at the cursor
             Ctrl-B: Bold
             Ctrl-I: Italic
             Ctrl-U: Underline
@@ -750,6 +1019,10 @@ class GUI(QMainWindow):
             else:
                 self.toolbar.bullet_button.setChecked(True)
             self.toolbar.bold_button.blockSignals(False)
+        elif ((event.modifiers() & Qt.KeyboardModifier.ControlModifier)
+                and (event.modifiers() & Qt.KeyboardModifier.ShiftModifier)
+                and event.key() == Qt.Key.Key_E):
+            self.expand_reference()
         elif event.modifiers() & Qt.KeyboardModifier.ControlModifier and event.key() == Qt.Key.Key_B:
             self.toolbar.set_bold()
             self.toolbar.bold_button.blockSignals(True)
@@ -0,0 +1,585 @@
+"""
+Benchmarks for importing sermons from files. A synthetic folder tree of sermons is generated: .docx, .odt, and .txt
+files from a few hundred to many thousands of words, with bold, italic, and underlined text and lists, named in the
+ways people commonly name their sermon files (or not named for the sermon at all, leaving its details to its opening
+headings), and nested in folders by year and series. Among them are the files a real folder has: corrupt and truncated
+documents, empty files, documents with no text, Word's lock files, and copies of the same sermon under another name.
+
+Each stage of the import is then timed on its own, one file after another (finding the files, unzipping, parsing the
+XML, hashing, finding the date, reference, and title, and writing to the database), followed by the import from end to
+end as ImportSermons runs it, with its pool of worker processes, and the same import again, in which the import
+manifest should skip every file but those that couldn't be imported. The memory used is measured as well.
+
+Run from the program's folder:
+
+    python import_benchmark.py [--files 500] [--seed 1] [--workers 4] [--keep folder] [--save results.json]
+        [--compare results.json]
+
+With --compare, any timing more than --tolerance percent slower than the saved results is reported as a regression
+and the benchmark exits with a non-zero status.
+"""
+
+import argparse
+import datetime
+import html
+import json
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+from bible_benchmark import WEIGHTS, WORDS, flatten
+from scripture_reference import BOOKS, CHAPTER_COUNTS
+from search_index import FIELDS, field_plain_text
+from sermon_files import BODY_PARAGRAPHS, DOCUMENT_PARTS, SermonWriter, content_hash, document_paragraphs, \
+    find_sermon_files, paragraphs_html, parse_sermon_files, text_hash, text_paragraphs
+from sermon_metadata import extract_metadata
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+WORD_NAMESPACE = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+OFFICE_NAMESPACE = 'urn:oasis:names:tc:opendocument:xmlns:office:1.0'
+TEXT_NAMESPACE = 'urn:oasis:names:tc:opendocument:xmlns:text:1.0'
+STYLE_NAMESPACE = 'urn:oasis:names:tc:opendocument:xmlns:style:1.0'
+FO_NAMESPACE = 'urn:oasis:names:tc:opendocument:xmlns:xsl-fo-compatible:1.0'
+
+MONTH_NAMES = [
+    'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November',
+    'December'
+]
+SERIES = ['Advent', 'Lent', 'Easter Season', 'Romans', 'Psalms of Ascent', 'Summer Series', 'Funerals']
+TITLE_WORDS = [
+    'Grace', 'Abounds', 'The', 'Shepherd', 'Who', 'Seeks', 'Living', 'Water', 'Faith', '&', 'Works', 'Light', 'in',
+    'Darkness', 'Bread', 'of', 'Life', 'A', 'New', 'Covenant', 'Peace', 'Be', 'Still', 'Mercy', 'Triumphs'
+]
+
+# the ways sermon files are named: by date and reference in either order, by title, or for something else entirely
+NAME_STYLES = ['dotted', 'spaced', 'titled', 'underscored', 'untitled']
+
+# a few sermons in each hundred are far longer than the rest, and a few far shorter
+LENGTHS = [(300, 800), (1500, 3500), (1500, 3500), (1500, 3500), (6000, 12000)]
+LENGTH_WEIGHTS = [10, 30, 30, 25, 5]
+
+# the smallest slowdown, in seconds, that counts as a regression
+MIN_REGRESSION_S = 0.05
+
+STAGES = ['discovery', 'unzip', 'xml_parse', 'hash', 'metadata', 'insert']
+
+
+def synthetic_sermon(rnd):
+    """
+    Function to generate a sermon: its date, reference, and title, and its paragraphs, some with formatted words and
+    some as list items.
+
+    :param random.Random rnd: The random generator
+    :return: a dict of 'date', 'book', 'chapter', 'verses', 'title', and 'paragraphs', each paragraph a tuple of
+        whether it's a list item and a list of runs of (bold, italic, underline) and text
+    """
+    book = rnd.randint(1, len(BOOKS))
+    chapter = rnd.randint(1, CHAPTER_COUNTS[book - 1])
+    first_verse = rnd.randint(1, 10)
+    date = datetime.date(2000, 1, 2) + datetime.timedelta(weeks=rnd.randint(0, 1300))
+    title = ' '.join(rnd.sample(TITLE_WORDS, rnd.randint(2, 5)))
+
+    paragraphs = []
+    words_left = rnd.randint(*rnd.choices(LENGTHS, LENGTH_WEIGHTS)[0])
+    while words_left > 0:
+        is_list_item = rnd.random() < 0.1
+        length = min(words_left, rnd.randint(4, 15) if is_list_item else rnd.randint(30, 150))
+        words_left -= length
+        runs = []
+        words = rnd.choices(WORDS, WEIGHTS, k=length)
+        position = 0
+        while position < len(words):
+            run_length = rnd.randint(1, 30)
+            run_format = (False, False, False)
+            if rnd.random() < 0.15:
+                run_format = (rnd.random() < 0.5, rnd.random() < 0.5, rnd.random() < 0.3)
+            runs.append((run_format, ' '.join(words[position:position + run_length]) + ' '))
+            position += run_length
+        runs[-1] = (runs[-1][0], runs[-1][1].strip() + '.')
+        paragraphs.append((is_list_item, runs))
+
+    return {
+        'date': date, 'book': book, 'chapter': chapter, 'verses': (first_verse, first_verse + rnd.randint(3, 20)),
+        'title': title, 'paragraphs': paragraphs
+    }
+
+
+def reference_text(sermon):
+    return (BOOKS[sermon['book'] - 1][0] + ' ' + str(sermon['chapter']) + ':' + str(sermon['verses'][0]) + '-'
+            + str(sermon['verses'][1]))
+
+
+def file_name(sermon, style):
+    """
+    Function to name a sermon's file in one of the NAME_STYLES, without its extension.
+    """
+    date = sermon['date']
+    book = BOOKS[sermon['book'] - 1]
+    verses = str(sermon['verses'][0]) + '-' + str(sermon['verses'][1])
+    long_date = MONTH_NAMES[date.month - 1] + ' ' + str(date.day) + ', ' + str(date.year)
+    if style == 'dotted':
+        return date.isoformat() + '.' + book[-1].replace(' ', '') + '.' + str(sermon['chapter']) + '.' + verses
+    if style == 'spaced':
+        return book[0] + ' ' + str(sermon['chapter']) + '.' + verses + ' - ' + long_date
+    if style == 'titled':
+        return sermon['title'] + ' - ' + book[0] + ' ' + str(sermon['chapter']) + ' (' + long_date + ')'
+    if style == 'underscored':
+        return (book[0].lower().replace(' ', '_') + '_' + str(sermon['chapter']) + '_' + verses + ' '
+                + date.strftime('%Y_%m_%d'))
+    return 'sermon ' + str(date.year) + ' ' + sermon['title'].split()[0]
+
+
+def heading_paragraphs(sermon):
+    """
+    Function to get the headings that open a sermon named for something else, from which its details are taken.
+    """
+    date = sermon['date']
+    long_date = MONTH_NAMES[date.month - 1] + ' ' + str(date.day) + ', ' + str(date.year)
+    return [(False, [((True, False, False), sermon['title'])]), (False, [((False, False, False), long_date)]),
+            (False, [((False, True, False), reference_text(sermon))])]
+
+
+def docx_xml(paragraphs):
+    """
+    Function to write the document.xml of a .docx file holding the paragraphs.
+    """
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?><w:document xmlns:w="' + WORD_NAMESPACE + '"><w:body>']
+    for is_list_item, runs in paragraphs:
+        parts.append('<w:p>')
+        if is_list_item:
+            parts.append('<w:pPr><w:numPr><w:ilvl w:val="0"/><w:numId w:val="1"/></w:numPr></w:pPr>')
+        for run_format, text in runs:
+            parts.append('<w:r>')
+            if run_format != (False, False, False):
+                parts.append(
+                    '<w:rPr>' + ('<w:b/>' if run_format[0] else '') + ('<w:i/>' if run_format[1] else '')
+                    + ('<w:u w:val="single"/>' if run_format[2] else '') + '</w:rPr>')
+            parts.append('<w:t xml:space="preserve">' + html.escape(text, quote=False) + '</w:t></w:r>')
+        parts.append('</w:p>')
+    parts.append('</w:body></w:document>')
+    return ''.join(parts)
+
+
+def odt_xml(paragraphs):
+    """
+    Function to write the content.xml of an .odt file holding the paragraphs, with its formatting in automatic
+    styles as LibreOffice writes it.
+    """
+    styles = {}
+    body = []
+    in_list = False
+    for is_list_item, runs in paragraphs:
+        if is_list_item != in_list:
+            body.append('<text:list>' if is_list_item else '</text:list>')
+            in_list = is_list_item
+        if is_list_item:
+            body.append('<text:list-item>')
+        body.append('<text:p>')
+        for run_format, text in runs:
+            text = html.escape(text, quote=False)
+            if run_format == (False, False, False):
+                body.append(text)
+            else:
+                name = styles.setdefault(run_format, 'T' + str(len(styles) + 1))
+                body.append('<text:span text:style-name="' + name + '">' + text + '</text:span>')
+        body.append('</text:p>')
+        if is_list_item:
+            body.append('</text:list-item>')
+    if in_list:
+        body.append('</text:list>')
+
+    automatic_styles = []
+    for run_format, name in styles.items():
+        automatic_styles.append(
+            '<style:style style:name="' + name + '" style:family="text"><style:text-properties'
+            + (' fo:font-weight="bold"' if run_format[0] else '') + (' fo:font-style="italic"' if run_format[1] else '')
+            + (' style:text-underline-style="solid"' if run_format[2] else '') + '/></style:style>')
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><office:document-content xmlns:office="' + OFFICE_NAMESPACE
+        + '" xmlns:text="' + TEXT_NAMESPACE + '" xmlns:style="' + STYLE_NAMESPACE + '" xmlns:fo="' + FO_NAMESPACE
+        + '"><office:automatic-styles>' + ''.join(automatic_styles) + '</office:automatic-styles><office:body>'
+        '<office:text>' + ''.join(body) + '</office:text></office:body></office:document-content>')
+
+
+def write_sermon(path, paragraphs, rnd):
+    """
+    Function to write a sermon's paragraphs as a .docx, .odt, or .txt file, by the extension of its path. Some
+    documents have an image in them, as a sermon with a photo or a scanned handout would.
+    """
+    extension = os.path.splitext(path)[1]
+    if extension == '.txt':
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('\n\n'.join(''.join(text for run_format, text in runs) for is_list_item, runs in paragraphs))
+        return
+
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zipped:
+        if extension == '.docx':
+            zipped.writestr('[Content_Types].xml', '<?xml version="1.0" encoding="UTF-8"?><Types/>')
+            zipped.writestr('word/document.xml', docx_xml(paragraphs))
+            if rnd.random() < 0.1:
+                zipped.writestr('word/media/image1.png', rnd.randbytes(rnd.randint(50000, 500000)))
+        else:
+            zipped.writestr('mimetype', 'application/vnd.oasis.opendocument.text', zipfile.ZIP_STORED)
+            zipped.writestr('content.xml', odt_xml(paragraphs))
+            if rnd.random() < 0.1:
+                zipped.writestr('Pictures/image1.png', rnd.randbytes(rnd.randint(50000, 500000)))
+
+
+def unique_path(folder, name, extension):
+    path = os.path.join(folder, name + extension)
+    number = 2
+    while os.path.exists(path):
+        path = os.path.join(folder, name + ' (' + str(number) + ')' + extension)
+        number += 1
+    return path
+
+
+def write_corpus(folder, count, seed=1):
+    """
+    Function to write a synthetic folder tree of sermon files, along with the broken and unwanted files found among
+    real ones: about one in fifty files each of corrupt, truncated, and empty documents, and of copies of other
+    sermons, and some documents with no text and Word lock files.
+
+    :param str folder: The folder to write the files in
+    :param int count: The number of sermons to write
+    :param int seed: The seed of the random generator, so that the same files are written each time
+    :return: a dict of the number of each kind of file written, and their total size in bytes
+    """
+    rnd = random.Random(seed)
+    counts = dict.fromkeys(
+        ('.docx', '.odt', '.txt', 'corrupt', 'truncated', 'empty', 'no_text', 'lock', 'copies', 'bytes'), 0)
+    written = []
+    for number in range(count):
+        sermon = synthetic_sermon(rnd)
+        # sermons are kept loose in the folder, in a folder for their year, or in a series within their year
+        depth = rnd.choices([0, 1, 2], [3, 4, 3])[0]
+        sermon_folder = folder
+        if depth > 0:
+            sermon_folder = os.path.join(sermon_folder, str(sermon['date'].year))
+        if depth > 1:
+            sermon_folder = os.path.join(sermon_folder, rnd.choice(SERIES))
+        os.makedirs(sermon_folder, exist_ok=True)
+
+        style = rnd.choice(NAME_STYLES)
+        extension = rnd.choices(['.docx', '.odt', '.txt'], [50, 25, 25])[0]
+        paragraphs = sermon['paragraphs']
+        if style == 'untitled':
+            paragraphs = heading_paragraphs(sermon) + paragraphs
+        path = unique_path(sermon_folder, file_name(sermon, style), extension)
+        write_sermon(path, paragraphs, rnd)
+        counts[extension] += 1
+        written.append(path)
+
+    problems = max(1, count // 50)
+    for number in range(problems):
+        name = 'problem ' + str(number + 1)
+        with open(os.path.join(folder, name + ' corrupt' + rnd.choice(['.docx', '.odt'])), 'wb') as file:
+            file.write(rnd.randbytes(rnd.randint(100, 20000)))
+        counts['corrupt'] += 1
+
+        zipped = [path for path in written if not path.endswith('.txt')]
+        if zipped:
+            source = rnd.choice(zipped)
+            with open(source, 'rb') as file:
+                data = file.read()
+            with open(os.path.join(folder, name + ' truncated' + os.path.splitext(source)[1]), 'wb') as file:
+                file.write(data[:len(data) // 2])
+            counts['truncated'] += 1
+
+        open(os.path.join(folder, name + ' empty' + rnd.choice(['.docx', '.odt', '.txt'])), 'wb').close()
+        counts['empty'] += 1
+
+        source = rnd.choice(written)
+        stem, extension = os.path.splitext(os.path.basename(source))
+        shutil.copyfile(source, unique_path(os.path.dirname(source), 'Copy of ' + stem, extension))
+        counts['copies'] += 1
+
+    for number in range(max(1, problems // 2)):
+        write_sermon(os.path.join(folder, 'blank ' + str(number + 1) + '.docx'), [(False, [((False,) * 3, ' ')])], rnd)
+        counts['no_text'] += 1
+        source = rnd.choice(written)
+        open(os.path.join(os.path.dirname(source), '~$' + os.path.basename(source)), 'wb').close()
+        counts['lock'] += 1
+
+    for directory, subdirectories, files in os.walk(folder):
+        counts['bytes'] += sum(os.path.getsize(os.path.join(directory, file)) for file in files)
+    return counts
+
+
+def create_database(db_loc):
+    """
+    Function to create an empty database to import into, with the table of the program's database.
+    """
+    if os.path.exists(db_loc):
+        os.remove(db_loc)
+    conn = sqlite3.connect(db_loc)
+    conn.execute(
+        'CREATE TABLE sermon_prep_database (ID INTEGER, ' + ', '.join('"' + field + '" TEXT' for field in FIELDS) + ')')
+    conn.commit()
+    conn.close()
+
+
+def time_stages(folder, db_loc):
+    """
+    Function to time each stage of importing the files, one file after another. Documents are parsed as they are
+    streamed from their zipped files, so the XML parse is timed as the whole read less the time taken to unzip the
+    same part of the document on its own.
+
+    :return: a dict of the seconds taken by each of STAGES, and the number of files found and imported
+    """
+    seconds = dict.fromkeys(STAGES + ['read'], 0.0)
+
+    start = time.perf_counter()
+    files = [file_loc for directory, file_loc in find_sermon_files(folder, True)]
+    seconds['discovery'] = time.perf_counter() - start
+
+    create_database(db_loc)
+    writer = SermonWriter(db_loc)
+    for file_loc in files:
+        extension = os.path.splitext(file_loc)[1].lower()
+        try:
+            start = time.perf_counter()
+            if extension in DOCUMENT_PARTS:
+                with zipfile.ZipFile(file_loc) as zipped:
+                    zipped.read(DOCUMENT_PARTS[extension][0])
+            seconds['unzip'] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            if extension in DOCUMENT_PARTS:
+                sermon_text = paragraphs_html(document_paragraphs(file_loc, extension))
+            else:
+                with open(file_loc, encoding='utf-8') as file:
+                    sermon_text = paragraphs_html(text_paragraphs(file.read()))
+            seconds['read'] += time.perf_counter() - start
+        except (zipfile.BadZipfile, KeyError, EOFError, OSError, ValueError):
+            continue
+        if not sermon_text:
+            continue
+
+        start = time.perf_counter()
+        stat = os.stat(file_loc)
+        file_info = (stat.st_size, stat.st_mtime, content_hash(file_loc), text_hash(sermon_text))
+        seconds['hash'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        paragraphs = [field_plain_text(line) for line in sermon_text.split('\n', BODY_PARAGRAPHS)[:BODY_PARAGRAPHS]]
+        date, reference, title, errors = extract_metadata(os.path.basename(file_loc), paragraphs)
+        seconds['metadata'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        writer.add(file_loc, [date, reference, sermon_text, title], file_info)
+        seconds['insert'] += time.perf_counter() - start
+
+    start = time.perf_counter()
+    writer.close()
+    seconds['insert'] += time.perf_counter() - start
+
+    seconds['xml_parse'] = max(seconds.pop('read') - seconds['unzip'], 0.0)
+    results = dict((stage + '_s', seconds[stage]) for stage in STAGES)
+    results['total_s'] = sum(seconds.values())
+    results['files'] = len(files)
+    results['imported'] = len(writer.new_ids)
+    return results
+
+
+def time_import(folder, db_loc, workers=None):
+    """
+    Function to time an import from end to end as ImportSermons runs it: the files are found, parsed in a pool of
+    worker processes as they're found, and written in batches, skipping those the import manifest shows are unchanged.
+
+    :return: a dict of the seconds taken, the files per second, and the numbers of sermons imported, duplicates
+        flagged, unchanged files skipped, and errors
+    """
+    start = time.perf_counter()
+    writer = SermonWriter(db_loc)
+    errors = 0
+    read = 0
+    files = (file_loc for directory, file_loc in find_sermon_files(folder, True) if not writer.is_unchanged(file_loc))
+    for file_loc, sermon, file_errors, file_info in parse_sermon_files(files, workers):
+        if sermon:
+            writer.add(file_loc, sermon, file_info)
+        errors += len(file_errors)
+        read += 1
+    writer.close()
+    seconds = time.perf_counter() - start
+    return {
+        'seconds': seconds,
+        'files_per_s': (read + writer.unchanged) / seconds,
+        'read': read,
+        'imported': len(writer.new_ids),
+        'duplicates': len(writer.duplicates),
+        'unchanged': writer.unchanged,
+        'errors': errors
+    }
+
+
+def run(count=500, seed=1, workers=None, folder=None):
+    """
+    Function to generate a synthetic folder of sermons and run every benchmark on it.
+
+    :param int count: The number of sermons to generate
+    :param int seed: The seed of the random generator
+    :param int workers: The number of worker processes for the end-to-end import, or None for one per processor
+    :param str folder: Where to write the files and databases, or None for a temporary folder that is then removed
+    :return: a dict of results
+    """
+    temp_folder = None
+    if not folder:
+        temp_folder = folder = tempfile.mkdtemp()
+    sermon_folder = os.path.join(folder, 'sermons')
+    if os.path.exists(sermon_folder):
+        shutil.rmtree(sermon_folder)
+    os.makedirs(sermon_folder)
+
+    results = {'count': count, 'seed': seed, 'workers': workers or os.cpu_count() or 1}
+    try:
+        start = time.perf_counter()
+        results['corpus'] = write_corpus(sermon_folder, count, seed)
+        results['corpus']['mb'] = results['corpus'].pop('bytes') / 1048576
+        results['corpus']['generate_s'] = time.perf_counter() - start
+
+        stages = time_stages(sermon_folder, os.path.join(folder, 'stages.db'))
+        stages['files_per_s'] = stages['files'] / stages['total_s']
+        results['stages'] = stages
+
+        db_loc = os.path.join(folder, 'import.db')
+        create_database(db_loc)
+        results['import'] = time_import(sermon_folder, db_loc, workers)
+        results['reimport'] = time_import(sermon_folder, db_loc, workers)
+
+        # tracing allocations slows the import several times over, so the importing process's peak memory (apart
+        # from the worker processes) is measured by an import of its own into another database
+        db_loc = os.path.join(folder, 'memory.db')
+        create_database(db_loc)
+        tracemalloc.start()
+        time_import(sermon_folder, db_loc, workers)
+        results['import']['parent_peak_mb'] = tracemalloc.get_traced_memory()[1] / 1048576
+        tracemalloc.stop()
+
+        if resource:
+            # ru_maxrss is in kilobytes on Linux but bytes on macOS; for the children, it's the largest worker's
+            unit = 1048576 if sys.platform == 'darwin' else 1024
+            results['max_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit
+            results['worker_max_rss_mb'] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit
+    finally:
+        if temp_folder:
+            shutil.rmtree(temp_folder, ignore_errors=True)
+
+    return results
+
+
+def report(results):
+    """
+    Function to print the results as a table of the stages and the end-to-end imports.
+    """
+    corpus = results['corpus']
+    print(
+        'Synthetic sermons: ' + format(corpus['.docx'], ',') + ' .docx, ' + format(corpus['.odt'], ',') + ' .odt, '
+        + format(corpus['.txt'], ',') + ' .txt, ' + format(corpus['mb'], '.1f') + ' MB')
+    print(
+        'Problem files: ' + str(corpus['corrupt']) + ' corrupt, ' + str(corpus['truncated']) + ' truncated, '
+        + str(corpus['empty']) + ' empty, ' + str(corpus['no_text']) + ' with no text, ' + str(corpus['lock'])
+        + ' lock files, ' + str(corpus['copies']) + ' copies')
+
+    stages = results['stages']
+    print()
+    print('Stages, one file at a time (' + format(stages['files'], ',') + ' files):')
+    print(format('', '<14') + format('Seconds', '>10') + format('ms/file', '>10') + format('Share', '>8'))
+    for stage in STAGES + ['total']:
+        seconds = stages[stage + '_s']
+        print(
+            format(stage.replace('_', ' ').capitalize(), '<14') + format(seconds, '>10.3f')
+            + format(seconds * 1000 / max(stages['files'], 1), '>10.3f')
+            + format(seconds / stages['total_s'], '>8.0%'))
+    print(format('Files/s', '<14') + format(stages['files_per_s'], '>10.1f'))
+
+    print()
+    print('End to end, with ' + str(results['workers']) + ' worker process(es):')
+    print(format('', '<12') + format('Seconds', '>10') + format('Files/s', '>10') + format('Imported', '>10')
+          + format('Skipped', '>10') + format('Dupes', '>8') + format('Errors', '>8'))
+    for label, key in (('Import', 'import'), ('Reimport', 'reimport')):
+        timings = results[key]
+        print(
+            format(label, '<12') + format(timings['seconds'], '>10.3f') + format(timings['files_per_s'], '>10.1f')
+            + format(timings['imported'], '>10') + format(timings['unchanged'], '>10')
+            + format(timings['duplicates'], '>8') + format(timings['errors'], '>8'))
+
+    print()
+    print('Peak memory allocated by the importing process: ' + format(results['import']['parent_peak_mb'], '.1f')
+          + ' MB')
+    if 'max_rss_mb' in results:
+        print('Peak resident memory: ' + format(results['max_rss_mb'], '.1f') + ' MB, largest worker '
+              + format(results['worker_max_rss_mb'], '.1f') + ' MB')
+
+
+def compare(results, saved, tolerance):
+    """
+    Function to find the timings that are slower than saved results by more than the tolerance.
+
+    :param dict results: The results of this run
+    :param dict saved: The results of an earlier run
+    :param float tolerance: The percentage by which a timing may be slower
+    :return: a list of tuples of the timing's name, its saved value, and its value now
+    """
+    now = flatten(results)
+    regressions = []
+    for key, value in flatten(saved).items():
+        if key.startswith(('stages.', 'import.', 'reimport.')) and key.endswith(('_s', '.seconds')) and key in now:
+            # timings of a few milliseconds vary by more than the tolerance from run to run
+            if now[key] > value * (1 + tolerance / 100) and now[key] - value > MIN_REGRESSION_S:
+                regressions.append((key, value, now[key]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark importing sermons from .docx, .odt, and .txt files.')
+    parser.add_argument('--files', type=int, default=500, help='number of sermons to generate')
+    parser.add_argument('--seed', type=int, default=1, help='seed of the random generator')
+    parser.add_argument('--workers', type=int, help='worker processes for the end-to-end import (default: one per CPU)')
+    parser.add_argument('--keep', help='folder in which to keep the synthetic sermons and the databases')
+    parser.add_argument('--save', help='file to save the results to, as JSON')
+    parser.add_argument('--compare', help='file of saved results to check this run against')
+    parser.add_argument('--tolerance', type=float, default=25, help='percent slower that counts as a regression')
+    args = parser.parse_args()
+
+    if args.keep and not os.path.exists(args.keep):
+        os.makedirs(args.keep)
+    results = run(args.files, args.seed, args.workers, args.keep)
+    report(results)
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            file.write(json.dumps(results, indent=4))
+
+    if args.compare:
+        with open(args.compare) as file:
+            saved = json.loads(file.read())
+        print()
+        if (saved.get('count'), saved.get('seed'), saved.get('workers')) != (
+                results['count'], results['seed'], results['workers']):
+            print('The results in ' + args.compare + ' are for a different corpus or number of workers; run with '
+                  '--files ' + str(saved.get('count')) + ' --seed ' + str(saved.get('seed')) + ' --workers '
+                  + str(saved.get('workers')) + ' to compare them')
+            sys.exit(2)
+        regressions = compare(results, saved, args.tolerance)
+        if len(regressions) == 0:
+            print('No regressions against ' + args.compare)
+        for key, saved, now in regressions:
+            print('Regression: ' + key + ' ' + format(saved, '.3f') + ' -> ' + format(now, '.3f'))
+        if len(regressions) > 0:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
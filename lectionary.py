@@ -0,0 +1,224 @@
+import json
+import os
+import sqlite3
+from datetime import date, timedelta
+from os.path import exists
+
+from scripture_reference import canonical_reference
+
+# bump this whenever the rules of liturgical_days change so that the calendar is rebuilt
+CALENDAR_VERSION = 1
+
+# the calendar is compiled for the liturgical years ending in these calendar years
+FIRST_YEAR = 1950
+LAST_YEAR = 2100
+
+
+def easter(year):
+    """
+    Function to find the date of Easter in the given year by the Gregorian computus.
+    """
+    a = year % 19
+    b = year // 100
+    c = year % 100
+    d = (19 * a + b - b // 4 - (b - (8 * b + 13) // 25 + 1) // 3 + 15) % 30
+    e = (32 + 2 * (b % 4) + 2 * (c // 4) - d - c % 4) % 7
+    f = d + e - 7 * ((a + 11 * d + 22 * e) // 451) + 114
+    return date(year, f // 31, f % 31 + 1)
+
+
+def sunday_after(day):
+    """
+    Function to find the first Sunday after the given date.
+    """
+    return day + timedelta(days=6 - day.weekday() or 7)
+
+
+def first_advent(year):
+    """
+    Function to find the first Sunday of Advent in the given year: the fourth Sunday before Christmas.
+    """
+    return sunday_after(date(year, 12, 24)) - timedelta(days=28)
+
+
+def cycle(liturgical_year):
+    """
+    Function to get the year of the three-year cycle (A, B, or C) of the liturgical year that ends in the given
+    calendar year. Year A begins in Advent of a year before one divisible by three.
+    """
+    return 'ABC'[(liturgical_year - 1) % 3]
+
+
+def liturgical_days(liturgical_year):
+    """
+    Function to find the Sundays and principal festivals of one liturgical year, from the first Sunday of Advent to
+    the last Sunday after Pentecost.
+
+    :param int liturgical_year: The calendar year in which the liturgical year ends
+    :return: a dict of date -> the name of the day in the lectionary
+    """
+    days = {}
+    advent = first_advent(liturgical_year - 1)
+    for week in range(4):
+        days[advent + timedelta(weeks=week)] = 'Advent ' + str(week + 1)
+
+    # a Sunday falling on Christmas Eve is kept as the fourth Sunday of Advent
+    christmas_eve = date(liturgical_year - 1, 12, 24)
+    days.setdefault(christmas_eve, 'Christmas Eve')
+    days[christmas_eve + timedelta(days=1)] = 'Christmas Day'
+    days[sunday_after(christmas_eve + timedelta(days=1))] = 'Christmas 1'
+    epiphany = date(liturgical_year, 1, 6)
+    second_sunday = sunday_after(date(liturgical_year, 1, 1))
+    if second_sunday < epiphany:
+        days[second_sunday] = 'Christmas 2'
+    days[epiphany] = 'Epiphany'
+
+    easter_day = easter(liturgical_year)
+    transfiguration = easter_day - timedelta(days=49)
+    sunday = sunday_after(epiphany)
+    days[sunday] = 'Baptism of the Lord'
+    week = 2
+    sunday += timedelta(weeks=1)
+    while sunday < transfiguration:
+        days[sunday] = 'Epiphany ' + str(week)
+        sunday += timedelta(weeks=1)
+        week += 1
+    days[transfiguration] = 'Transfiguration'
+    days[easter_day - timedelta(days=46)] = 'Ash Wednesday'
+    for week in range(5):
+        days[easter_day - timedelta(weeks=6 - week)] = 'Lent ' + str(week + 1)
+    days[easter_day - timedelta(weeks=1)] = 'Palm Sunday'
+    days[easter_day - timedelta(days=3)] = 'Maundy Thursday'
+    days[easter_day - timedelta(days=2)] = 'Good Friday'
+    days[easter_day] = 'Easter'
+    for week in range(2, 8):
+        days[easter_day + timedelta(weeks=week - 1)] = 'Easter ' + str(week)
+    days[easter_day + timedelta(days=39)] = 'Ascension'
+    days[easter_day + timedelta(weeks=7)] = 'Pentecost'
+    days[easter_day + timedelta(weeks=8)] = 'Trinity Sunday'
+
+    # the Sundays after Trinity are numbered by date: Proper 4 is the Sunday between May 29 and June 4, and so on
+    next_advent = first_advent(liturgical_year)
+    sunday = easter_day + timedelta(weeks=9)
+    while sunday < next_advent:
+        proper = 4 + (sunday - date(liturgical_year, 5, 29)).days // 7
+        days[sunday] = 'Christ the King' if proper == 29 else 'Proper ' + str(proper)
+        sunday += timedelta(weeks=1)
+    days[date(liturgical_year, 11, 1)] = 'All Saints'
+
+    return days
+
+
+class LectionaryIndex:
+    """
+    LectionaryIndex compiles the bundled lectionary (resources/lectionary.json) into a calendar of every Sunday and
+    festival from FIRST_YEAR to LAST_YEAR with its readings already put in canonical form, so that filling in the
+    pericope for a sermon date is a single lookup rather than working out the church year each time the date changes.
+    The calendar is kept in the app directory and read into memory the first time it's needed.
+    """
+    def __init__(self, lectionary_file, index_loc):
+        """
+        :param str lectionary_file: The location of the bundled lectionary
+        :param str index_loc: The location of the compiled calendar
+        """
+        self.lectionary_file = lectionary_file
+        self.index_loc = index_loc
+        self.days = None
+
+    def source_signature(self):
+        """
+        Method to describe the lectionary file so that an updated lectionary can be recognized.
+        """
+        stat = os.stat(self.lectionary_file)
+        return str(stat.st_size) + ':' + str(int(stat.st_mtime))
+
+    def is_current(self):
+        """
+        Method to check that the compiled calendar exists and was built from the current lectionary with the current
+        calendar rules.
+        """
+        if not exists(self.index_loc):
+            return False
+        try:
+            conn = sqlite3.connect(self.index_loc)
+            cursor = conn.cursor()
+            info = dict(cursor.execute('SELECT key, value FROM info').fetchall())
+            conn.close()
+        except sqlite3.Error:
+            return False
+        return (
+            info.get('source') == self.source_signature()
+            and info.get('calendar_version') == str(CALENDAR_VERSION)
+        )
+
+    def build(self):
+        """
+        Method to compile the calendar. As with the bible index, it is written to a temporary file and moved into place
+        when complete.
+
+        :return: the number of days in the calendar
+        """
+        with open(self.lectionary_file, encoding='utf-8') as file:
+            lectionary = json.loads(file.read())
+        readings = {}
+        for day, years in lectionary['days'].items():
+            for year, references in years.items():
+                readings[(day, year)] = '\n'.join(canonical_reference(reference) for reference in references)
+
+        rows = []
+        for liturgical_year in range(FIRST_YEAR, LAST_YEAR + 1):
+            year = cycle(liturgical_year)
+            for day, name in liturgical_days(liturgical_year).items():
+                if (name, year) in readings:
+                    rows.append((day.isoformat(), name, year, readings[(name, year)]))
+
+        temp_loc = self.index_loc + '.tmp'
+        if exists(temp_loc):
+            os.remove(temp_loc)
+        conn = sqlite3.connect(temp_loc)
+        cursor = conn.cursor()
+        cursor.execute('CREATE TABLE info (key TEXT PRIMARY KEY, value TEXT)')
+        cursor.execute('CREATE TABLE calendar (date TEXT PRIMARY KEY, day TEXT, year TEXT, readings TEXT)')
+        cursor.executemany('INSERT OR REPLACE INTO calendar VALUES (?, ?, ?, ?)', rows)
+        cursor.execute('INSERT INTO info VALUES (?, ?)', ('source', self.source_signature()))
+        cursor.execute('INSERT INTO info VALUES (?, ?)', ('calendar_version', str(CALENDAR_VERSION)))
+        cursor.execute('INSERT INTO info VALUES (?, ?)', ('name', lectionary['name']))
+        conn.commit()
+        conn.close()
+
+        os.replace(temp_loc, self.index_loc)
+        return len(rows)
+
+    def load(self):
+        """
+        Method to read the calendar into memory, compiling it first if it's missing or out of date.
+        """
+        if not self.is_current():
+            self.build()
+        conn = sqlite3.connect(self.index_loc)
+        cursor = conn.cursor()
+        self.days = dict(
+            (day, (name, year, readings))
+            for day, name, year, readings in cursor.execute('SELECT date, day, year, readings FROM calendar'))
+        conn.close()
+
+    def get_day(self, day):
+        """
+        Method to get the lectionary day of a sermon date. A Saturday takes the readings of the Sunday that follows,
+        for services held the evening before.
+
+        :param str day: The sermon date, as yyyy-MM-dd
+        :return: a tuple of the name of the day, the year of the cycle, and the readings, one per line, or None if the
+            date isn't a Sunday or festival in the calendar
+        """
+        if self.days is None:
+            self.load()
+        if day in self.days:
+            return self.days[day]
+        try:
+            saturday = date.fromisoformat(day)
+        except ValueError:
+            return None
+        if saturday.weekday() == 5:
+            return self.days.get((saturday + timedelta(days=1)).isoformat())
+        return None
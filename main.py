@@ -21,22 +21,30 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import json
+import multiprocessing
 import os
 import re
 import shutil
 import sqlite3
 import sys
+import threading
 import time
 import traceback
 
-from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QFont, QPixmap
-from PyQt6.QtWidgets import QTextEdit, QDateEdit, QLabel, QDialog, QVBoxLayout, QMessageBox, QWidget, QApplication
+from PyQt6.QtWidgets import QTextEdit, QDateEdit, QLabel, QDialog, QVBoxLayout, QMessageBox, QApplication
 from datetime import datetime
 from os.path import exists
 from sqlite3 import OperationalError
 
+from bible_formats import bible_files
+from bible_index import BibleIndex, BibleLibrary
+from coverage_index import CoverageIndex
 from gui import GUI
+from lectionary import LectionaryIndex
+from reuse_index import ReuseIndex
+from search_index import SearchIndex
+from similarity_index import SimilarityIndex
 from spell_check_widgets import SpellCheckLineEdit, SpellCheckTextEdit
 
 
@@ -62,6 +70,13 @@ class Main:
     cwd = ''
     sym_spell = None
     spell_check_thread_pool = None
+    similarity_index = None
+    reuse_index = None
+    search_index = None
+    coverage_index = None
+    bible_index = None
+    bible_library = None
+    lectionary = None
 
     def __init__(self):
         """
@@ -105,13 +120,25 @@ class Main:
             self.write_to_log('database location is ' + self.db_loc)
 
             self.check_for_db()
+            self.similarity_index = SimilarityIndex(self.db_loc)
+            self.reuse_index = ReuseIndex(self.db_loc)
+            self.search_index = SearchIndex(self.db_loc)
+            self.coverage_index = CoverageIndex(self.db_loc)
+            # the import and backfill jobs update the indexes from worker threads while the GUI saves records
+            self.index_lock = threading.Lock()
 
             if not exists(self.app_dir + '/custom_words.txt'):
                 with open(self.app_dir + '/custom_words.txt', 'w'):
                     pass
 
-            if exists(self.app_dir + '/my_bible.xml'):
-                self.bible_file = self.app_dir + '/my_bible.xml'
+            # the user's bible is saved as my_bible.xml (Zefania or OSIS) or my_bible.usfm
+            my_bibles = bible_files(self.app_dir, 'my_bible')
+            if len(my_bibles) > 0:
+                self.bible_file = my_bibles[0]
+            self.bible_index = BibleIndex(
+                self.bible_file or self.app_dir + '/my_bible.xml', self.app_dir + '/my_bible.db')
+            self.bible_library = BibleLibrary(self.app_dir + '/bibles', self.bible_index)
+            self.lectionary = LectionaryIndex('resources/lectionary.json', self.app_dir + '/lectionary.db')
 
             if not exists(self.app_dir + '/config.json'):
                 self.check_spell_check()
@@ -510,6 +537,8 @@ class Main:
             conn.commit()
             conn.close()
 
+            self.update_indexes([rec_id])
+
             from dialogs import timed_popup
             timed_popup(self.gui, 'Record Saved', 1000)
             self.write_to_log('Database saved - ' + self.db_loc)
@@ -521,7 +550,8 @@ class Main:
     def reformat_string_for_load(self, string):
         """
         Method to handle the formatting of an older-style database string for insertion into a QTextEdit. Only those
-        strings missing paragraph markers as well as old-style &quots need to be handled.
+        strings missing paragraph markers (such as sermons imported before imports kept their formatting) as well as
+        old-style &quots need to be handled.
 
         :param str string: The string to reformat.
         """
@@ -536,97 +566,115 @@ class Main:
 
     def get_search_results(self, search_text):
         """
-        Method to search the text of all database entries to see if the user's string is found.
+        Method to search the text of all database entries to see if the user's string is found. Words, "quoted
+        phrases" and proximity searches (i.e. grace NEAR/5 law) are answered from the positional search index.
 
         :param str search_text: User's search term(s)
+        :return: a list of [record, words found, number of matches, hits] lists, where hits are tuples of the column
+            index and the start and end offsets of each match within that column's plain text
         """
         search_text = search_text.strip()
-        full_text_result_list = []
+        clauses = self.search_index.parse_query(search_text)
+        if len(clauses) == 0:
+            return []
+
+        # search first for the full search text as a phrase, unless the user has already given phrases or proximities
+        full_text_results = {}
+        if len(clauses) > 1 and '"' not in search_text and 'NEAR/' not in search_text:
+            terms = []
+            for clause in clauses:
+                terms += clause[1][1]
+            full_text_results = self.search_index.search(('phrase', terms))
+
+        # then search for each individual word, phrase, or proximity in the search text
+        individual_results = {}
+        for label, clause in clauses:
+            for rec_id, hits in self.search_index.search(clause).items():
+                if rec_id not in full_text_results:
+                    result = individual_results.setdefault(rec_id, [[], []])
+                    result[0].append(label)
+                    result[1] += hits
+
         conn = sqlite3.connect(self.db_loc)
         cur = conn.cursor()
-        all_data = cur.execute('SELECT * FROM sermon_prep_database').fetchall()
+        records = {}
+        for rec_id in list(full_text_results) + list(individual_results):
+            records[rec_id] = cur.execute('SELECT * FROM sermon_prep_database WHERE ID = ?', (rec_id,)).fetchone()
         conn.close()
 
-        found_ids = []
-        #search first for the full search text
-        add_item = True
-        for line in all_data:
-            for item in line:
-                num_matches = str(item).lower().count(search_text.lower())
-                if num_matches > 0:
-                    for id in found_ids:
-                        if line[0] == id:
-                            add_item = False
-                    if add_item:
-                        full_text_result_list.append([line, search_text, num_matches])
-                        found_ids.append(line[0])
-            add_item = True
-
-        # then search for each individual word in the search text
+        # order the search results by number of matches, full text first; hits are offset by one to skip the ID column
+        full_text_result_list = []
+        for rec_id, hits in full_text_results.items():
+            hits = [(hit[0] + 1, hit[1], hit[2]) for hit in hits]
+            full_text_result_list.append([records[rec_id], search_text, len(hits), hits])
+        full_text_result_list.sort(key=lambda result: result[2], reverse=True)
+
         individual_word_result_list = []
+        for rec_id, (words_found, hits) in individual_results.items():
+            hits = sorted((hit[0] + 1, hit[1], hit[2]) for hit in hits)
+            individual_word_result_list.append([records[rec_id], words_found, len(words_found), hits])
+        individual_word_result_list.sort(key=lambda result: result[2], reverse=True)
+
+        return full_text_result_list + individual_word_result_list
+
+    def text_indexes(self):
+        """
+        Method to list the indexes derived from the records' text, along with their names for the log.
+        """
+        return [
+            ('similarity', self.similarity_index),
+            ('reuse', self.reuse_index),
+            ('search', self.search_index),
+            ('coverage', self.coverage_index)
+        ]
+
+    def update_indexes(self, record_ids):
+        """
+        Method to bring the indexes derived from the records' text up to date after records have been saved or added.
+
+        :param list of int record_ids: The ID numbers of the changed records
+        """
+        # each index is updated on its own so that one failing (e.g. on a locked database) doesn't leave the rest stale
+        with self.index_lock:
+            for name, index in self.text_indexes():
+                try:
+                    index.update_records(record_ids)
+                except Exception as ex:
+                    self.write_to_log('Main.update_indexes (' + name + '): ' + str(ex))
+
+    def remove_from_indexes(self, record_ids):
+        """
+        Method to remove deleted records from the indexes derived from the records' text.
 
-        search_terms = []
-        quotes = re.findall('".*?"', search_text)
-        for item in quotes:
-            search_terms.append(item.replace('"', '').strip())
-            search_text = search_text.replace(item, '')
-
-        search_split = search_text.split(' ')
-        for item in search_split:
-            if len(item) > 0:
-                search_terms.append(item.strip())
-
-        for line in all_data:
-            already_found = False
-            for id in found_ids:
-                if line[0] == id:
-                    already_found = True
-
-            if not already_found:
-                words_found_in_line = [None] * len(search_terms)
-                add_item = False
-
-                for item in line:
-                    for i in range(len(search_terms)):
-                        search_word = search_terms[i]
-                        num_matches = str(item).lower().count(search_word.lower())
-                        if num_matches > 0:
-                            words_found_in_line[i] = True
-                            add_item = True
-
-                if add_item:
-                    words_found = []
-                    num_matches = 0
-                    for i in range(len(search_terms)):
-                        if words_found_in_line[i]:
-                            words_found.append(search_terms[i])
-                            num_matches += 1
-                    individual_word_result_list.append([line, words_found, num_matches])
-                    found_ids.append(line[0])
-
-        # reorder the search results based on number of matches, full text first
-        sorted_results = []
-        while len(full_text_result_list) > 0:
-            highest_num = -1
-            highest_index = -1
-            for i in range(0, len(full_text_result_list)):
-                if full_text_result_list[i][2] > highest_num:
-                    highest_num = full_text_result_list[i][2]
-                    highest_index = i
-            sorted_results.append(full_text_result_list[highest_index])
-            full_text_result_list.pop(highest_index)
-
-        while len(individual_word_result_list) > 0:
-            highest_num = -1
-            highest_index = -1
-            for i in range(0, len(individual_word_result_list)):
-                if individual_word_result_list[i][2] > highest_num:
-                    highest_num = individual_word_result_list[i][2]
-                    highest_index = i
-            sorted_results.append(individual_word_result_list[highest_index])
-            individual_word_result_list.pop(highest_index)
-
-        return sorted_results
+        :param list of int record_ids: The ID numbers of the deleted records
+        """
+        with self.index_lock:
+            for name, index in self.text_indexes():
+                try:
+                    index.remove_records(record_ids)
+                except Exception as ex:
+                    self.write_to_log('Main.remove_from_indexes (' + name + '): ' + str(ex))
+
+    def get_similar_sermons(self, limit=10):
+        """
+        Method to find the records whose content is most similar to the current record.
+
+        :param int limit: The number of similar records to return
+        :return: a list of [record, similarity score, shared terms] lists, most similar first
+        """
+        rec_id = self.ids[self.current_rec_index]
+        similar = self.similarity_index.most_similar(rec_id, limit)
+
+        results = []
+        conn = sqlite3.connect(self.db_loc)
+        cur = conn.cursor()
+        for other_id, score, shared_terms in similar:
+            record = cur.execute('SELECT * FROM sermon_prep_database WHERE ID = ?', (other_id,)).fetchone()
+            if record:
+                results.append([record, score, shared_terms])
+        conn.close()
+
+        return results
 
     def first_rec(self):
         """
@@ -682,15 +730,15 @@ class Main:
         if self.gui.changes:
             goon = self.ask_save()
         if goon:
-            if len(self.ids) > 0:
-                new_id = self.ids[len(self.ids) - 1] + 1
-            else:
-                new_id = 1
+            # the highest ID is read from the database, which a background import may be adding to
+            conn = sqlite3.connect(self.db_loc)
+            cur = conn.cursor()
+            cur.execute('BEGIN IMMEDIATE')
+            highest_num = cur.execute('SELECT MAX(CAST(ID AS INTEGER)) FROM sermon_prep_database').fetchone()[0]
+            new_id = (highest_num or 0) + 1
 
             sql = 'INSERT INTO "sermon_prep_database" ("ID", "date", "sermon_reference") VALUES(' + str(
                 new_id) + ', "None", "None")'
-            conn = sqlite3.connect(self.db_loc)
-            cur = conn.cursor()
             cur.execute(sql)
             conn.commit()
             conn.close()
@@ -728,13 +776,16 @@ class Main:
 
         if response == QMessageBox.StandardButton.Yes:
             self.gui.changes = False
-            sql = 'DELETE FROM sermon_prep_database WHERE ID = "' + str(self.ids[self.current_rec_index]) + '";'
+            rec_id = self.ids[self.current_rec_index]
+            sql = 'DELETE FROM sermon_prep_database WHERE ID = "' + str(rec_id) + '";'
             conn = sqlite3.connect(self.db_loc)
             cur = conn.cursor()
             cur.execute(sql)
             conn.commit()
             conn.close()
 
+            self.remove_from_indexes([rec_id])
+
             self.get_ids()
             self.get_date_list()
             self.get_scripture_list()
@@ -793,37 +844,22 @@ class Main:
         logfile.writelines(string)
         logfile.close()
 
-    def insert_imports(self, errors, sermons):
+    def insert_imports(self, result, quiet=False):
         """
-        Method to add sermons, imported from .docx or .txt files, to the user's database.
+        Method to bring the program up to date with sermons imported from .docx, .odt, .txt, .csv, or JSON Lines files,
+        which have already been written to the user's database and indexed, and report on the import.
 
-        :param list of str errors: Any errors encountered during the file parsing method.
-        :param list of str sermons: The sermons gathered from the parsed files.
+        :param dict result: The new record IDs, the IDs of the records updated from changed files, any errors
+            encountered while parsing the files, the number of unchanged files skipped, and whether the user stopped
+            the import before every file was read, as given by ImportSermons or ImportRecords.
+        :param boolean quiet: For imports from the watched folder, which only log their errors, and which reload the
+            record being viewed if it was updated rather than moving to the last record.
         """
+        errors = result['errors']
+        new_ids = result['new_ids']
+        updated_ids = result['updated_ids']
         try:
-            conn = sqlite3.connect(self.db_loc)
-            cursor = conn.cursor()
-
-            highest_num = 0
-            for num in self.ids:
-                if num > highest_num:
-                    highest_num = num
-
-            for sermon in sermons:
-                highest_num += 1
-                date = sermon[0]
-                reference = sermon[1]
-                text = sermon[2]
-                title = sermon[3]
-                sql = 'INSERT INTO sermon_prep_database (ID, date, sermon_reference, manuscript, sermon_title) VALUES("'\
-                    + str(highest_num) + '", "' + date + '", "' + reference + '", "' + text + '", "' + title + '");'
-                cursor.execute(sql)
-                conn.commit()
-
-            conn.close()
-
-            import time
-            time.sleep(0.5)  # prevent a database lock, just in case SQLite takes a bit to update
+            # the import's own connection has been closed by now, so the lists can be read straight away
             self.get_ids()
             self.get_date_list()
             self.get_scripture_list()
@@ -838,9 +874,31 @@ class Main:
             self.gui.toolbar.dates_cb.blockSignals(False)
             self.gui.toolbar.references_cb.blockSignals(False)
 
-            self.last_rec()
+            if quiet:
+                for error in errors:
+                    self.write_to_log('Watched folder import: ' + error[0] + ': ' + error[1])
+                # unsaved changes to the record being viewed are left alone; saving them keeps them
+                if (len(self.ids) > self.current_rec_index and self.ids[self.current_rec_index] in updated_ids
+                        and not self.gui.changes):
+                    self.get_by_index(self.current_rec_index)
+                return
+
+            if len(new_ids) > 0:
+                self.last_rec()
+            elif len(updated_ids) > 0 and self.ids[self.current_rec_index] in updated_ids and not self.gui.changes:
+                self.get_by_index(self.current_rec_index)
 
-            message = str(len(sermons)) + ' sermons have been imported.'
+            message = str(len(new_ids)) + ' sermons have been imported.'
+            if result['cancelled']:
+                message = 'The import was cancelled after ' + str(len(new_ids)) + ' sermons were imported.'
+                if result.get('resumable', True):
+                    message += ' Importing the same folder again will pick up where it stopped.'
+            if len(updated_ids) > 0:
+                message += (' ' + str(len(updated_ids)) + ' sermons were updated from files changed since they were '
+                            'imported.')
+            if result['unchanged'] > 0:
+                message += (' ' + str(result['unchanged']) + ' files were skipped because they had already been '
+                            'imported.')
             if len(errors) > 0:
                 message += ' Error(s) occurred while importing. Would you like to view them now?'
                 result = QMessageBox.question(
@@ -879,56 +937,7 @@ class Main:
                 'Error Occurred', 'An error occurred while importing:\n\n' + str(ex),
                 QMessageBox.StandardButton.Ok
             )
-            self.write_to_log(
-                'From SermonPrepDatabase.insert_imports: ' + str(ex) + '\nMost recent sql statement: ' + text)
-
-    def import_splash(self):
-        """
-        Method to apprise user of work being done while importing sermons.
-        """
-        self.widget = QWidget()
-        layout = QVBoxLayout()
-        self.widget.setLayout(layout)
-
-        importing_label = QLabel('Importing...')
-        importing_label.setFont(QFont(self.gui.main.user_settings['font_family'], int(self.gui.main.user_settings['font_size']), QFont.Weight.Bold))
-        layout.addWidget(importing_label)
-        layout.addSpacing(50)
-
-        self.dir_label = QLabel('Looking in...')
-        self.dir_label.setFont(QFont(self.gui.main.user_settings['font_family'], int(self.gui.main.user_settings['font_size'])))
-        layout.addWidget(self.dir_label)
-
-        self.file_label = QLabel('Examining...')
-        self.file_label.setFont(QFont(self.gui.main.user_settings['font_family'], int(self.gui.main.user_settings['font_size'])))
-        layout.addWidget(self.file_label)
-
-        self.widget.setWindowModality(Qt.WindowModality.WindowModal)
-        self.widget.setWindowFlag(Qt.WindowType.FramelessWindowHint)
-        self.widget.show()
-
-    def change_dir(self, text):
-        """
-        Method to change the directory shown on the import splash.
-        :param str text: Directory to show.
-        """
-        self.dir_label.setText(text)
-        self.gui.app.processEvents()
-
-    def change_file(self, text):
-        """
-        Method to change the file name shown on the import splash.
-
-        :param str text: File name to show.
-        """
-        self.file_label.setText(text)
-        self.gui.app.processEvents()
-
-    def close_splash(self):
-        """
-        Method to close the import splash widget.
-        """
-        self.widget.deleteLater()
+            self.write_to_log('From SermonPrepDatabase.insert_imports: ' + str(ex))
 
 
 def log_unhandled_exception(exc_type, exc_value, exc_traceback):
@@ -979,5 +988,7 @@ def log_unhandled_exception(exc_type, exc_value, exc_traceback):
     message_box.exec()
 
 if __name__ == '__main__':
+    # the sermon import parses files in worker processes, which a frozen build must be able to start
+    multiprocessing.freeze_support()
     Main()
 
@@ -0,0 +1,294 @@
+import csv
+import json
+import os
+import re
+import sqlite3
+
+from search_index import FIELDS
+from sermon_files import escape_text, paragraphs_html
+from sermon_metadata import find_date
+
+RECORD_EXTENSIONS = ('.csv', '.jsonl', '.ndjson')
+
+# the fields the sermon tabs show in a single line, which are stored as plain text; the rest are stored as the
+# simplified html of SpellCheckTextEdit
+LINE_FIELDS = ('pericope', 'sermon_reference', 'sermon_title', 'location', 'call_to_worship', 'hymn_of_response')
+
+# other names that sermon-planning programs give their columns, for matching them to fields before the user is asked
+FIELD_ALIASES = {
+    'title': 'sermon_title',
+    'reference': 'sermon_reference',
+    'scripture': 'sermon_reference',
+    'text': 'sermon_reference',
+    'passage': 'sermon_reference',
+    'preached': 'date',
+    'datepreached': 'date',
+    'place': 'location',
+    'church': 'location',
+    'hymn': 'hymn_of_response',
+    'outline': 'sermon_outline',
+    'notes': 'research',
+    'sermon': 'manuscript',
+    'body': 'manuscript',
+    'content': 'manuscript',
+}
+
+# a JSON Lines file's columns are the keys found in its first lines
+HEADER_LINES = 1000
+
+# only so many problems are listed, so that a badly mapped column doesn't list one for every row of a large file
+MAX_ERRORS = 500
+
+HTML_PATTERN = re.compile('\\s*<(?:p|ul|b|i|u|br)\\b', re.IGNORECASE)
+
+
+def is_record_file(file_name):
+    """
+    Function to check that a file is a .csv or JSON Lines file that records can be imported from.
+    """
+    return file_name.lower().endswith(RECORD_EXTENSIONS)
+
+
+def column_key(name):
+    """
+    Function to reduce a column name or label to its letters and numbers for matching, so that "Sermon Title",
+    "sermon_title", and "SermonTitle" are all the same.
+    """
+    return re.sub('[^a-z0-9]', '', str(name).lower())
+
+
+def guess_mapping(columns, labels):
+    """
+    Function to match the columns of a file to the fields of sermon_prep_database by their names, the names the user
+    has given the fields, and the common names of FIELD_ALIASES.
+
+    :param list of str columns: The names of the file's columns
+    :param list of str labels: The user's names for each of FIELDS, in the same order
+    :return: a dict of column -> field for the columns that match a field, no two to the same field
+    """
+    keys = {}
+    for field, label in zip(FIELDS, labels):
+        keys.setdefault(column_key(field), field)
+        keys.setdefault(column_key(label), field)
+    for alias, field in FIELD_ALIASES.items():
+        keys.setdefault(alias, field)
+
+    mapping = {}
+    for column in columns:
+        field = keys.get(column_key(column))
+        if field and field not in mapping.values():
+            mapping[column] = field
+    return mapping
+
+
+def plain_value(value):
+    """
+    Function to turn a value read from a file into text. JSON values that aren't strings are written out, lists one
+    item to a line.
+    """
+    if value is None:
+        return ''
+    if isinstance(value, list):
+        return '\n'.join(plain_value(item) for item in value)
+    if isinstance(value, dict):
+        return json.dumps(value)
+    return str(value)
+
+
+def stored_value(field, value):
+    """
+    Function to convert a value read from a file into the form its field is saved in by the sermon tabs, so that
+    imported records load just as typed ones do.
+
+    :param str field: The field the value is for
+    :param str value: The text of the value
+    :return: a tuple of the stored value, and a problem with it or None
+    """
+    value = value.strip()
+    if not value:
+        return '', None
+    if field == 'date':
+        found = find_date(value)
+        if not found:
+            return '', 'Unable to read the date "' + value + '"'
+        return found[0], None
+    if field in LINE_FIELDS:
+        return ' '.join(value.split()).replace('"', '&quot;'), None
+    if HTML_PATTERN.match(value):
+        return value, None
+    # each line of plain text is taken as a paragraph
+    return paragraphs_html(([escape_text(line.strip())], False) for line in value.splitlines() if line.strip()), None
+
+
+class RecordFile:
+    """
+    RecordFile reads the rows of a .csv file with a header row, or a JSON Lines file of one object per line, as it
+    goes, so that a file of any size is imported in the same small amount of memory. How far through the file it has
+    read is kept for showing the import's progress.
+    """
+    def __init__(self, file_loc):
+        """
+        :param str file_loc: The location of the file
+        """
+        self.file_loc = file_loc
+        self.is_csv = file_loc.lower().endswith('.csv')
+        self.size = max(os.path.getsize(file_loc), 1)
+        self.position = 0
+
+    def open(self):
+        # the byte order mark some spreadsheet programs write would otherwise become part of the first column's name
+        return open(self.file_loc, encoding='utf-8-sig', newline='' if self.is_csv else None)
+
+    def counted_lines(self, file):
+        for line in file:
+            self.position += len(line)
+            yield line
+
+    def columns(self):
+        """
+        Method to get the names of the file's columns, from the header row of a .csv file, or the keys of the objects
+        in the first lines of a JSON Lines file.
+        """
+        with self.open() as file:
+            if self.is_csv:
+                return [column.strip() for column in next(csv.reader(file), [])]
+            columns = {}
+            for line_number, line in enumerate(file):
+                if line_number >= HEADER_LINES:
+                    break
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(row, dict):
+                    for key in row:
+                        columns.setdefault(key, True)
+            return list(columns)
+
+    def sample(self):
+        """
+        Method to get the first row of the file, to show what each column holds.
+
+        :return: a dict of column -> the column's text
+        """
+        for line_number, row, error in self.rows():
+            if row is not None:
+                return row
+        return {}
+
+    def rows(self):
+        """
+        Method to read the file a row at a time.
+
+        :return: a generator of tuples of the line number, a dict of column -> text (None if the line couldn't be
+            read), and the problem reading it or None
+        """
+        self.position = 0
+        with self.open() as file:
+            lines = self.counted_lines(file)
+            if self.is_csv:
+                reader = csv.reader(lines)
+                columns = [column.strip() for column in next(reader, [])]
+                for values in reader:
+                    if len(values) == 0:
+                        continue
+                    if len(values) > len(columns):
+                        yield reader.line_num, None, 'The row has more values than there are columns'
+                        continue
+                    yield reader.line_num, dict(zip(columns, values)), None
+            else:
+                for line_number, line in enumerate(lines, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        row = json.loads(line)
+                    except ValueError as ex:
+                        yield line_number, None, 'Unable to read the line: ' + str(ex)
+                        continue
+                    if not isinstance(row, dict):
+                        yield line_number, None, 'The line is not an object of named values'
+                        continue
+                    yield line_number, dict((key, plain_value(value)) for key, value in row.items()), None
+
+    def records(self, mapping):
+        """
+        Method to read the file's rows as the values of the fields they're mapped to.
+
+        :param dict mapping: The file's column -> the field it's imported into
+        :return: a generator of tuples of the line number, the stored values of the mapped fields in the order of
+            mapping (None if the row couldn't be read), and a list of the problems found
+        """
+        mapped = list(mapping.items())
+        for line_number, row, error in self.rows():
+            if row is None:
+                yield line_number, None, [error]
+                continue
+            values = []
+            errors = []
+            for column, field in mapped:
+                value, problem = stored_value(field, row.get(column) or '')
+                values.append(value)
+                if problem:
+                    errors.append(problem)
+            if not any(values):
+                continue
+            yield line_number, tuple(values), errors
+
+    def progress(self):
+        """
+        Method to get how far through the file has been read, as a percentage.
+        """
+        return min(int(self.position * 100 / self.size), 100)
+
+
+class RecordWriter:
+    """
+    RecordWriter adds the records read from a RecordFile to the user's database, many thousands to a transaction,
+    through a single connection. The records are given their IDs as each batch is written, while the write lock is
+    held, so that they follow any record added from the sermon tab while the import is running.
+    """
+    batch_size = 5000
+
+    def __init__(self, db_loc, fields):
+        """
+        :param str db_loc: The location of the user's database
+        :param list of str fields: The fields the records give values for, in the order they're given
+        """
+        self.conn = sqlite3.connect(db_loc, timeout=30)
+        self.cursor = self.conn.cursor()
+        self.sql = (
+            'INSERT INTO sermon_prep_database (ID, ' + ', '.join(fields) + ') VALUES ('
+            + ', '.join('?' for i in range(len(fields) + 1)) + ')')
+        self.batch = []
+        self.new_ids = []
+
+    def add(self, values):
+        """
+        Method to queue a record to be written, writing the queue once it's full.
+
+        :param tuple values: The record's stored values for each of the writer's fields
+        """
+        self.batch.append(values)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if len(self.batch) == 0:
+            return
+        self.cursor.execute('BEGIN IMMEDIATE')
+        highest_num = self.cursor.execute('SELECT MAX(CAST(ID AS INTEGER)) FROM sermon_prep_database').fetchone()[0]
+        first_id = (highest_num or 0) + 1
+        self.cursor.executemany(
+            self.sql, ((first_id + index,) + values for index, values in enumerate(self.batch)))
+        self.conn.commit()
+        self.new_ids += range(first_id, first_id + len(self.batch))
+        self.batch = []
+
+    def close(self):
+        """
+        Method to write any records still queued and close the connection.
+        """
+        try:
+            self.flush()
+        finally:
+            self.conn.close()
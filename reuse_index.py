@@ -0,0 +1,259 @@
+import html
+import re
+import sqlite3
+import zlib
+from array import array
+
+from text_normalization import normalize_word, reset_if_stale, words
+
+NUM_HASHES = 64
+NUM_BANDS = 16
+ROWS_PER_BAND = NUM_HASHES // NUM_BANDS
+SHINGLE_SIZE = 3
+MIN_WORDS = 12
+MERSENNE_PRIME = (1 << 61) - 1
+
+# the fields whose paragraphs are checked for reuse
+REUSE_FIELDS = ['illustrations', 'manuscript']
+
+# fixed coefficients so that signatures stored in the database stay comparable between sessions
+HASH_A = 1103515245 * 2654435761 % MERSENNE_PRIME
+HASH_B = 12345
+EMPTY_BIN = (1 << 64) - 1
+
+
+def split_paragraphs(string):
+    """
+    Function to split a field's stored html into plain-text paragraphs.
+
+    :param str string: The stored html of the field
+    """
+    if not string:
+        return []
+    string = re.sub('</p>|</li>|<br ?/?>|\n', '\n', string)
+    string = html.unescape(re.sub('<.*?>', '', string))
+    return [paragraph.strip() for paragraph in string.split('\n')]
+
+
+def shingles(paragraph):
+    """
+    Function to break a paragraph into the set of overlapping word n-grams used to compare it with others. Returns
+    an empty set if the paragraph is too short to compare meaningfully.
+
+    :param str paragraph: The plain text of the paragraph
+    """
+    terms = [normalize_word(word[0]) for word in words(paragraph)]
+    if len(terms) < MIN_WORDS:
+        return set()
+    return set(
+        zlib.crc32(' '.join(terms[i:i + SHINGLE_SIZE]).encode()) for i in range(len(terms) - SHINGLE_SIZE + 1))
+
+
+def minhash(shingle_set):
+    """
+    Function to compute the MinHash signature of a set of shingles. Uses one-permutation hashing, where each shingle
+    is hashed once and its hash falls into one of NUM_HASHES bins, keeping the minimum of each bin; empty bins borrow
+    the value of the next non-empty bin (rotation densification). This costs one hash per shingle instead of
+    NUM_HASHES.
+
+    :param set of int shingle_set: The hashed shingles of a paragraph
+    """
+    bins = [EMPTY_BIN] * NUM_HASHES
+    for shingle in shingle_set:
+        value = (HASH_A * shingle + HASH_B) % MERSENNE_PRIME
+        index = value % NUM_HASHES
+        value //= NUM_HASHES
+        if value < bins[index]:
+            bins[index] = value
+
+    signature = array('Q', bins)
+    for i in range(NUM_HASHES):
+        if bins[i] == EMPTY_BIN:
+            for distance in range(1, NUM_HASHES):
+                value = bins[(i + distance) % NUM_HASHES]
+                if value != EMPTY_BIN:
+                    # offset by the distance so borrowed values don't collide with real ones
+                    signature[i] = value + distance * (MERSENNE_PRIME // NUM_HASHES + 1)
+                    break
+    return signature
+
+
+def band_buckets(signature):
+    """
+    Function to hash each band of a signature into the LSH bucket it belongs in.
+
+    :param array signature: The MinHash signature
+    """
+    return [
+        zlib.crc32(signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes()) for band in range(NUM_BANDS)]
+
+
+def estimate_similarity(signature_a, signature_b):
+    """
+    Function to estimate the Jaccard similarity of two paragraphs from their signatures.
+    """
+    return sum(1 for a, b in zip(signature_a, signature_b) if a == b) / NUM_HASHES
+
+
+class ReuseIndex:
+    """
+    ReuseIndex stores the MinHash signature of every paragraph of the illustrations and manuscript fields of the
+    user's records in a locality-sensitive-hash index inside the database, so that paragraphs that closely match those
+    of other sermons can be found without comparing against every paragraph ever written.
+    """
+    def __init__(self, db_loc):
+        """
+        :param str db_loc: The location of the user's database
+        """
+        self.db_loc = db_loc
+        self.signature_cache = {}
+        self.synced = False
+
+    def create_tables(self, cursor):
+        cursor.execute(
+            'CREATE TABLE IF NOT EXISTS reuse_signatures (record_id INTEGER, field TEXT, paragraph INTEGER, '
+            'signature BLOB, preview TEXT, PRIMARY KEY (record_id, field, paragraph))')
+        cursor.execute(
+            'CREATE TABLE IF NOT EXISTS reuse_buckets (band INTEGER, bucket INTEGER, record_id INTEGER, field TEXT, '
+            'paragraph INTEGER)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS reuse_buckets_index ON reuse_buckets (band, bucket)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS reuse_buckets_record ON reuse_buckets (record_id)')
+        cursor.execute('CREATE TABLE IF NOT EXISTS reuse_indexed_records (record_id INTEGER PRIMARY KEY)')
+
+    def signature(self, paragraph):
+        """
+        Method to get the signature of a paragraph, reusing the one computed last time if the paragraph hasn't
+        changed. Returns None for paragraphs too short to compare.
+
+        :param str paragraph: The plain text of the paragraph
+        """
+        if paragraph in self.signature_cache:
+            return self.signature_cache[paragraph]
+
+        shingle_set = shingles(paragraph)
+        signature = minhash(shingle_set) if shingle_set else None
+        if len(self.signature_cache) > 5000:
+            self.signature_cache.clear()
+        self.signature_cache[paragraph] = signature
+        return signature
+
+    def sync(self):
+        """
+        Method to index any records that haven't been indexed yet and remove any that were deleted.
+        """
+        conn = sqlite3.connect(self.db_loc, timeout=30)
+        cursor = conn.cursor()
+        self.create_tables(cursor)
+        reset_if_stale(cursor, 'reuse', ['reuse_signatures', 'reuse_buckets', 'reuse_indexed_records'])
+        conn.commit()
+        record_ids = set(row[0] for row in cursor.execute('SELECT ID FROM sermon_prep_database'))
+        indexed_ids = set(row[0] for row in cursor.execute('SELECT record_id FROM reuse_indexed_records'))
+        conn.close()
+
+        stale_ids = list(indexed_ids - record_ids)
+        if len(stale_ids) > 0:
+            self.remove_records(stale_ids)
+        missing_ids = list(record_ids - indexed_ids)
+        if len(missing_ids) > 0:
+            self.update_records(missing_ids)
+        self.synced = True
+
+    def update_records(self, record_ids):
+        """
+        Method to (re)compute and store the paragraph signatures of the given records.
+
+        :param list of int record_ids: The ID numbers of the records that have changed
+        """
+        conn = sqlite3.connect(self.db_loc, timeout=30)
+        cursor = conn.cursor()
+        self.create_tables(cursor)
+        sql = 'SELECT ' + ', '.join(REUSE_FIELDS) + ' FROM sermon_prep_database WHERE ID = ?'
+        for record_id in record_ids:
+            record = cursor.execute(sql, (record_id,)).fetchone()
+            cursor.execute('DELETE FROM reuse_signatures WHERE record_id = ?', (record_id,))
+            cursor.execute('DELETE FROM reuse_buckets WHERE record_id = ?', (record_id,))
+            if not record:
+                cursor.execute('DELETE FROM reuse_indexed_records WHERE record_id = ?', (record_id,))
+                continue
+
+            signature_rows = []
+            bucket_rows = []
+            for field, value in zip(REUSE_FIELDS, record):
+                paragraphs = split_paragraphs(value)
+                for i in range(len(paragraphs)):
+                    signature = self.signature(paragraphs[i])
+                    if not signature:
+                        continue
+                    signature_rows.append((record_id, field, i, signature.tobytes(), paragraphs[i][0:200]))
+                    buckets = band_buckets(signature)
+                    for band in range(NUM_BANDS):
+                        bucket_rows.append((band, buckets[band], record_id, field, i))
+
+            cursor.executemany('INSERT INTO reuse_signatures VALUES (?, ?, ?, ?, ?)', signature_rows)
+            cursor.executemany('INSERT INTO reuse_buckets VALUES (?, ?, ?, ?, ?)', bucket_rows)
+            cursor.execute('INSERT OR IGNORE INTO reuse_indexed_records VALUES (?)', (record_id,))
+        conn.commit()
+        conn.close()
+
+    def remove_records(self, record_ids):
+        """
+        Method to remove deleted records from the index.
+
+        :param list of int record_ids: The ID numbers of the records that were deleted
+        """
+        conn = sqlite3.connect(self.db_loc, timeout=30)
+        cursor = conn.cursor()
+        self.create_tables(cursor)
+        for record_id in record_ids:
+            cursor.execute('DELETE FROM reuse_signatures WHERE record_id = ?', (record_id,))
+            cursor.execute('DELETE FROM reuse_buckets WHERE record_id = ?', (record_id,))
+            cursor.execute('DELETE FROM reuse_indexed_records WHERE record_id = ?', (record_id,))
+        conn.commit()
+        conn.close()
+
+    def find_matches(self, paragraphs, exclude_record_id=None, threshold=0.5):
+        """
+        Method to find the paragraphs of other records that closely match any of the given paragraphs. Only the
+        paragraphs sharing an LSH bucket with a given paragraph are compared, so the cost doesn't grow with the size of
+        the database.
+
+        :param list of str paragraphs: The plain-text paragraphs being edited
+        :param int exclude_record_id: The ID of the record being edited, whose own paragraphs shouldn't match
+        :param float threshold: The estimated similarity above which a paragraph counts as a match
+        :return: a list of tuples of paragraph index, matching record id, field, similarity, and preview text
+        """
+        if not self.synced:
+            self.sync()
+
+        conn = sqlite3.connect(self.db_loc, timeout=30)
+        cursor = conn.cursor()
+        matches = []
+        for i in range(len(paragraphs)):
+            signature = self.signature(paragraphs[i])
+            if not signature:
+                continue
+
+            candidates = set()
+            buckets = band_buckets(signature)
+            for band in range(NUM_BANDS):
+                for row in cursor.execute(
+                        'SELECT record_id, field, paragraph FROM reuse_buckets WHERE band = ? AND bucket = ?',
+                        (band, buckets[band])):
+                    if row[0] != exclude_record_id:
+                        candidates.add(row)
+
+            for record_id, field, paragraph in candidates:
+                row = cursor.execute(
+                    'SELECT signature, preview FROM reuse_signatures WHERE record_id = ? AND field = ? '
+                    'AND paragraph = ?', (record_id, field, paragraph)).fetchone()
+                if not row:
+                    continue
+                other_signature = array('Q')
+                other_signature.frombytes(row[0])
+                similarity = estimate_similarity(signature, other_signature)
+                if similarity >= threshold:
+                    matches.append((i, record_id, field, similarity, row[1]))
+        conn.close()
+
+        matches.sort(key=lambda match: (match[0], -match[3]))
+        return matches
@@ -1,9 +1,12 @@
 import os
 from os.path import exists
 
-from PyQt6.QtCore import QRunnable
+from PyQt6.QtCore import QRunnable, QObject, pyqtSignal
 from symspellpy import SymSpell
 
+from record_files import MAX_ERRORS, RecordWriter
+from sermon_files import SermonWriter, file_signature, find_sermon_files, parse_sermon_files
+
 
 class LoadDictionary(QRunnable):
     def __init__(self, main):
@@ -27,3 +30,374 @@ class LoadDictionary(QRunnable):
             custom_words = file.readlines()
         for entry in custom_words:
             self.main.sym_spell.create_dictionary_entry(entry.strip(), 1)
+
+
+class ReuseSignals(QObject):
+    finished = pyqtSignal(int, str, object)
+
+
+class FindReusedParagraphs(QRunnable):
+    def __init__(self, main, record_id, field, paragraphs):
+        """
+        :param Main main: The Main object
+        :param int record_id: The ID of the record being edited
+        :param str field: The name of the field being checked
+        :param list of str paragraphs: The plain-text paragraphs of the field
+        """
+        super().__init__()
+        self.main = main
+        self.record_id = record_id
+        self.field = field
+        self.paragraphs = paragraphs
+        self.signals = ReuseSignals()
+
+    def run(self):
+        """
+        Method to look up the paragraphs of other sermons that closely match the paragraphs being edited, emitting the
+        matches when done.
+        """
+        try:
+            matches = self.main.reuse_index.find_matches(self.paragraphs, self.record_id)
+        except Exception as ex:
+            self.main.write_to_log('FindReusedParagraphs.run: ' + str(ex))
+            return
+        self.signals.finished.emit(self.record_id, self.field, matches)
+
+
+class BibleIndexSignals(QObject):
+    finished = pyqtSignal(int)
+
+
+class BuildBibleIndex(QRunnable):
+    def __init__(self, main):
+        """
+        :param Main main: The Main object
+        """
+        super().__init__()
+        self.main = main
+        self.signals = BibleIndexSignals()
+
+    def run(self):
+        """
+        Method to compile any of the user's XML bibles whose index is missing or out of date, emitting the number of
+        verses indexed (or -1 on failure) when done.
+        """
+        num_verses = 0
+        for index in self.main.bible_library.get_stale():
+            try:
+                num_verses += index.build()
+            except Exception as ex:
+                self.main.write_to_log('BuildBibleIndex.run: ' + index.bible_file + ': ' + str(ex))
+                num_verses = -1
+                break
+        self.signals.finished.emit(num_verses)
+
+
+class PreloadBibleIndex(QRunnable):
+    def __init__(self, main):
+        """
+        :param Main main: The Main object
+        """
+        super().__init__()
+        self.main = main
+
+    def run(self):
+        """
+        Method to read through the main bible's index once so that it is in the disk cache before it is first needed.
+        """
+        try:
+            self.main.bible_index.preload()
+        except Exception as ex:
+            self.main.write_to_log('PreloadBibleIndex.run: ' + str(ex))
+
+
+class PassageSignals(QObject):
+    finished = pyqtSignal(int, str, object)
+
+
+class ResolvePassage(QRunnable):
+    def __init__(self, gs, reference, request):
+        """
+        :param GetScripture gs: The GUI's GetScripture object
+        :param str reference: The scripture reference to look up
+        :param int request: A number identifying this lookup, so that results for outdated references can be ignored
+        """
+        super().__init__()
+        self.gs = gs
+        self.reference = reference
+        self.request = request
+        self.signals = PassageSignals()
+
+    def run(self):
+        """
+        Method to look up the text of a passage, emitting it (or -1 if it can't be found) when done.
+        """
+        passage = self.gs.get_passage(self.reference)
+        self.signals.finished.emit(self.request, self.reference, passage)
+
+
+class BackfillSignals(QObject):
+    progress = pyqtSignal(int)
+    status = pyqtSignal(str)
+    finished = pyqtSignal(int)
+
+
+class BackfillScripture(QRunnable):
+    def __init__(self, main, backfill, records):
+        """
+        :param Main main: The Main object
+        :param ScriptureBackfill backfill: The backfill to run
+        :param list of tuple records: The record IDs and references of the records to fill
+        """
+        super().__init__()
+        self.main = main
+        self.backfill = backfill
+        self.records = records
+        self.cancelled = False
+        self.signals = BackfillSignals()
+
+    def cancel(self):
+        """
+        Method to stop the backfill before anything is written. Once the passages are being saved, the backfill runs
+        to completion.
+        """
+        self.cancelled = True
+
+    def run(self):
+        """
+        Method to look up the passages of the records, save them, and bring the indexes up to date, emitting the number
+        of records filled (-1 on failure, -2 if cancelled) when done.
+        """
+        try:
+            updates = self.backfill.resolve(self.records, self.signals.progress.emit, lambda: self.cancelled)
+            if updates is None:
+                self.signals.finished.emit(-2)
+                return
+
+            self.signals.status.emit('Saving sermon texts...')
+            record_ids = self.backfill.write(updates)
+
+            self.signals.status.emit('Updating indexes...')
+            if len(record_ids) > 0:
+                self.main.update_indexes(record_ids)
+        except Exception as ex:
+            self.main.write_to_log('BackfillScripture.run: ' + str(ex))
+            self.signals.finished.emit(-1)
+            return
+        self.signals.finished.emit(len(record_ids))
+
+
+class CompileBibleSignals(QObject):
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(object)
+
+
+class CompileBible(QRunnable):
+    def __init__(self, main, index):
+        """
+        :param Main main: The Main object
+        :param BibleIndex index: The index of the bible to compile
+        """
+        super().__init__()
+        self.main = main
+        self.index = index
+        self.signals = CompileBibleSignals()
+
+    def run(self):
+        """
+        Method to compile a newly imported bible and check it for missing books, chapters, and verses, emitting the
+        validation report (or the error message, as a str, on failure) when done.
+        """
+        try:
+            self.index.build(self.signals.progress.emit)
+            report = self.index.validate()
+        except Exception as ex:
+            self.main.write_to_log('CompileBible.run: ' + self.index.bible_file + ': ' + str(ex))
+            self.signals.finished.emit(str(ex))
+            return
+        self.signals.finished.emit(report)
+
+
+class ImportSignals(QObject):
+    discovered = pyqtSignal(int, str)
+    parsed = pyqtSignal(int)
+    inserted = pyqtSignal(int)
+    errors = pyqtSignal(int)
+    finished = pyqtSignal(object)
+
+
+class ImportSermons(QRunnable):
+    def __init__(self, main, folder, recurse, ignore=None):
+        """
+        :param Main main: The Main object
+        :param str folder: The folder to import sermon files from
+        :param boolean recurse: Also import from the folder's subfolders
+        :param dict ignore: Optional files that couldn't be imported before, as path -> size and modification time, to
+            pass over unless they've changed since
+        """
+        super().__init__()
+        self.main = main
+        self.folder = folder
+        self.recurse = recurse
+        self.ignore = ignore or {}
+        self.failed = {}
+        self.cancelled = False
+        self.signals = ImportSignals()
+
+    def cancel(self):
+        """
+        Method to stop the import after the files being parsed. The sermons already parsed are still written, and
+        importing the folder again carries on from there.
+        """
+        self.cancelled = True
+
+    def find_files(self, writer):
+        """
+        Method to find the files to import that are new or changed since they were last imported, emitting the number
+        found and the folder being looked in as it goes, and an empty folder once they've all been found.
+        """
+        found = 0
+        for directory, file_loc in find_sermon_files(self.folder, self.recurse):
+            if self.cancelled:
+                return
+            if writer.is_unchanged(file_loc):
+                continue
+            try:
+                if self.ignore.get(file_loc) == file_signature(file_loc):
+                    continue
+            except OSError:
+                continue
+            found += 1
+            self.signals.discovered.emit(found, directory)
+            yield file_loc
+        self.signals.discovered.emit(found, '')
+
+    def remember_failure(self, file_loc):
+        """
+        Method to note a file that couldn't be imported as it is now, so that a later import can pass over it.
+        """
+        try:
+            self.failed[file_loc] = file_signature(file_loc)
+        except OSError:
+            pass
+
+    def run(self):
+        """
+        Method to parse the folder's sermon files in a pool of worker processes, write them to the database in
+        batches, and bring the indexes up to date, emitting a dict of the new record IDs, the IDs of the records
+        updated from changed files, the errors, the number of unchanged files skipped, the files that couldn't be
+        imported, and whether the import was cancelled when done.
+        """
+        errors = []
+        writer = None
+        try:
+            writer = SermonWriter(self.main.db_loc)
+            parsed = 0
+            results = parse_sermon_files(self.find_files(writer))
+            for file_loc, sermon, file_errors, file_info in results:
+                if sermon:
+                    writer.add(file_loc, sermon, file_info)
+                else:
+                    self.remember_failure(file_loc)
+                if len(file_errors) > 0:
+                    errors += file_errors
+                    self.signals.errors.emit(len(errors))
+                parsed += 1
+                self.signals.parsed.emit(parsed)
+                self.signals.inserted.emit(len(writer.new_ids))
+                if self.cancelled:
+                    results.close()
+                    break
+            writer.close()
+        except Exception as ex:
+            errors.append([self.folder, 'Import stopped: ' + str(ex)])
+            self.main.write_to_log('ImportSermons.run: ' + str(ex))
+            if writer:
+                writer.conn.close()
+
+        # whatever was written before an error is kept, so the indexes are brought up to date with it either way
+        new_ids = writer.new_ids if writer else []
+        updated_ids = writer.updated_ids if writer else []
+        unchanged = writer.unchanged if writer else 0
+        self.signals.inserted.emit(len(new_ids))
+        if writer:
+            for file_loc, record_id in writer.duplicates:
+                errors.append([file_loc, 'Not imported; the same sermon is already saved as record ' + str(record_id)])
+        if len(new_ids) + len(updated_ids) > 0:
+            self.main.update_indexes(new_ids + updated_ids)
+        self.signals.finished.emit({
+            'new_ids': new_ids, 'updated_ids': updated_ids, 'errors': errors, 'unchanged': unchanged,
+            'failed': self.failed, 'cancelled': self.cancelled
+        })
+
+
+class RecordImportSignals(QObject):
+    progress = pyqtSignal(int)
+    inserted = pyqtSignal(int)
+    finished = pyqtSignal(object)
+
+
+class ImportRecords(QRunnable):
+    def __init__(self, main, record_file, mapping):
+        """
+        :param Main main: The Main object
+        :param RecordFile record_file: The .csv or JSON Lines file to import
+        :param dict mapping: The file's column -> the field it's imported into
+        """
+        super().__init__()
+        self.main = main
+        self.record_file = record_file
+        self.mapping = mapping
+        self.cancelled = False
+        self.signals = RecordImportSignals()
+
+    def cancel(self):
+        """
+        Method to stop the import. The records already written are kept.
+        """
+        self.cancelled = True
+
+    def run(self):
+        """
+        Method to read the file's rows, write them to the database in large batches, and bring the indexes up to date
+        once, for every new record, at the end, emitting a dict of the new record IDs, the errors, and whether the
+        import was cancelled when done.
+        """
+        errors = []
+        problems = 0
+        writer = None
+        try:
+            writer = RecordWriter(self.main.db_loc, list(self.mapping.values()))
+            for line_number, values, row_errors in self.record_file.records(self.mapping):
+                if values is not None:
+                    writer.add(values)
+                    # progress is shown as each batch is written, rather than flooding the GUI with a signal per row
+                    if len(writer.batch) == 0:
+                        self.signals.inserted.emit(len(writer.new_ids))
+                        self.signals.progress.emit(self.record_file.progress())
+                for error in row_errors:
+                    problems += 1
+                    if problems <= MAX_ERRORS:
+                        errors.append(['Line ' + str(line_number), error])
+                if self.cancelled:
+                    break
+            if self.cancelled:
+                writer.conn.close()
+            else:
+                writer.close()
+        except Exception as ex:
+            errors.append([self.record_file.file_loc, 'Import stopped: ' + str(ex)])
+            self.main.write_to_log('ImportRecords.run: ' + str(ex))
+            if writer:
+                writer.conn.close()
+
+        if problems > MAX_ERRORS:
+            errors.append([self.record_file.file_loc, str(problems - MAX_ERRORS) + ' more problems were not listed'])
+        new_ids = writer.new_ids if writer else []
+        self.signals.inserted.emit(len(new_ids))
+        if len(new_ids) > 0:
+            self.main.update_indexes(new_ids)
+        self.signals.finished.emit({
+            'new_ids': new_ids, 'updated_ids': [], 'errors': errors, 'unchanged': 0, 'cancelled': self.cancelled,
+            'resumable': False
+        })
@@ -0,0 +1,112 @@
+import html
+import sqlite3
+
+from get_scripture import GetScripture
+from search_index import field_plain_text
+
+
+def passage_html(passage):
+    """
+    Function to convert a passage from GetScripture into the html the sermon text field is stored as, one paragraph
+    per line.
+
+    :param str passage: The text of the passage
+    """
+    return '\n'.join('<p>' + html.escape(line) + '</p>' for line in passage.split('\n'))
+
+
+class ScriptureBackfill:
+    """
+    ScriptureBackfill fills in the sermon text of every record that has a reference but no text (such as the sermons
+    brought in by "Import Sermons from Files"). Every passage is read from the compiled bible index over a single
+    connection and all of the records are written back in one transaction, so the user's database is changed all at
+    once or, if the backfill is cancelled or fails, not at all.
+    """
+    def __init__(self, main):
+        """
+        :param Main main: The Main object
+        """
+        self.db_loc = main.db_loc
+        self.bible_index = main.bible_index
+        # the backfill gets its own GetScripture so that its lookups don't churn the GUI's cache of recent passages
+        self.gs = GetScripture(main)
+
+    def find_records(self):
+        """
+        Method to find the records that have a sermon reference but an empty sermon text.
+
+        :return: a list of tuples of record ID and sermon reference
+        """
+        conn = sqlite3.connect(self.db_loc)
+        cursor = conn.cursor()
+        rows = cursor.execute(
+            'SELECT ID, sermon_reference, sermon_scripture FROM sermon_prep_database WHERE sermon_reference IS NOT NULL '
+            'AND TRIM(sermon_reference) != \'\'').fetchall()
+        conn.close()
+
+        # the editor stores an emptied field as empty paragraphs, so check the field's text rather than its html
+        return [
+            (record_id, reference.replace('&quot;', '"').strip())
+            for record_id, reference, scripture in rows
+            if field_plain_text(scripture).strip() == ''
+        ]
+
+    def resolve(self, records, progress=None, cancelled=None):
+        """
+        Method to look up the passage of each record's reference.
+
+        :param list of tuple records: The record IDs and references from find_records
+        :param function progress: Called with the number of records looked up so far, or None
+        :param function cancelled: Returns True if the backfill should stop, or None
+        :return: a list of tuples of the stored html of the passage and the record's ID, or None if cancelled
+        """
+        conn = sqlite3.connect(self.bible_index.index_loc)
+        cursor = conn.cursor()
+        updates = []
+        try:
+            for i in range(len(records)):
+                if cancelled and cancelled():
+                    return None
+                record_id, reference = records[i]
+                passage = self.gs.get_passage(reference, cursor)
+                if passage and passage != -1:
+                    updates.append((passage_html(passage), record_id))
+                if progress and i % 25 == 0:
+                    progress(i)
+        finally:
+            conn.close()
+        if progress:
+            progress(len(records))
+        return updates
+
+    def write(self, updates):
+        """
+        Method to save the looked-up passages to the user's database in a single transaction. A record whose sermon
+        text was filled in some other way in the meantime is left alone.
+
+        :param list of tuple updates: The passages' html and record IDs from resolve
+        :return: the IDs of the records that were filled
+        """
+        conn = sqlite3.connect(self.db_loc, timeout=30)
+        cursor = conn.cursor()
+        try:
+            # the passages go into a keyed temporary table so that the records are updated in one pass over the table
+            cursor.execute('CREATE TEMP TABLE backfill (record_id INTEGER PRIMARY KEY, scripture TEXT)')
+            cursor.executemany('INSERT OR REPLACE INTO backfill (scripture, record_id) VALUES (?, ?)', updates)
+            still_empty = set(
+                row[0] for row in cursor.execute(
+                    'SELECT ID, sermon_scripture FROM sermon_prep_database WHERE ID IN (SELECT record_id FROM backfill)')
+                if field_plain_text(row[1]).strip() == '')
+            cursor.executemany(
+                'DELETE FROM backfill WHERE record_id = ?',
+                [(record_id,) for scripture, record_id in updates if record_id not in still_empty])
+            cursor.execute(
+                'UPDATE sermon_prep_database SET sermon_scripture = '
+                '(SELECT scripture FROM backfill WHERE record_id = ID) WHERE ID IN (SELECT record_id FROM backfill)')
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return sorted(still_empty)
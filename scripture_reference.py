@@ -0,0 +1,433 @@
+import re
+from functools import lru_cache
+
+# list of bible books and their common abbreviations
+BOOKS = [
+    ['Genesis', 'gen', 'ge', 'gn'],
+    ['Exodus', 'exod', 'exo', 'ex'],
+    ['Leviticus', 'lev', 'le', 'lv'],
+    ['Numbers', 'num', 'nu', 'nm', 'nb'],
+    ['Deuteronomy', 'deut', 'de', 'dt'],
+    ['Joshua', 'josh', 'jos', 'jsh'],
+    ['Judges', 'judg', 'jg', 'jdgs'],
+    ['Ruth', 'rth', 'ru'],
+    ['1 Samuel', '1st samuel', '1 sa', '1sa', '1s', '1 sm', '1sm', '1st sam'],
+    ['2 Samuel', '2nd samuel', '2 sa', '2sa', '2s', '2 sm', '2sm', '2nd sam'],
+    ['1 Kings', '1st kings', '1 ki', '1ki', '1k', '1 kgs', '1kgs', '1st ki', '1st kgs'],
+    ['2 Kings', '2nd kings', '2 ki', '2ki', '2k', '2 kgs', '2kgs', '2nd ki', '2nd kgs'],
+    ['1 Chronicles', '1st chronicles', '1 ch', '1ch', '1 chron', '1chron', '1 chr', '1chr',
+     '1st ch', '1st chron'],
+    ['2 Chronicles', '2nd chronicles', '2 ch', '2ch', '2 chron', '2chron', '2 chr', '2chr',
+     '2nd ch', '2nd chron'],
+    ['Ezra', 'ezr', 'ez'],
+    ['Nehemiah', 'neh', 'ne'],
+    ['Esther', 'est', 'esth', 'es'],
+    ['Job', 'jb'],
+    ['Psalms', 'psalm', 'ps', 'psa', 'psm', 'pss'],
+    ['Proverbs', 'pro', 'pr', 'prv'],
+    ['Ecclesiastes', 'eccles', 'eccle', 'ec', 'qoh'],
+    ['Song of Solomon', 'song', 'so', 'sos', 'canticle of canticles', 'canticles', 'cant'],
+    ['Isaiah', 'isa', 'is'],
+    ['Jeremiah', 'jer', 'je', 'jr'],
+    ['Lamentations', 'lam', 'la'],
+    ['Ezekiel', 'ezek', 'eze', 'ezk'],
+    ['Daniel', 'dan', 'da', 'dn'],
+    ['Hosea', 'hos', 'ho'],
+    ['Joel', 'joe', 'jl'],
+    ['Amos', 'am'],
+    ['Obadiah', 'obad', 'ob'],
+    ['Jonah', 'jnh', 'jon'],
+    ['Micah', 'mic', 'mc'],
+    ['Nahum', 'nah', 'na'],
+    ['Habakkuk', 'hab', 'hb'],
+    ['Zephaniah', 'zep', 'zp'],
+    ['Haggai', 'hag', 'hg'],
+    ['Zechariah', 'zech', 'zec', 'zc'],
+    ['Malachi', 'mal', 'ml'],
+    ['Matthew', 'matt', 'mat', 'mt'],
+    ['Mark', 'mk', 'mar', 'mrk', 'mr'],
+    ['Luke', 'luk', 'lk'],
+    ['John', 'joh', 'jhn', 'jn'],
+    ['Acts', 'act', 'ac'],
+    ['Romans', 'rom', 'ro', 'rm'],
+    ['1 Corinthians', '1st corinthians', '1 cor', '1cor', '1 co', '1co', '1corinthians', '1st cor', '1st co'],
+    ['2 Corinthians', '2nd corinthians', '2 cor', '2cor', '2 co', '2co', '2corinthians', '2nd cor', '2nd co'],
+    ['Galatians', 'gal', 'ga'],
+    ['Ephesians', 'ephes', 'eph'],
+    ['Philippians', 'phil', 'php', 'pp'],
+    ['Colossians', 'col', 'co'],
+    ['1 Thessalonians', '1st thessalonians', '1 thes', '1thes', '1 th', '1th', '1thessalonians',
+     '1st thes', '1st th'],
+    ['2 Thessalonians', '2nd thessalonians', '2 thes', '2thes', '2 th', '2th', '2thessalonians',
+     '2nd thes', '2nd th'],
+    ['1 Timothy', '1st timothy', '1 tim', '1tim', '1 ti', '1ti', '1timothy', '1st tim', '1st ti'],
+    ['2 Timothy', '2nd timothy', '2 tim', '2tim', '2 ti', '2ti', '2timothy', '2nd tim', '2nd ti'],
+    ['Titus', 'tit', 'ti'],
+    ['Philemon', 'philem', 'phm', 'pm'],
+    ['Hebrews', 'heb'],
+    ['James', 'jas', 'jm'],
+    ['1 Peter', '1st peter', '1 pet', '1pet', '1 pe', '1pe', '1 pt', '1pt', '1 p', '1p',
+     '1st pet', '1st pe', '1st pt', '1st p'],
+    ['2 Peter', '2nd peter', '2 pet', '2pet', '2 pe', '2pe', '2 pt', '2pt', '2 p', '2p',
+     '2nd pet', '2nd pe', '2nd pt', '2nd p'],
+    ['1 John', '1st john', '1 jn', '1jn', '1 jo', '1jo', '1 joh', '1joh', '1 jhn', '1jhn', '1 j', '1j',
+     '1st jn', '1st jo', '1st joh', '1st jhn'],
+    ['2 John', '2nd john', '2 jn', '2jn', '2 jo', '2jo', '2 joh', '2joh', '2 jhn', '2jhn', '2 j', '2j',
+     '2nd jn', '2nd jo', '2nd joh', '2nd jhn'],
+    ['3 John', '3rd john', '3 jn', '3jn', '3 jo', '3jo', '3 joh', '3joh', '3 jhn', '3jhn', '3 j', '3j',
+     '3rd jn', '3rd jo', '3rd joh', '3rd jhn'],
+    ['Jude', 'jud', 'jd'],
+    ['Revelation', 'rev', 're', 'the revelation']
+]
+
+
+# the number of chapters in each book, in the same order as BOOKS
+CHAPTER_COUNTS = [
+    50, 40, 27, 36, 34, 24, 21, 4, 31, 24, 22, 25, 29, 36, 10, 13, 10, 42, 150, 31, 12, 8, 66, 52, 5, 48, 12, 14, 3, 9,
+    1, 4, 7, 3, 3, 3, 2, 14, 4, 28, 16, 24, 21, 28, 16, 16, 13, 6, 6, 4, 4, 5, 3, 6, 4, 3, 1, 13, 5, 5, 3, 5, 1, 1, 1,
+    22
+]
+
+# the number of books of the Old Testament; the books after these are the New Testament
+OLD_TESTAMENT_BOOKS = 39
+
+# books with only one chapter, whose references usually give only the verse (i.e. Jude 3)
+SINGLE_CHAPTER_BOOKS = {31, 57, 63, 64, 65}
+
+# the verse number used for the end of a whole chapter
+LAST_VERSE = 999
+
+ORDINAL_PREFIXES = [
+    ('first ', '1'), ('second ', '2'), ('third ', '3'), ('1st', '1'), ('2nd', '2'), ('3rd', '3'), ('iii ', '3'),
+    ('ii ', '2'), ('i ', '1')
+]
+TOKEN_PATTERN = re.compile('(\\d+)(?:st|nd|rd|[a-z](?![a-z]))?|([^\\W\\d_]+)\\.?|([:.,;\\-–—])', re.IGNORECASE)
+
+
+def verse_ordinal(book, chapter, verse):
+    """
+    Function to get the key a verse is stored under. Ordinals sort in canonical order, so a range of verses, even one
+    spanning chapters, is a single range of ordinals.
+
+    :param int book: The book's number (Genesis is 1)
+    :param int chapter: The chapter number
+    :param int verse: The verse number
+    """
+    return book * 1000000 + chapter * 1000 + verse
+
+
+def split_ordinal(ordinal):
+    """
+    Function to turn a verse ordinal back into its book, chapter, and verse numbers.
+    """
+    return ordinal // 1000000, ordinal // 1000 % 1000, ordinal % 1000
+
+
+def book_key(text):
+    """
+    Function to reduce a book name or abbreviation to the form it is looked up by: lowercase, without periods or
+    spaces, and with ordinals like "I", "First", or "1st" written as a digit.
+
+    :param str text: The book name as written
+    """
+    text = re.sub('\\s+', ' ', text.lower().replace('.', ' ')).strip() + ' '
+    for prefix, digit in ORDINAL_PREFIXES:
+        if text.startswith(prefix):
+            text = digit + text[len(prefix):]
+            break
+    return text.replace(' ', '')
+
+
+class BookTrie:
+    """
+    BookTrie is a prefix tree of every book alias, used to resolve partially typed book names (i.e. "Deu" or "Phile")
+    that aren't aliases themselves but can only mean one book.
+    """
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, key, book):
+        node = self.root
+        for char in key:
+            node = node.setdefault(char, {})
+            node.setdefault('books', set()).add(book)
+
+    def find(self, key):
+        """
+        Method to get the only book whose aliases begin with the given key, or None if there is no such book or more
+        than one.
+        """
+        node = self.root
+        for char in key:
+            if char not in node:
+                return None
+            node = node[char]
+        if len(node['books']) == 1:
+            return next(iter(node['books']))
+        return None
+
+
+BOOK_ALIASES = {}
+BOOK_TRIE = BookTrie()
+for book_number in range(1, len(BOOKS) + 1):
+    for alias in BOOKS[book_number - 1]:
+        BOOK_ALIASES[book_key(alias)] = book_number
+        BOOK_TRIE.insert(book_key(alias), book_number)
+
+
+def resolve_book(text):
+    """
+    Function to find the number of the book named by an alias or an unambiguous beginning of one.
+
+    :param str text: The book name as written
+    :return: the book's number (Genesis is 1), or None if it can't be resolved
+    """
+    key = book_key(text)
+    if key in BOOK_ALIASES:
+        return BOOK_ALIASES[key]
+    if (len(key) >= 3 and key[0].isalpha()) or len(key) >= 4:
+        return BOOK_TRIE.find(key)
+    return None
+
+
+def parse_reference(reference):
+    """
+    Function to parse a scripture reference into verse ranges in a single pass over its tokens. Handles cross-chapter
+    spans (John 3:16-4:2), whole chapters (Ps 23), comma lists (Rom 8:1-4, 28-30), and semicolon-separated passages,
+    which may leave out the book when it hasn't changed (Ps 23; 100).
+
+    :param str reference: The reference as written
+    :return: a list of tuples of the first and last verse ordinals of each range, or an empty list if the reference
+        can't be parsed
+    """
+    ranges = []
+    book = None
+    chapter = None
+    verse_mode = False
+    name_words = []
+    item = []
+
+    # add a trailing separator so that the last item is finished by the same code as the others
+    tokens = [match.groups() for match in TOKEN_PATTERN.finditer(reference)] + [(None, None, ';')]
+    for i in range(len(tokens)):
+        number, word, separator = tokens[i]
+
+        # a number followed directly by a word is the start of a numbered book's name (i.e. 1 Cor)
+        if number and i + 1 < len(tokens) and tokens[i + 1][1] and len(item) == 0:
+            name_words.append(number)
+            continue
+        if word:
+            if word.lower() in ('f', 'ff', 'and', 'vv', 'v', 'ch', 'chapter', 'verse', 'verses') and book:
+                continue
+            name_words.append(word)
+            continue
+
+        if len(name_words) > 0:
+            book = resolve_book(' '.join(name_words))
+            name_words = []
+            chapter = None
+            verse_mode = False
+            if not book:
+                return []
+
+        if number:
+            item.append(int(number))
+        elif separator in ':.' and len(item) > 0 and item[-1] != ':':
+            item.append(':')
+        elif separator in '-–—' and len(item) > 0 and '-' not in item:
+            item.append('-')
+        elif separator in ',;':
+            if len(item) > 0:
+                if not book:
+                    return []
+                parsed = parse_item(item, book, chapter, verse_mode)
+                if not parsed:
+                    return []
+                start, end, chapter, verse_mode = parsed
+                ranges.append((start, end))
+                item = []
+            if separator == ';':
+                verse_mode = False
+    return ranges
+
+
+def parse_item(item, book, chapter, verse_mode):
+    """
+    Function to turn one comma-separated item of a reference into a range of verses.
+
+    :param list item: The item's numbers and ':' and '-' separators
+    :param int book: The book's number
+    :param int chapter: The chapter of the item before this one, or None
+    :param boolean verse_mode: True if the item before this one gave verses, so that a lone number is a verse
+    :return: a tuple of the first and last verse ordinals, the chapter this item ended in, and the new verse_mode, or
+        None if the item isn't valid
+    """
+    if '-' in item:
+        left = item[:item.index('-')]
+        right = item[item.index('-') + 1:]
+    else:
+        left = item
+        right = []
+
+    if len(left) == 3 and left[1] == ':':
+        start_chapter, start_verse = left[0], left[2]
+        verse_mode = True
+    elif len(left) == 1:
+        if verse_mode and chapter:
+            start_chapter, start_verse = chapter, left[0]
+        elif book in SINGLE_CHAPTER_BOOKS:
+            start_chapter, start_verse = 1, left[0]
+            verse_mode = True
+        else:
+            start_chapter, start_verse = left[0], 1
+    else:
+        return None
+
+    if len(right) == 0:
+        end_chapter = start_chapter
+        end_verse = start_verse if verse_mode else LAST_VERSE
+    elif len(right) == 3 and right[1] == ':':
+        end_chapter, end_verse = right[0], right[2]
+        if not verse_mode:
+            start_verse = 1
+            verse_mode = True
+    elif len(right) == 1:
+        if verse_mode:
+            end_chapter, end_verse = start_chapter, right[0]
+        else:
+            end_chapter, end_verse = right[0], LAST_VERSE
+    else:
+        return None
+
+    if not 0 < start_chapter < 1000 or not 0 < end_chapter < 1000 or not 0 < start_verse < 1000 \
+            or not 0 < end_verse < 1000:
+        return None
+    start = verse_ordinal(book, start_chapter, start_verse)
+    end = verse_ordinal(book, end_chapter, end_verse)
+    if end < start:
+        return None
+    return start, end, end_chapter, verse_mode
+
+
+def format_reference(ranges):
+    """
+    Function to write verse ranges as a reference in a standard form, i.e. "Romans 8:1-4, 28-30; Psalms 23".
+
+    :param list of tuple ranges: The first and last verse ordinals of each range
+    """
+    reference = ''
+    last_book = None
+    last_chapter = None
+    last_whole = False
+    for start, end in ranges:
+        book, start_chapter, start_verse = split_ordinal(start)
+        end_chapter, end_verse = split_ordinal(end)[1:]
+        whole = start_verse == 1 and end_verse == LAST_VERSE
+
+        if whole:
+            text = str(start_chapter) if start_chapter == end_chapter else str(start_chapter) + '-' + str(end_chapter)
+        elif start_chapter == end_chapter == 1 and book in SINGLE_CHAPTER_BOOKS:
+            text = str(start_verse)
+            if end_verse != start_verse:
+                text += '-' + str(end_verse)
+        elif start_chapter == end_chapter:
+            text = str(start_chapter) + ':' + str(start_verse)
+            if end_verse != start_verse:
+                text += '-' + str(end_verse)
+        else:
+            text = str(start_chapter) + ':' + str(start_verse) + '-' + str(end_chapter) + ':' + str(end_verse)
+
+        if book != last_book:
+            if reference:
+                reference += '; '
+            reference += BOOKS[book - 1][0] + ' ' + text
+        elif start_chapter == last_chapter and not whole and not last_whole:
+            # more verses of the same chapter only need their verse numbers
+            reference += ', ' + text[text.find(':') + 1:]
+        else:
+            reference += '; ' + text
+
+        last_book = book
+        last_chapter = end_chapter
+        last_whole = whole
+    return reference
+
+
+def canonical_reference(reference):
+    """
+    Function to rewrite a reference in the standard form, or return None if it can't be parsed.
+
+    :param str reference: The reference as written
+    """
+    ranges = parse_reference(reference)
+    if len(ranges) == 0:
+        return None
+    return format_reference(ranges)
+
+
+def written_alias_patterns():
+    """
+    Function to turn the aliases of BOOKS into the patterns that find them as they're written in running text, where
+    the words of a name may be run together or followed by periods, and a numbered book may be numbered "1", "1st",
+    "I", or "First".
+    """
+    numbers = {'1': '1|1st|I|First', '2': '2|2nd|II|Second', '3': '3|3rd|III|Third'}
+    patterns = set()
+    for aliases in BOOKS:
+        for alias in aliases:
+            match = re.match('([123])(?:st|nd|rd)?\\s*(.+)', alias)
+            prefix = ''
+            if match:
+                prefix = '(?:' + numbers[match.group(1)] + ')\\.?\\s*'
+                alias = match.group(2)
+            patterns.add(prefix + '\\.?\\s*'.join(re.escape(word) for word in alias.split()))
+    # longest first, so that i.e. "John" isn't found in place of "1 John"
+    return sorted(patterns, key=len, reverse=True)
+
+
+REFERENCE_PATTERN = re.compile(
+    '(?<![\\w])(' + '|'.join(written_alias_patterns()) + ')\\.?\\s*'
+    '(\\d+(?:\\s*:\\s*\\d+|\\.\\d+)?(?:\\s*[-–—]\\s*\\d+(?:\\s*:\\s*\\d+|\\.\\d+)?)?'
+    '(?:\\s*,\\s*\\d+(?:\\s*[-–—]\\s*\\d+)?)*)'
+    '(?:\\s?ff?\\.?|[abc])?(?![\\w:]|\\.\\d)',
+    re.IGNORECASE)
+
+# the two-letter abbreviations that are commonly written without a verse (i.e. "Ps 23"); the rest, many of which are
+# also words (i.e. "is" and "am"), are only taken for books when a verse is given
+SHORT_ALIASES = {'ps', 'mt', 'mk', 'lk', 'jn'}
+
+
+@lru_cache(maxsize=5000)
+def find_references(text, capitalized=True):
+    """
+    Function to find the scripture references in a line of running text (i.e. "cf. Rom 5:8"). To keep ordinary words
+    like "is" or "am" from being taken for books, a reference must be capitalized, and one with a two-letter book
+    abbreviation (other than SHORT_ALIASES) must give a verse. The results are cached, since a text block is checked
+    again every time it is redrawn.
+
+    :param str text: The text to search
+    :param boolean capitalized: Require references to be capitalized; file names, for one, often aren't
+    :return: a tuple of tuples of the start and end offsets of each reference and its verse ranges
+    """
+    references = []
+    # most paragraphs have no numbers in them at all, and so no references
+    if not re.search('\\d', text):
+        return ()
+    position = 0
+    while True:
+        match = REFERENCE_PATTERN.search(text, position)
+        if not match:
+            break
+        # a rejected match may have swallowed the start of a real reference (i.e. the "is 1" of "is 1 John 4:8"), so
+        # the search resumes just after where it started rather than where it ended
+        position = match.start() + 1
+        if capitalized and not (match.group()[0].isupper() or match.group()[0].isdigit()):
+            continue
+        letters = re.sub('[^a-z]', '', match.group(1).lower())
+        if len(letters) <= 2 and letters not in SHORT_ALIASES and not re.search('\\d[:.]\\d', match.group(2)):
+            continue
+        ranges = parse_reference(match.group())
+        if len(ranges) > 0:
+            references.append((match.start(), match.end(), tuple(ranges)))
+            position = match.end()
+    return tuple(references)
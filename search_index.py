@@ -0,0 +1,258 @@
+import html
+import re
+import sqlite3
+from array import array
+
+from text_normalization import normalize_word, reset_if_stale, words
+
+# every column of sermon_prep_database after ID, in table order
+FIELDS = [
+    'pericope', 'pericope_texts', 'sermon_reference', 'sermon_scripture', 'fcft', 'gat', 'cpt', 'pb', 'fcfs', 'gas',
+    'cps', 'scripture_outline', 'sermon_outline', 'illustrations', 'research', 'sermon_title', 'date', 'location',
+    'call_to_worship', 'hymn_of_response', 'manuscript'
+]
+
+QUERY_PATTERN = re.compile('"[^"]*"|NEAR/\\d+|\\S+')
+
+
+def field_plain_text(value):
+    """
+    Function to convert the stored html of a field into the plain text that is indexed. Paragraphs, list items and
+    line breaks become newlines so that words on either side of them are never run together.
+
+    :param str value: The stored value of the field
+    """
+    if not value:
+        return ''
+    string = re.sub('</p>|</li>|<br ?/?>', '\n', str(value))
+    string = re.sub('<.*?>', '', string)
+    return html.unescape(string)
+
+
+def tokenize(text):
+    """
+    Function to split plain text into normalized terms along with the character offsets of the words they came from.
+
+    :param str text: The plain text to tokenize
+    :return: a list of tuples of term, start offset, and end offset
+    """
+    return [(normalize_word(word), start, end) for word, start, end in words(text)]
+
+
+class SearchIndex:
+    """
+    SearchIndex is a positional inverted index over the plain text of every field of the user's records. For every
+    term, it stores which records and fields contain it along with the word position and character offsets of each
+    occurrence, so that words, exact phrases and NEAR/n proximity queries can be answered from the posting lists of the
+    query's terms alone.
+    """
+    def __init__(self, db_loc):
+        """
+        :param str db_loc: The location of the user's database
+        """
+        self.db_loc = db_loc
+        self.synced = False
+
+    def create_tables(self, cursor):
+        cursor.execute(
+            'CREATE TABLE IF NOT EXISTS search_postings (term TEXT, record_id INTEGER, field INTEGER, '
+            'positions BLOB)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS search_postings_term ON search_postings (term)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS search_postings_record ON search_postings (record_id)')
+        cursor.execute('CREATE TABLE IF NOT EXISTS search_indexed_records (record_id INTEGER PRIMARY KEY)')
+
+    def sync(self):
+        """
+        Method to index any records that haven't been indexed yet and remove any that were deleted.
+        """
+        conn = sqlite3.connect(self.db_loc, timeout=30)
+        cursor = conn.cursor()
+        self.create_tables(cursor)
+        reset_if_stale(cursor, 'search', ['search_postings', 'search_indexed_records'])
+        conn.commit()
+        record_ids = set(row[0] for row in cursor.execute('SELECT ID FROM sermon_prep_database'))
+        indexed_ids = set(row[0] for row in cursor.execute('SELECT record_id FROM search_indexed_records'))
+        conn.close()
+
+        stale_ids = list(indexed_ids - record_ids)
+        if len(stale_ids) > 0:
+            self.remove_records(stale_ids)
+        missing_ids = list(record_ids - indexed_ids)
+        if len(missing_ids) > 0:
+            self.update_records(missing_ids)
+        self.synced = True
+
+    def update_records(self, record_ids):
+        """
+        Method to (re)build the postings of the given records.
+
+        :param list of int record_ids: The ID numbers of the records that have changed
+        """
+        conn = sqlite3.connect(self.db_loc, timeout=30)
+        cursor = conn.cursor()
+        self.create_tables(cursor)
+        # for bulk updates, it's much faster to rebuild the term index once than to maintain it row by row
+        bulk = len(record_ids) > 100
+        if bulk:
+            cursor.execute('DROP INDEX IF EXISTS search_postings_term')
+
+        sql = 'SELECT ' + ', '.join(FIELDS) + ' FROM sermon_prep_database WHERE ID = ?'
+        for record_id in record_ids:
+            record = cursor.execute(sql, (record_id,)).fetchone()
+            cursor.execute('DELETE FROM search_postings WHERE record_id = ?', (record_id,))
+            if not record:
+                cursor.execute('DELETE FROM search_indexed_records WHERE record_id = ?', (record_id,))
+                continue
+
+            rows = []
+            for field in range(len(FIELDS)):
+                # positions are stored as flat triples of word position, start offset, and end offset
+                postings = {}
+                tokens = tokenize(field_plain_text(record[field]))
+                for position in range(len(tokens)):
+                    term, start, end = tokens[position]
+                    postings.setdefault(term, array('I')).extend((position, start, end))
+                for term, positions in postings.items():
+                    rows.append((term, record_id, field, positions.tobytes()))
+
+            cursor.executemany('INSERT INTO search_postings VALUES (?, ?, ?, ?)', rows)
+            cursor.execute('INSERT OR IGNORE INTO search_indexed_records VALUES (?)', (record_id,))
+        if bulk:
+            self.create_tables(cursor)
+        conn.commit()
+        conn.close()
+
+    def remove_records(self, record_ids):
+        """
+        Method to remove deleted records from the index.
+
+        :param list of int record_ids: The ID numbers of the records that were deleted
+        """
+        conn = sqlite3.connect(self.db_loc, timeout=30)
+        cursor = conn.cursor()
+        self.create_tables(cursor)
+        for record_id in record_ids:
+            cursor.execute('DELETE FROM search_postings WHERE record_id = ?', (record_id,))
+            cursor.execute('DELETE FROM search_indexed_records WHERE record_id = ?', (record_id,))
+        conn.commit()
+        conn.close()
+
+    def parse_query(self, search_text):
+        """
+        Method to break the user's search text into clauses. A clause is a single word, a "quoted phrase", or two
+        words or phrases joined by NEAR/n (i.e. grace NEAR/5 law).
+
+        :param str search_text: The user's search text
+        :return: a list of clauses, each a tuple of the clause's label and its structure: ('phrase', [terms]) or
+            ('near', distance, phrase clause, phrase clause)
+        """
+        items = []
+        search_text = search_text.replace('“', '"').replace('”', '"')
+        for item in QUERY_PATTERN.findall(search_text):
+            if re.fullmatch('NEAR/\\d+', item):
+                items.append(item)
+                continue
+            terms = [token[0] for token in tokenize(item.replace('"', ''))]
+            if len(terms) > 0:
+                items.append((item.replace('"', '').strip(), ('phrase', terms)))
+
+        clauses = []
+        i = 0
+        while i < len(items):
+            item = items[i]
+            if isinstance(item, str):
+                i += 1
+                continue
+            # join the words or phrases on either side of a NEAR/n
+            if i + 2 < len(items) and isinstance(items[i + 1], str) and not isinstance(items[i + 2], str):
+                distance = int(items[i + 1].split('/')[1])
+                label = item[0] + ' ' + items[i + 1] + ' ' + items[i + 2][0]
+                clauses.append((label, ('near', distance, item[1], items[i + 2][1])))
+                i += 3
+            else:
+                clauses.append(item)
+                i += 1
+        return clauses
+
+    def get_postings(self, cursor, term):
+        """
+        Method to read the posting list of a term.
+
+        :return: a dict of (record id, field) -> list of (position, start offset, end offset) tuples
+        """
+        postings = {}
+        for record_id, field, blob in cursor.execute(
+                'SELECT record_id, field, positions FROM search_postings WHERE term = ?', (term,)):
+            positions = array('I')
+            positions.frombytes(blob)
+            postings[(record_id, field)] = [
+                (positions[i], positions[i + 1], positions[i + 2]) for i in range(0, len(positions), 3)]
+        return postings
+
+    def evaluate(self, cursor, clause):
+        """
+        Method to find every occurrence of a clause.
+
+        :return: a dict of (record id, field) -> list of hits, each a tuple of first word position, last word position,
+            start offset, and end offset
+        """
+        if clause[0] == 'phrase':
+            terms = clause[1]
+            first = self.get_postings(cursor, terms[0])
+            others = []
+            for term in terms[1:]:
+                postings = self.get_postings(cursor, term)
+                # turn each posting into a lookup of word position -> end offset
+                others.append({key: dict((p[0], p[2]) for p in value) for key, value in postings.items()})
+
+            hits = {}
+            for key, positions in first.items():
+                if not all(key in other for other in others):
+                    continue
+                for position, start, end in positions:
+                    phrase_end = end
+                    for i in range(len(others)):
+                        phrase_end = others[i][key].get(position + i + 1)
+                        if phrase_end is None:
+                            break
+                    if phrase_end is not None:
+                        hits.setdefault(key, []).append((position, position + len(terms) - 1, start, phrase_end))
+            return hits
+
+        distance = clause[1]
+        left = self.evaluate(cursor, clause[2])
+        right = self.evaluate(cursor, clause[3])
+        hits = {}
+        for key, left_hits in left.items():
+            if key not in right:
+                continue
+            for a in left_hits:
+                for b in right[key]:
+                    if b[0] - a[1] <= distance and a[0] - b[1] <= distance:
+                        hits.setdefault(key, []).append(
+                            (min(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), max(a[3], b[3])))
+        return hits
+
+    def search(self, clause):
+        """
+        Method to find the records containing a clause.
+
+        :param tuple clause: The structure of a clause from parse_query
+        :return: a dict of record id -> list of hits, each a tuple of field index, start offset, and end offset within
+            that field's plain text
+        """
+        if not self.synced:
+            self.sync()
+
+        conn = sqlite3.connect(self.db_loc, timeout=30)
+        cursor = conn.cursor()
+        hits = self.evaluate(cursor, clause)
+        conn.close()
+
+        results = {}
+        for (record_id, field), field_hits in hits.items():
+            for hit in field_hits:
+                results.setdefault(record_id, []).append((field, hit[2], hit[3]))
+        for record_id in results:
+            results[record_id].sort()
+        return results
@@ -0,0 +1,654 @@
+import hashlib
+import html
+import os
+import re
+import sqlite3
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from xml.etree import ElementTree
+
+from search_index import field_plain_text
+from sermon_metadata import BODY_PARAGRAPHS, extract_metadata
+
+SERMON_EXTENSIONS = ('.docx', '.odt', '.txt')
+
+# below this many files, starting the worker processes takes longer than parsing the files one after another
+PARALLEL_MINIMUM = 8
+
+
+def is_sermon_file(file_name):
+    """
+    Function to check that a file is one that can be imported, skipping the temporary files Word leaves beside open
+    documents (i.e. "~$sermon.docx").
+    """
+    return file_name.lower().endswith(SERMON_EXTENSIONS) and not file_name.startswith('~')
+
+
+def find_sermon_files(folder, recurse):
+    """
+    Function to find the files that can be imported from a folder.
+
+    :param str folder: The user's chosen folder
+    :param boolean recurse: Also look in the folder's subfolders
+    :return: a generator of tuples of the folder being looked in and the location of a file found there
+    """
+    if recurse:
+        for directory, subdirectories, files in os.walk(folder):
+            for file in sorted(files):
+                if is_sermon_file(file):
+                    yield directory, directory + '/' + file
+    else:
+        for file in sorted(os.listdir(folder)):
+            if is_sermon_file(file) and os.path.isfile(folder + '/' + file):
+                yield folder, folder + '/' + file
+
+
+WORD_NAMESPACE = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+TEXT_NAMESPACE = '{urn:oasis:names:tc:opendocument:xmlns:text:1.0}'
+STYLE_NAMESPACE = '{urn:oasis:names:tc:opendocument:xmlns:style:1.0}'
+FO_NAMESPACE = '{urn:oasis:names:tc:opendocument:xmlns:xsl-fo-compatible:1.0}'
+OFFICE_NAMESPACE = '{urn:oasis:names:tc:opendocument:xmlns:office:1.0}'
+
+# the part of each kind of document that holds its text, and the tags of the paragraphs within it
+DOCUMENT_PARTS = {
+    '.docx': ('word/document.xml', (WORD_NAMESPACE + 'p',)),
+    '.odt': ('content.xml', (TEXT_NAMESPACE + 'p', TEXT_NAMESPACE + 'h')),
+}
+
+# the formatting kept from imported documents, in the order its tags are nested, as a tuple of bold, italic, and
+# underline
+FORMAT_TAGS = ('b', 'i', 'u')
+PLAIN = (False, False, False)
+
+# stands between the lines of a paragraph that has line breaks in it
+LINE_BREAK = None
+
+# parts of an .odt paragraph that aren't part of its text
+ODT_SKIPPED = (TEXT_NAMESPACE + 'note', OFFICE_NAMESPACE + 'annotation')
+
+
+def escape_text(text):
+    """
+    Function to escape text the way a QTextEdit's html does, so that imported text is stored as typed text would be.
+    """
+    return html.escape(text, quote=False).replace('"', '&quot;')
+
+
+def render_runs(runs):
+    """
+    Function to turn runs of formatted text into the simplified html of SpellCheckTextEdit.toSimplifiedHtml. Spaces
+    are kept outside the formatting marks, as they are there.
+
+    :param list runs: Tuples of the (bold, italic, underline) formatting and the text of each run, or LINE_BREAK
+    :return: a list of the html of each line of the paragraph
+    """
+    lines = []
+    line = []
+    current_format = None
+    current_text = []
+
+    def close_run():
+        text = ''.join(current_text)
+        if not text:
+            return
+        stripped = text.strip(' ')
+        tags = [tag for tag, is_set in zip(FORMAT_TAGS, current_format) if is_set]
+        if not stripped or not tags:
+            line.append(escape_text(text))
+            return
+        leading = text[:len(text) - len(text.lstrip(' '))]
+        trailing = text[len(text.rstrip(' ')):]
+        line.append(
+            leading
+            + ''.join('<' + tag + '>' for tag in tags)
+            + escape_text(stripped)
+            + ''.join('</' + tag + '>' for tag in reversed(tags))
+            + trailing)
+
+    for run in runs:
+        if run is LINE_BREAK:
+            close_run()
+            lines.append(''.join(line))
+            line = []
+            current_format = None
+            current_text = []
+            continue
+        run_format, text = run
+        # runs are often split for reasons other than formatting, so neighbours formatted alike are joined
+        if run_format != current_format:
+            close_run()
+            current_format = run_format
+            current_text = []
+        current_text.append(text)
+    close_run()
+    lines.append(''.join(line))
+    return lines
+
+
+def word_property(properties, name):
+    """
+    Function to check whether a .docx run has a toggled property such as bold turned on. A property that is present
+    is on unless its value turns it off.
+    """
+    elem = properties.find(WORD_NAMESPACE + name)
+    if elem is None:
+        return False
+    return elem.get(WORD_NAMESPACE + 'val', 'true').lower() not in ('0', 'false', 'off', 'none')
+
+
+def docx_paragraph(paragraph):
+    """
+    Function to get the formatted lines of a paragraph of a .docx file, which are held in the text elements of its
+    runs, with the formatting of each run given in its run properties.
+
+    :return: a tuple of the html of each line and whether the paragraph is a list item
+    """
+    numbering = paragraph.find(WORD_NAMESPACE + 'pPr/' + WORD_NAMESPACE + 'numPr')
+    runs = []
+    for run in paragraph.iter(WORD_NAMESPACE + 'r'):
+        properties = run.find(WORD_NAMESPACE + 'rPr')
+        if properties is None:
+            run_format = PLAIN
+        else:
+            run_format = (
+                word_property(properties, 'b'), word_property(properties, 'i'), word_property(properties, 'u'))
+        for elem in run:
+            if elem.tag == WORD_NAMESPACE + 't':
+                runs.append((run_format, elem.text or ''))
+            elif elem.tag == WORD_NAMESPACE + 'tab':
+                runs.append((run_format, '\t'))
+            elif elem.tag in (WORD_NAMESPACE + 'br', WORD_NAMESPACE + 'cr'):
+                runs.append(LINE_BREAK)
+    return render_runs(runs), numbering is not None
+
+
+class OdtStyles:
+    """
+    OdtStyles holds the bold, italic, and underline settings of the text and paragraph styles of an .odt file, which
+    its spans and paragraphs refer to by name. A setting a style leaves out is taken from its parent style.
+    """
+    def __init__(self):
+        self.styles = {}
+        self.resolved = {}
+
+    def add(self, elem):
+        """
+        Method to record the formatting of a style:style element.
+        """
+        properties = elem.find(STYLE_NAMESPACE + 'text-properties')
+        settings = [None, None, None]
+        if properties is not None:
+            weight = properties.get(FO_NAMESPACE + 'font-weight')
+            if weight is not None:
+                settings[0] = weight == 'bold' or (weight.isnumeric() and int(weight) >= 600)
+            style = properties.get(FO_NAMESPACE + 'font-style')
+            if style is not None:
+                settings[1] = style in ('italic', 'oblique')
+            underline = properties.get(STYLE_NAMESPACE + 'text-underline-style')
+            if underline is not None:
+                settings[2] = underline != 'none'
+        self.styles[elem.get(STYLE_NAMESPACE + 'name')] = (elem.get(STYLE_NAMESPACE + 'parent-style-name'), settings)
+
+    def format(self, name, inherited=PLAIN):
+        """
+        Method to get the formatting of text given the named style within text formatted as inherited.
+        """
+        if name is None:
+            return inherited
+        if name not in self.resolved:
+            self.resolved[name] = self.settings(name, set())
+        return tuple(
+            inherited_value if value is None else value
+            for value, inherited_value in zip(self.resolved[name], inherited))
+
+    def settings(self, name, seen):
+        """
+        Method to work out a style's settings from those of its parents, guarding against a style that is somehow
+        its own ancestor.
+        """
+        if name not in self.styles or name in seen:
+            return [None, None, None]
+        seen.add(name)
+        parent, settings = self.styles[name]
+        parent_settings = self.settings(parent, seen)
+        return [parent_value if value is None else value for value, parent_value in zip(settings, parent_settings)]
+
+
+def odt_runs(elem, styles, elem_format, runs):
+    """
+    Function to collect the formatted runs of an element of an .odt paragraph. Its text is mixed in among its spans,
+    including the text that follows each span, and runs of spaces, tabs, and line breaks are elements of their own.
+    """
+    if elem.text:
+        runs.append((elem_format, elem.text))
+    for child in elem:
+        if child.tag == TEXT_NAMESPACE + 's':
+            runs.append((elem_format, ' ' * int(child.get(TEXT_NAMESPACE + 'c', '1'))))
+        elif child.tag == TEXT_NAMESPACE + 'tab':
+            runs.append((elem_format, '\t'))
+        elif child.tag == TEXT_NAMESPACE + 'line-break':
+            runs.append(LINE_BREAK)
+        elif child.tag not in ODT_SKIPPED:
+            odt_runs(child, styles, styles.format(child.get(TEXT_NAMESPACE + 'style-name'), elem_format), runs)
+        if child.tail:
+            runs.append((elem_format, child.tail))
+
+
+def odt_styles(zipped, styles):
+    """
+    Function to read the named styles of an .odt file from its styles.xml, where there is one.
+    """
+    if 'styles.xml' not in zipped.namelist():
+        return
+    with zipped.open('styles.xml') as stream:
+        for event, elem in ElementTree.iterparse(stream):
+            if elem.tag == STYLE_NAMESPACE + 'style':
+                styles.add(elem)
+                elem.clear()
+
+
+def document_paragraphs(file_loc, extension):
+    """
+    Function to read the paragraphs of a .docx or .odt file. Only the parts of the document holding its text and
+    styles are read, streamed straight from the zipped file in one pass, so nothing is written to disk and each
+    paragraph is read once and then let go, however large the document.
+
+    :param str file_loc: The location of the file
+    :param str extension: The file's extension, '.docx' or '.odt'
+    :return: a generator of tuples of the html of each line of a paragraph and whether the paragraph is a list item
+    """
+    part, paragraph_tags = DOCUMENT_PARTS[extension]
+    with zipfile.ZipFile(file_loc, 'r') as zipped:
+        styles = OdtStyles()
+        if extension == '.odt':
+            odt_styles(zipped, styles)
+
+        with zipped.open(part) as stream:
+            # paragraphs may hold paragraphs of their own (i.e. in text boxes), which are read with the paragraph
+            # that holds them
+            depth = 0
+            list_depth = 0
+            for event, elem in ElementTree.iterparse(stream, ('start', 'end')):
+                if elem.tag in paragraph_tags:
+                    if event == 'start':
+                        depth += 1
+                        continue
+                    depth -= 1
+                    if depth > 0:
+                        continue
+                    if extension == '.docx':
+                        yield docx_paragraph(elem)
+                    else:
+                        runs = []
+                        odt_runs(elem, styles, styles.format(elem.get(TEXT_NAMESPACE + 'style-name')), runs)
+                        yield render_runs(runs), list_depth > 0
+                    elem.clear()
+                elif elem.tag == TEXT_NAMESPACE + 'list' and depth == 0:
+                    list_depth += 1 if event == 'start' else -1
+                elif elem.tag == STYLE_NAMESPACE + 'style' and event == 'end':
+                    # the automatic styles of content.xml come before the body that uses them
+                    styles.add(elem)
+
+
+def text_paragraphs(text):
+    """
+    Function to read the paragraphs of a .txt file, which are separated by blank lines. Lines within a paragraph
+    are joined, as they always have been when shown.
+
+    :return: a generator of tuples like those of document_paragraphs
+    """
+    for paragraph in text.strip().split('\n\n'):
+        yield [escape_text(' '.join(line.strip() for line in paragraph.strip('\n').split('\n')))], False
+
+
+def paragraphs_html(paragraphs):
+    """
+    Function to join the paragraphs of an imported sermon into the simplified html that the sermon tab saves, so
+    that the imported manuscript is stored just as if it had been typed in, and loads with no reformatting.
+
+    :param iterable paragraphs: Tuples of the html of each line of a paragraph and whether it's a list item
+    :return: the html, or an empty string if no paragraph has any text
+    """
+    parts = []
+    in_list = False
+    has_text = False
+    for lines, is_list_item in paragraphs:
+        if is_list_item != in_list:
+            parts.append('<ul>' if is_list_item else '</ul>')
+            in_list = is_list_item
+        for line in lines:
+            if is_list_item:
+                parts.append('<li>' + line + '</li>\n')
+            else:
+                parts.append('<p>' + line + '</p>\n')
+            has_text = has_text or len(re.sub('<.*?>', '', line).strip()) > 0
+    if in_list:
+        parts.append('</ul>')
+    if not has_text:
+        return ''
+    return ''.join(parts).strip()
+
+
+def file_signature(file_loc):
+    """
+    Function to get the size and modification time of a file, which tell whether it has changed since it was last
+    imported without opening it.
+    """
+    stat = os.stat(file_loc)
+    return stat.st_size, stat.st_mtime
+
+
+def content_hash(file_loc):
+    """
+    Function to get a hash of the bytes of a file, which recognizes it again after it's been moved, copied, or touched.
+    """
+    file_hash = hashlib.sha1()
+    with open(file_loc, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 16), b''):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+def text_hash(text):
+    """
+    Function to get a hash of the words of a sermon, ignoring its markup, case, and spacing, so that the same sermon
+    is recognized whether it came from a .docx, .odt, or .txt file or was typed in.
+
+    :param str text: The manuscript as stored
+    """
+    words = ' '.join(field_plain_text(text).lower().split())
+    return hashlib.sha1(words.encode('utf-8')).hexdigest()
+
+
+def parse_sermon_file(file_loc):
+    """
+    Function to read a sermon from a .docx, .odt, or .txt file. It touches nothing but the file itself, so many
+    files may be parsed at once in separate processes.
+
+    :param str file_loc: The location of the file
+    :return: a tuple of the file's location, the sermon as a list of date, reference, text, and title (or None if no
+        sermon could be read), a list of [file, error] pairs, and a tuple of the file's size, modification time,
+        content hash, and text hash (or None if the file couldn't be read)
+    """
+    file_name = os.path.basename(file_loc)
+    errors = []
+    extension = os.path.splitext(file_loc)[1].lower()
+
+    try:
+        # the signature is taken before reading, so that a file changed while it's read is read again next time
+        size, mtime = file_signature(file_loc)
+        file_hash = content_hash(file_loc)
+        if extension in DOCUMENT_PARTS:
+            try:
+                sermon_text = paragraphs_html(document_paragraphs(file_loc, extension))
+            except (zipfile.BadZipfile, KeyError):
+                errors.append([file_loc, 'Not a valid ' + extension + ' file'])
+                return file_loc, None, errors, None
+        else:
+            with open(file_loc) as file:
+                sermon_text = paragraphs_html(text_paragraphs(file.read()))
+    except Exception as ex:
+        errors.append([file_loc, 'Unable to read file: ' + str(ex)])
+        return file_loc, None, errors, None
+
+    if len(sermon_text) == 0:
+        errors.append([file_loc, 'Unable to find any text in file'])
+        return file_loc, None, errors, None
+
+    # each paragraph of the html is on a line of its own, so only the first few need to be made plain text
+    paragraphs = [field_plain_text(line) for line in sermon_text.split('\n', BODY_PARAGRAPHS)[:BODY_PARAGRAPHS]]
+    date, reference, title, metadata_errors = extract_metadata(file_name, paragraphs)
+    errors += [[file_loc, error] for error in metadata_errors]
+    return file_loc, [date, reference, sermon_text, title], errors, (size, mtime, file_hash, text_hash(sermon_text))
+
+
+def parse_sermon_files(files, workers=None):
+    """
+    Function to parse sermon files in a pool of worker processes. Only a few files per worker are handed to the pool
+    at a time, so that however many files there are, memory holds only those being parsed and their results.
+
+    :param iterable files: The locations of the files, which may be a generator that is still finding them
+    :param int workers: The number of processes to use, or None for one per processor
+    :return: a generator of the results of parse_sermon_file, in the order the files finish; closing it stops the
+        parsing
+    """
+    workers = workers or os.cpu_count() or 1
+    files = iter(files)
+
+    # look ahead far enough to tell whether a pool is worth starting
+    first_files = []
+    for file in files:
+        first_files.append(file)
+        if len(first_files) >= PARALLEL_MINIMUM:
+            break
+    if workers < 2 or len(first_files) < PARALLEL_MINIMUM:
+        for file in first_files:
+            yield parse_sermon_file(file)
+        for file in files:
+            yield parse_sermon_file(file)
+        return
+
+    with ProcessPoolExecutor(workers) as executor:
+        pending = set(executor.submit(parse_sermon_file, file) for file in first_files)
+        try:
+            for file in files:
+                pending.add(executor.submit(parse_sermon_file, file))
+                if len(pending) >= workers * 4:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            while len(pending) > 0:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        finally:
+            # when the import is stopped early, only the files already being parsed are waited for
+            for future in pending:
+                future.cancel()
+
+
+class SermonWriter:
+    """
+    SermonWriter adds imported sermons to the user's database. However many processes are parsing files, the
+    database is written by this one connection, a batch of sermons to a transaction.
+
+    Every file imported is entered in the import manifest along with the record made from it, in the same transaction
+    as the record itself, so that an interrupted import picks up after the last batch written and a later import of
+    the same folder only reads the files that are new or changed. A changed file updates the record that was made
+    from it, and a new file whose sermon text is already in the database is flagged as a duplicate rather than
+    imported again. Only the file a record was made from (its origin) updates it; a copy of that file that is later
+    edited, as when last year's sermon is copied to start this year's, becomes a sermon of its own.
+    """
+    batch_size = 200
+
+    def __init__(self, db_loc):
+        """
+        :param str db_loc: The location of the user's database
+        """
+        self.conn = sqlite3.connect(db_loc, timeout=30)
+        self.cursor = self.conn.cursor()
+        self.create_tables(self.cursor)
+        self.conn.commit()
+
+        highest_num = self.cursor.execute('SELECT MAX(CAST(ID AS INTEGER)) FROM sermon_prep_database').fetchone()[0]
+        self.next_id = (highest_num or 0) + 1
+        self.record_ids = set(row[0] for row in self.cursor.execute('SELECT ID FROM sermon_prep_database'))
+
+        # files whose records have since been deleted are imported again
+        self.manifest = {}
+        self.sources = {}
+        self.content_hashes = {}
+        self.text_hashes = {}
+        for path, size, mtime, file_hash, sermon_hash, record_id, origin in self.cursor.execute(
+                'SELECT path, size, mtime, content_hash, text_hash, record_id, origin FROM import_manifest'):
+            if record_id in self.record_ids:
+                self.manifest[path] = (size, mtime)
+                self.content_hashes[file_hash] = record_id
+                self.text_hashes[sermon_hash] = record_id
+                if origin:
+                    self.sources[path] = (record_id, sermon_hash)
+        manifest_ids = set(self.content_hashes.values())
+
+        # sermons typed in or imported before there was a manifest are recognized by their text alone
+        for record_id, manuscript in self.cursor.execute(
+                "SELECT ID, manuscript FROM sermon_prep_database WHERE manuscript IS NOT NULL AND manuscript != ''"):
+            if record_id not in manifest_ids:
+                self.text_hashes.setdefault(text_hash(manuscript), record_id)
+
+        self.batch = []
+        self.update_batch = []
+        self.manifest_batch = []
+        self.new_ids = []
+        self.updated_ids = []
+        self.duplicates = []
+        self.unchanged = 0
+
+    def create_tables(self, cursor):
+        cursor.execute(
+            'CREATE TABLE IF NOT EXISTS import_manifest (path TEXT PRIMARY KEY, size INTEGER, mtime REAL, '
+            'content_hash TEXT, text_hash TEXT, record_id INTEGER, duplicate INTEGER, origin INTEGER)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS import_manifest_record ON import_manifest (record_id)')
+
+        columns = [row[1] for row in cursor.execute('PRAGMA table_info(import_manifest)')]
+        if 'origin' not in columns:
+            # manifests written before origins were kept: a record's file is only known for certain if no copy of it
+            # was imported, otherwise none of its files are taken as its origin and an edited one becomes a new record
+            cursor.execute('ALTER TABLE import_manifest ADD origin INTEGER')
+            cursor.execute(
+                'UPDATE import_manifest SET origin = 1 WHERE duplicate = 0 AND record_id IN (SELECT record_id FROM '
+                'import_manifest WHERE duplicate = 0 GROUP BY record_id HAVING COUNT(*) = 1)')
+
+    def is_unchanged(self, file_loc):
+        """
+        Method to check, without opening it, whether a file is the same as when it was last imported.
+
+        :param str file_loc: The location of the file
+        """
+        if file_loc not in self.manifest:
+            return False
+        try:
+            if file_signature(file_loc) != self.manifest[file_loc]:
+                return False
+        except OSError:
+            return False
+        self.unchanged += 1
+        return True
+
+    def add(self, file_loc, sermon, file_info):
+        """
+        Method to queue a parsed sermon to be written, writing the queue once it's full. A file that has only been
+        moved, copied, or touched since it was imported is entered in the manifest against its record, and one
+        whose text matches a sermon already in the database is entered as a duplicate of it; neither adds a record.
+        The file a record was made from, if edited since, replaces the manuscript of its record, and fills in its
+        date, reference, and title if they've been left empty. An edited copy is imported as a new sermon.
+
+        :param str file_loc: The location of the file
+        :param list sermon: The date, reference, text, and title of the sermon
+        :param tuple file_info: The file's size, modification time, content hash, and text hash
+        :return: the ID of the sermon's record, and whether it's a duplicate of a record already in the database
+        """
+        size, mtime, file_hash, sermon_hash = file_info
+        if file_hash in self.content_hashes:
+            record_id = self.content_hashes[file_hash]
+            duplicate = False
+            # any other file with the same content is only a copy, which must not update the record if it's edited
+            origin = self.sources.get(file_loc, (None,))[0] == record_id
+            if not origin:
+                self.sources.pop(file_loc, None)
+            self.unchanged += 1
+        elif file_loc in self.sources:
+            record_id, previous_hash = self.sources[file_loc]
+            duplicate = False
+            origin = True
+            if sermon_hash == previous_hash:
+                self.unchanged += 1
+            else:
+                self.update_batch.append((sermon[2], sermon[0], sermon[1], sermon[3], record_id))
+                self.sources[file_loc] = (record_id, sermon_hash)
+            self.content_hashes[file_hash] = record_id
+            self.text_hashes[sermon_hash] = record_id
+        elif sermon_hash in self.text_hashes:
+            record_id = self.text_hashes[sermon_hash]
+            duplicate = True
+            origin = False
+            self.duplicates.append([file_loc, record_id])
+        else:
+            record_id = self.next_id
+            duplicate = False
+            origin = True
+            self.next_id += 1
+            self.batch.append((record_id, sermon[0], sermon[1], sermon[2], sermon[3]))
+            self.content_hashes[file_hash] = record_id
+            self.text_hashes[sermon_hash] = record_id
+            self.sources[file_loc] = (record_id, sermon_hash)
+
+        self.manifest[file_loc] = (size, mtime)
+        self.manifest_batch.append(
+            (file_loc, size, mtime, file_hash, sermon_hash, record_id, int(duplicate), int(origin)))
+        if len(self.manifest_batch) >= self.batch_size:
+            self.flush()
+        return record_id, duplicate
+
+    def flush(self):
+        """
+        Method to write the queued sermons, the updates to sermons imported before, and their manifest entries in a
+        single transaction.
+        """
+        if len(self.manifest_batch) == 0:
+            return
+
+        # a record may have been added from the sermon tab while the import was running, in which case the batch is
+        # given the IDs following it; the write lock is held from checking the highest ID until the batch is written
+        self.cursor.execute('BEGIN IMMEDIATE')
+        highest_num = self.cursor.execute('SELECT MAX(CAST(ID AS INTEGER)) FROM sermon_prep_database').fetchone()[0]
+        if len(self.batch) > 0 and highest_num is not None and highest_num >= self.batch[0][0]:
+            self.renumber(highest_num + 1 - self.batch[0][0])
+
+        self.cursor.executemany(
+            'INSERT INTO sermon_prep_database (ID, date, sermon_reference, manuscript, sermon_title) '
+            'VALUES (?, ?, ?, ?, ?)', self.batch)
+        # the date, reference, and title were only guesses from the file, so any the user has filled in are kept
+        self.cursor.executemany(
+            'UPDATE sermon_prep_database SET manuscript = ?, '
+            + ', '.join(
+                column + " = CASE WHEN IFNULL(" + column + ", '') IN ('', 'None') THEN ? ELSE " + column + " END"
+                for column in ('date', 'sermon_reference', 'sermon_title'))
+            + ' WHERE ID = ?', self.update_batch)
+        self.cursor.executemany(
+            'INSERT OR REPLACE INTO import_manifest VALUES (?, ?, ?, ?, ?, ?, ?, ?)', self.manifest_batch)
+        self.conn.commit()
+        self.new_ids += [row[0] for row in self.batch]
+        updated_ids = set(self.updated_ids)
+        self.updated_ids += [row[4] for row in self.update_batch if row[4] not in updated_ids]
+        self.record_ids.update(row[0] for row in self.batch)
+        self.batch = []
+        self.update_batch = []
+        self.manifest_batch = []
+
+    def renumber(self, shift):
+        """
+        Method to move the IDs of the queued sermons, and of everything referring to them, up by the given amount.
+        """
+        first_id = self.batch[0][0]
+
+        def move(record_id):
+            return record_id + shift if record_id >= first_id else record_id
+
+        self.batch = [(move(row[0]),) + row[1:] for row in self.batch]
+        self.manifest_batch = [row[:5] + (move(row[5]),) + row[6:] for row in self.manifest_batch]
+        self.duplicates = [[file_loc, move(record_id)] for file_loc, record_id in self.duplicates]
+        self.sources = dict(
+            (file_loc, (move(record_id), sermon_hash)) for file_loc, (record_id, sermon_hash) in self.sources.items())
+        for hashes in (self.content_hashes, self.text_hashes):
+            for key, record_id in hashes.items():
+                hashes[key] = move(record_id)
+        self.next_id += shift
+
+    def close(self):
+        """
+        Method to write any sermons still queued and close the connection.
+        """
+        try:
+            self.flush()
+        finally:
+            self.conn.close()
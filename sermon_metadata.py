@@ -0,0 +1,196 @@
+import datetime
+import re
+
+from scripture_reference import find_references, format_reference
+
+MONTHS = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6, 'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11,
+    'dec': 12
+}
+MONTH_PATTERN = (
+    '(?P<name>jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sept?(?:ember)?|'
+    'oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\\.?'
+)
+YEAR_PATTERN = '(?P<year>(?:19|20)\\d\\d)'
+DAY_PATTERN = '(?P<day>\\d{1,2})(?:st|nd|rd|th)?'
+
+# the formats dates are written in; a numeric date that could be month-first or day-first gives its numbers as first
+# and second, and is taken as month-first if it can be
+DATE_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    # 2025-03-19, 2025_03_19, 2025.03.19, 2025 03 19
+    '(?<!\\d)' + YEAR_PATTERN + '(?P<sep>[-_. ])(?P<month>\\d{1,2})(?P=sep)(?P<day>\\d{1,2})(?!\\d)',
+    # 20250319
+    '(?<!\\d)' + YEAR_PATTERN + '(?P<month>\\d\\d)(?P<day>\\d\\d)(?!\\d)',
+    # 03-19-2025, 19.03.2025, 3/19/2025
+    '(?<!\\d)(?P<first>\\d{1,2})(?P<sep>[-_./ ])(?P<second>\\d{1,2})(?P=sep)' + YEAR_PATTERN + '(?!\\d)',
+    # March 19, 2025; Mar. 19th 2025; march-19-2025
+    '(?<![a-z])' + MONTH_PATTERN + '[-_. ]*' + DAY_PATTERN + '[-_., ]+' + YEAR_PATTERN + '(?!\\d)',
+    # 19 March 2025; 19th of March, 2025; 19-mar-2025
+    '(?<!\\d)' + DAY_PATTERN + '(?:[-_. ]+of)?[-_. ]*' + MONTH_PATTERN + '[-_., ]*' + YEAR_PATTERN + '(?!\\d)',
+    # 2025 March 19
+    YEAR_PATTERN + '[-_., ]+' + MONTH_PATTERN + '[-_. ]*' + DAY_PATTERN + '(?!\\d)',
+)]
+
+# file names write a reference with periods or underscores (i.e. "1.cor.13.1-13" or "luke_2_1-20"), which are turned
+# into the usual spaces and colons
+DOTTED_BOOK = re.compile('(?<=\\d)[._](?=[a-z])|(?<=[a-z])[._](?=\\d)', re.IGNORECASE)
+DOTTED_VERSE = re.compile('(?<=\\d)[._](?=\\d)')
+
+# words that say what the file is rather than what the sermon is called
+GENERIC_TITLES = {'sermon', 'sermons', 'homily', 'message', 'manuscript'}
+
+# labels a document may put before its title, date, or text
+LABEL_PATTERN = re.compile(
+    '^\\s*(?:sermon\\s+)?(?:title|date|text|scripture|reading|preached)\\s*:\\s*', re.IGNORECASE)
+
+# only the start of a document is looked at for its details, and only its short lines, which are more likely to be
+# headings than sentences that happen to mention a date or a verse
+BODY_PARAGRAPHS = 8
+HEADING_LENGTH = 100
+
+
+def make_date(year, month, day):
+    """
+    Function to check a date found in text, giving it as yyyy-MM-dd if it's a real date.
+    """
+    try:
+        return datetime.date(int(year), int(month), int(day)).isoformat()
+    except ValueError:
+        return None
+
+
+def find_date(text):
+    """
+    Function to find the earliest date written in a piece of text in any of the formats of DATE_PATTERNS.
+
+    :param str text: The text to search
+    :return: a tuple of the date as yyyy-MM-dd and the start and end of where it was found, or None
+    """
+    found = None
+    for pattern in DATE_PATTERNS:
+        for match in pattern.finditer(text):
+            if found and match.start() >= found[1]:
+                break
+            groups = match.groupdict()
+            if groups.get('first'):
+                date = (make_date(groups['year'], groups['first'], groups['second'])
+                        or make_date(groups['year'], groups['second'], groups['first']))
+            elif groups.get('name'):
+                date = make_date(groups['year'], MONTHS[groups['name'][:3].lower()], groups['day'])
+            else:
+                date = make_date(groups['year'], groups['month'], groups['day'])
+            if date:
+                found = (date, match.start(), match.end())
+                break
+    return found
+
+
+def find_reference(text, capitalized=True):
+    """
+    Function to find the first scripture reference in a piece of text.
+
+    :param str text: The text to search
+    :param boolean capitalized: Require the reference to be capitalized, as it would be in running text
+    :return: a tuple of the reference in canonical form and the start and end of where it was found, or None
+    """
+    references = find_references(text, capitalized)
+    if len(references) == 0:
+        return None
+    start, end, ranges = references[0]
+    return format_reference(list(ranges)), start, end
+
+
+def remove_span(text, span):
+    """
+    Function to take a date or reference found in a piece of text out of it, leaving a space in its place.
+    """
+    return text[:span[1]] + ' ' + text[span[2]:]
+
+
+def title_words(text):
+    """
+    Function to tidy what's left of a file name or heading once its date and reference are taken out, so that it can
+    be used as a title if it has any words in it.
+    """
+    text = LABEL_PATTERN.sub('', text)
+    text = re.sub('[_.]+', ' ', text)
+    text = re.sub('\\s+', ' ', text).strip(' -–—,;:()[]')
+    if len(re.findall('[^\\W\\d_]', text)) < 3 or text.lower() in GENERIC_TITLES:
+        return None
+    return text
+
+
+def name_metadata(file_name):
+    """
+    Function to find the date, scripture reference, and title of a sermon in its file name (i.e.
+    "2011-05-11.mark.3.1-12.docx" or "Grace Abounds - Romans 5 (March 19, 2025).odt").
+
+    :param str file_name: The name of the file, without its folder
+    :return: a tuple of the date, the reference, and the title, each None if not found
+    """
+    stem = file_name.rsplit('.', 1)[0] if '.' in file_name else file_name
+
+    date = find_date(stem)
+    if date:
+        stem = remove_span(stem, date)
+    stem = DOTTED_VERSE.sub(':', DOTTED_BOOK.sub(' ', stem)).replace('_', ' ')
+    reference = find_reference(stem, False)
+    if reference:
+        stem = remove_span(stem, reference)
+    return date and date[0], reference and reference[0], title_words(stem)
+
+
+def body_metadata(paragraphs):
+    """
+    Function to find the date, scripture reference, and title of a sermon in the headings at the start of its text.
+
+    :param list of str paragraphs: The plain text of the first paragraphs of the sermon
+    :return: a tuple of the date, the reference, and the title, each None if not found
+    """
+    date = None
+    reference = None
+    title = None
+    for paragraph in paragraphs[:BODY_PARAGRAPHS]:
+        paragraph = paragraph.strip()
+        if len(paragraph) == 0 or len(paragraph) > HEADING_LENGTH:
+            continue
+        rest = paragraph
+        found_date = find_date(rest)
+        if found_date:
+            rest = remove_span(rest, found_date)
+            date = date or found_date[0]
+        found_reference = find_reference(rest)
+        if found_reference:
+            rest = remove_span(rest, found_reference)
+            reference = reference or found_reference[0]
+        # a heading that is a sentence ends with a period; a title doesn't
+        if not title and not found_date and not found_reference and not paragraph.endswith('.'):
+            title = title_words(rest)
+    return date, reference, title
+
+
+def extract_metadata(file_name, paragraphs):
+    """
+    Function to find the date, scripture reference, and title of an imported sermon, from its file name where it
+    gives them, and otherwise from the start of the sermon itself.
+
+    :param str file_name: The name of the file, without its folder
+    :param list of str paragraphs: The plain text of the first paragraphs of the sermon
+    :return: a tuple of the date and reference (empty strings if not found), the title (the file name if none was
+        found), and a list of the problems found, if any
+    """
+    date, reference, title = name_metadata(file_name)
+    if not (date and reference and title):
+        body_date, body_reference, body_title = body_metadata(paragraphs)
+        date = date or body_date
+        reference = reference or body_reference
+        title = title or body_title
+
+    errors = []
+    if not date and not reference:
+        errors.append('Unable to find a date or scripture reference in the file name or text')
+    elif not date:
+        errors.append('Unable to find a date in the file name or text')
+    elif not reference:
+        errors.append('Unable to find a scripture reference in the file name or text')
+    return date or '', reference or '', title or file_name, errors
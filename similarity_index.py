@@ -0,0 +1,253 @@
+import html
+import json
+import math
+import re
+import sqlite3
+import threading
+
+from text_normalization import fold, normalize_word, reset_if_stale, words
+
+# words too common in sermons to say anything about what a sermon is about
+STOP_WORDS = {
+    'a', 'about', 'after', 'again', 'all', 'also', 'am', 'an', 'and', 'any', 'are', 'as', 'at', 'be', 'because',
+    'been', 'before', 'but', 'by', 'can', 'could', 'did', 'do', 'does', 'even', 'for', 'from', 'get', 'had', 'has',
+    'have', 'he', 'her', 'him', 'his', 'how', 'i', 'if', 'in', 'into', 'is', 'it', 'its', 'just', 'like', 'may',
+    'me', 'more', 'my', 'no', 'not', 'now', 'of', 'on', 'one', 'only', 'or', 'our', 'out', 'over', 'she', 'so',
+    'some', 'than', 'that', 'the', 'their', 'them', 'then', 'there', 'these', 'they', 'this', 'those', 'to', 'up',
+    'us', 'very', 'was', 'we', 'were', 'what', 'when', 'where', 'which', 'who', 'will', 'with', 'would', 'you',
+    'your'
+}
+
+# columns of sermon_prep_database that hold the content of a sermon (everything but ID and date)
+CONTENT_COLUMNS = [
+    'pericope', 'pericope_texts', 'sermon_reference', 'sermon_scripture', 'fcft', 'gat', 'cpt', 'pb', 'fcfs', 'gas',
+    'cps', 'scripture_outline', 'sermon_outline', 'illustrations', 'research', 'sermon_title', 'location',
+    'call_to_worship', 'hymn_of_response', 'manuscript'
+]
+
+
+def record_plain_text(values):
+    """
+    Function to turn the stored html of a record's fields into one plain text string.
+
+    :param list of str values: The values of a record's content columns
+    """
+    text = ' '.join(str(value) for value in values if value)
+    text = re.sub('<.*?>', ' ', text)
+    return html.unescape(text)
+
+
+def tokenize(text):
+    """
+    Function to split plain text into the normalized terms used by the similarity index, leaving out stop words.
+
+    :param str text: The text to tokenize
+    """
+    terms = []
+    for word in words(text):
+        term = normalize_word(word[0])
+        if len(term) > 2 and term.isalpha() and fold(word[0]) not in STOP_WORDS:
+            terms.append(term)
+    return terms
+
+
+class SimilarityIndex:
+    """
+    SimilarityIndex keeps a TF-IDF term matrix of every record in the user's database so that the sermons most
+    similar in content to a given record can be found without re-reading the database. The term counts of each record
+    are stored in the similarity_vectors table and held in memory as sparse postings (term -> {record id: count}).
+    The in-memory matrix is updated by the import and backfill workers while the GUI thread queries it, so every read
+    and write of it is made while holding self.lock.
+    """
+    def __init__(self, db_loc):
+        """
+        :param str db_loc: The location of the user's database
+        """
+        self.db_loc = db_loc
+        self.vectors = {}
+        self.postings = {}
+        self.norms = {}
+        self.loaded = False
+        self.lock = threading.RLock()
+
+    def create_table(self, cursor):
+        cursor.execute(
+            'CREATE TABLE IF NOT EXISTS similarity_vectors (record_id INTEGER PRIMARY KEY, terms TEXT, norm REAL)')
+
+    def load(self):
+        """
+        Method to read the stored term matrix into memory, then index any records that were added (or remove any that
+        were deleted) since it was last stored.
+        """
+        conn = sqlite3.connect(self.db_loc, timeout=30)
+        cursor = conn.cursor()
+        self.create_table(cursor)
+        reset_if_stale(cursor, 'similarity', ['similarity_vectors'])
+        conn.commit()
+
+        with self.lock:
+            self.vectors = {}
+            self.postings = {}
+            self.norms = {}
+            unnormed_ids = []
+            for record_id, terms, norm in cursor.execute('SELECT record_id, terms, norm FROM similarity_vectors'):
+                self.add_to_memory(record_id, json.loads(terms))
+                if norm is None:
+                    unnormed_ids.append(record_id)
+                else:
+                    self.norms[record_id] = norm
+
+            record_ids = set(row[0] for row in cursor.execute('SELECT ID FROM sermon_prep_database'))
+            conn.close()
+            self.loaded = True
+
+            stale_ids = [record_id for record_id in self.vectors if record_id not in record_ids]
+            if len(stale_ids) > 0:
+                self.remove_records(stale_ids)
+
+            missing_ids = [record_id for record_id in record_ids if record_id not in self.vectors]
+            if len(missing_ids) > 0:
+                self.update_records(missing_ids, False)
+            if len(missing_ids) > 0 or len(unnormed_ids) > 0:
+                # idf has shifted after a bulk addition, so the norms of every record need to be refreshed
+                self.refresh_norms()
+
+    def add_to_memory(self, record_id, term_counts):
+        self.vectors[record_id] = term_counts
+        for term, count in term_counts.items():
+            self.postings.setdefault(term, {})[record_id] = count
+
+    def remove_from_memory(self, record_id):
+        term_counts = self.vectors.pop(record_id, None)
+        self.norms.pop(record_id, None)
+        if term_counts:
+            for term in term_counts:
+                posting = self.postings.get(term)
+                if posting:
+                    posting.pop(record_id, None)
+                    if len(posting) == 0:
+                        del self.postings[term]
+
+    def idf(self, term):
+        return math.log((1 + len(self.vectors)) / (1 + len(self.postings.get(term, ())))) + 1
+
+    def norm(self, term_counts, idfs=None):
+        if idfs is None:
+            return math.sqrt(sum((count * self.idf(term)) ** 2 for term, count in term_counts.items()))
+        return math.sqrt(sum((count * idfs[term]) ** 2 for term, count in term_counts.items()))
+
+    def update_records(self, record_ids, compute_norms=True):
+        """
+        Method to (re)compute the term counts of the given records and store them.
+
+        :param list of int record_ids: The ID numbers of the records that have changed
+        :param boolean compute_norms: False if refresh_norms will be called afterward anyway
+        """
+        conn = sqlite3.connect(self.db_loc, timeout=30)
+        cursor = conn.cursor()
+        self.create_table(cursor)
+        sql = 'SELECT ID, ' + ', '.join(CONTENT_COLUMNS) + ' FROM sermon_prep_database WHERE ID = ?'
+        counted = []
+        for record_id in record_ids:
+            record = cursor.execute(sql, (record_id,)).fetchone()
+            if not record:
+                continue
+
+            term_counts = {}
+            for term in tokenize(record_plain_text(record[1:])):
+                term_counts[term] = term_counts.get(term, 0) + 1
+            counted.append((record_id, term_counts))
+
+        rows = []
+        with self.lock:
+            for record_id, term_counts in counted:
+                # until the matrix has been loaded, just store the counts; their norm is computed on load
+                norm = None
+                if self.loaded:
+                    self.remove_from_memory(record_id)
+                    self.add_to_memory(record_id, term_counts)
+                    if compute_norms:
+                        norm = self.norm(term_counts)
+                        self.norms[record_id] = norm
+                rows.append((record_id, json.dumps(term_counts), norm))
+
+        cursor.executemany('INSERT OR REPLACE INTO similarity_vectors VALUES (?, ?, ?)', rows)
+        conn.commit()
+        conn.close()
+
+    def remove_records(self, record_ids):
+        """
+        Method to remove deleted records from the index.
+
+        :param list of int record_ids: The ID numbers of the records that were deleted
+        """
+        with self.lock:
+            for record_id in record_ids:
+                self.remove_from_memory(record_id)
+
+        conn = sqlite3.connect(self.db_loc, timeout=30)
+        cursor = conn.cursor()
+        self.create_table(cursor)
+        cursor.executemany('DELETE FROM similarity_vectors WHERE record_id = ?', [(i,) for i in record_ids])
+        conn.commit()
+        conn.close()
+
+    def refresh_norms(self):
+        """
+        Method to recompute and store the norm of every record's vector with the current idf values.
+        """
+        with self.lock:
+            idfs = {term: self.idf(term) for term in self.postings}
+            rows = []
+            for record_id, term_counts in self.vectors.items():
+                self.norms[record_id] = self.norm(term_counts, idfs)
+                rows.append((self.norms[record_id], record_id))
+
+        conn = sqlite3.connect(self.db_loc, timeout=30)
+        cursor = conn.cursor()
+        cursor.executemany('UPDATE similarity_vectors SET norm = ? WHERE record_id = ?', rows)
+        conn.commit()
+        conn.close()
+
+    def most_similar(self, record_id, limit=10, query_terms=50):
+        """
+        Method to find the records whose content is most similar to the given record by cosine similarity of their
+        TF-IDF vectors. Only the postings of the record's highest-weighted terms are visited, so the cost of a query
+        does not depend on the size of the database.
+
+        :param int record_id: The ID of the record to compare against
+        :param int limit: The number of results to return
+        :param int query_terms: The number of the record's highest-weighted terms to compare with
+        :return: a list of tuples of record id, similarity score, and the most important terms in common
+        """
+        if not self.loaded:
+            self.load()
+
+        with self.lock:
+            term_counts = self.vectors.get(record_id)
+            if not term_counts:
+                return []
+
+            weights = sorted(
+                ((count * self.idf(term), term) for term, count in term_counts.items()), reverse=True)[:query_terms]
+            query_norm = math.sqrt(sum(weight ** 2 for weight, term in weights))
+            if query_norm == 0:
+                return []
+
+            scores = {}
+            shared_terms = {}
+            for weight, term in weights:
+                idf = self.idf(term)
+                for other_id, count in self.postings[term].items():
+                    if other_id == record_id:
+                        continue
+                    scores[other_id] = scores.get(other_id, 0) + weight * count * idf
+                    shared_terms.setdefault(other_id, []).append(term)
+
+            results = []
+            for other_id, score in scores.items():
+                if self.norms.get(other_id):
+                    results.append((score / (query_norm * self.norms[other_id]), other_id))
+            results.sort(reverse=True)
+
+            return [(other_id, score, shared_terms[other_id][:5]) for score, other_id in results[:limit]]
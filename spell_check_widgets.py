@@ -1,10 +1,54 @@
+import html
 import re
 
-from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QAction, QTextCursor, QSyntaxHighlighter, QTextCharFormat, QTextOption
-from PyQt6.QtWidgets import QTextEdit
+from PyQt6.QtCore import Qt, QEvent
+from PyQt6.QtGui import QAction, QTextCursor, QSyntaxHighlighter, QTextCharFormat, QTextOption, QColor
+from PyQt6.QtWidgets import QTextEdit, QToolTip
 from symspellpy import Verbosity
 
+from scripture_reference import find_references, format_reference
+
+
+def reference_at(text, position):
+    """
+    Function to find the scripture reference in a block of text that the given position falls within or directly
+    follows.
+
+    :param str text: The text of the block
+    :param int position: The position within the block
+    :return: a tuple of the reference's start, end, and ranges, or None
+    """
+    for start, end, ranges in find_references(text):
+        if start <= position <= end:
+            return start, end, ranges
+    return None
+
+
+def show_reference_tip(widget, evt):
+    """
+    Function to show the passage of the scripture reference under the mouse as a tooltip.
+
+    :param QTextEdit widget: The text edit receiving the tooltip event
+    :param QHelpEvent evt: The tooltip event
+    :return: True if a passage was shown; otherwise the widget's ordinary tooltip handling should take the event
+    """
+    cursor = widget.cursorForPosition(evt.pos())
+    reference = reference_at(cursor.block().text(), cursor.positionInBlock())
+    passage = None
+    if reference and widget.gui.gs:
+        passage = widget.gui.gs.get_passage(format_reference(reference[2]))
+
+    if passage and passage != -1:
+        if len(passage) > 600:
+            passage = passage[:600].rsplit(' ', 1)[0] + '...'
+        QToolTip.showText(
+            evt.globalPos(),
+            '<b>' + format_reference(reference[2]) + '</b><br>' + html.escape(passage).replace('\n', '<br>'),
+            widget)
+        return True
+    return False
+
+
 class SpellCheckTextEdit(QTextEdit):
     """
     SpellCheckTextEdit is an implementation of QTextEdit that adds spell-checking capabilities.
@@ -30,6 +74,15 @@ class SpellCheckTextEdit(QTextEdit):
 
         self.textChanged.connect(self.text_changed)
 
+    def event(self, evt):
+        """
+        @override
+        Shows the passage of a scripture reference when the mouse rests on it.
+        """
+        if evt.type() == QEvent.Type.ToolTip and show_reference_tip(self, evt):
+            return True
+        return super().event(evt)
+
     def contextMenuEvent(self, evt):
         """
         @override
@@ -166,6 +219,27 @@ class SpellCheckTextEdit(QTextEdit):
     def text_changed(self):
         self.gui.changes = True
 
+    def expand_reference(self):
+        """
+        Method to insert the passage of the scripture reference at or just before the cursor, in quotes, after the
+        reference.
+        """
+        if not self.gui.gs:
+            return
+
+        cursor = self.textCursor()
+        reference = reference_at(cursor.block().text(), cursor.positionInBlock())
+        if not reference:
+            return
+        passage = self.gui.gs.get_passage(format_reference(reference[2]))
+        if not passage or passage == -1:
+            return
+
+        cursor.setPosition(cursor.block().position() + reference[1])
+        cursor.insertText(' "' + ' '.join(passage.split()) + '"')
+        self.setTextCursor(cursor)
+        self.gui.changes = True
+
     def replace_word(self):
         """
         Method to replace a misspelled word if the user chooses a replacement from the context menu.
@@ -229,6 +303,15 @@ class SpellCheckLineEdit(QTextEdit):
     def text_changed(self):
         self.gui.changes = True
 
+    def event(self, evt):
+        """
+        @override
+        Shows the passage of a scripture reference when the mouse rests on it.
+        """
+        if evt.type() == QEvent.Type.ToolTip and show_reference_tip(self, evt):
+            return True
+        return super().event(evt)
+
     def contextMenuEvent(self, evt):
         """
         @override
@@ -333,6 +416,10 @@ class SpellCheckHighlighter(QSyntaxHighlighter):
         self.misspell_format = QTextCharFormat()
         self.misspell_format.setUnderlineColor(Qt.GlobalColor.red)
         self.misspell_format.setUnderlineStyle(QTextCharFormat.UnderlineStyle.SpellCheckUnderline)
+        self.reference_format = QTextCharFormat()
+        self.reference_format.setForeground(QColor(30, 80, 160))
+        self.reference_format.setUnderlineColor(QColor(30, 80, 160))
+        self.reference_format.setUnderlineStyle(QTextCharFormat.UnderlineStyle.DotLine)
         self.position = 0
         self.length = 0
 
@@ -367,4 +454,8 @@ class SpellCheckHighlighter(QSyntaxHighlighter):
                         self.setFormat(start, len(cleaned_word), self.misspell_format)
                         current_pos = start + len(word)
                 else:
-                    current_pos += len(word) + 1
\ No newline at end of file
+                    current_pos += len(word) + 1
+
+        # mark scripture references last so that an abbreviated book name isn't shown as misspelled
+        for start, end, ranges in find_references(text):
+            self.setFormat(start, end - start, self.reference_format)
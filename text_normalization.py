@@ -0,0 +1,161 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+# bump this whenever the output of normalize_word changes so that the stored indexes are rebuilt
+NORMALIZATION_VERSION = 3
+
+# the various apostrophes and single quotes that word processors substitute for a plain '
+APOSTROPHES = '’‘ʼ′`´'
+WORD_PATTERN = re.compile('[^\\W_]+(?:[\'' + APOSTROPHES + '][^\\W_]+)*')
+VOWELS = 'aeiou'
+# words the suffix rules get wrong, mapped to their stems
+STEM_EXCEPTIONS = {'does': 'do', 'goes': 'go', 'news': 'news', 'series': 'series', 'species': 'species'}
+
+
+def fold(text):
+    """
+    Function to fold text into a plain lowercase form: accents are removed (i.e. "naïve" becomes "naive"), ligatures
+    and other compatibility characters are decomposed, and every kind of apostrophe becomes a plain '.
+
+    :param str text: The text to fold
+    """
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    for apostrophe in APOSTROPHES:
+        text = text.replace(apostrophe, '\'')
+    return text.lower()
+
+
+def is_consonant(word, i):
+    if word[i] in VOWELS:
+        return False
+    if word[i] == 'y':
+        return i == 0 or not is_consonant(word, i - 1)
+    return True
+
+
+def has_vowel(stem):
+    return any(not is_consonant(stem, i) for i in range(len(stem)))
+
+
+def measure(stem):
+    """
+    Function to count the vowel-consonant sequences in a stem, as defined by Porter.
+    """
+    count = 0
+    previous_vowel = False
+    for i in range(len(stem)):
+        vowel = not is_consonant(stem, i)
+        if previous_vowel and not vowel:
+            count += 1
+        previous_vowel = vowel
+    return count
+
+
+def ends_cvc(stem):
+    """
+    Function to check if a stem ends consonant-vowel-consonant where the last consonant isn't w, x, or y (i.e. "hop",
+    but not "row"), which signals that a silent e was dropped.
+    """
+    return (
+        len(stem) >= 3
+        and is_consonant(stem, len(stem) - 3)
+        and not is_consonant(stem, len(stem) - 2)
+        and is_consonant(stem, len(stem) - 1)
+        and stem[-1] not in 'wxy'
+    )
+
+
+def stem(word):
+    """
+    Function to reduce a word to its stem with the plural and verb-ending steps (1a to 1c) and the final-e step (5a)
+    of the Porter stemmer, so that i.e. "preach", "preaches", "preached", and "preaching" all become "preach", and
+    "believe", "believed", and "believing" all become "believ". Plurals are reduced to the singular rather than
+    Porter's truncated forms (so "justifies" and "justified" both become "justify"), and Porter's suffix steps (2 to
+    4) are left out; they conflate words a preacher would want kept apart.
+
+    :param str word: The folded word to stem
+    """
+    if len(word) <= 3 or not word.isalpha():
+        return word
+    if word in STEM_EXCEPTIONS:
+        return STEM_EXCEPTIONS[word]
+
+    if word.endswith(('sses', 'ches', 'shes', 'xes', 'zes')):
+        word = word[:-2]
+    elif word.endswith('ies'):
+        word = word[:-3] + ('y' if len(word) > 4 else 'ie')
+    elif word.endswith('s') and not word.endswith('ss') and not word.endswith('us') and not word.endswith('is'):
+        word = word[:-1]
+
+    # a y that became i before -ed is restored, as Porter's step 1c does, so "justified" matches "justifies"
+    if word.endswith('ied'):
+        return word[:-3] + ('y' if len(word) > 4 else 'ie')
+
+    if word.endswith('eed'):
+        if measure(word[:-3]) > 0:
+            word = word[:-1]
+    else:
+        for suffix in ('ed', 'ing'):
+            if word.endswith(suffix) and has_vowel(word[:-len(suffix)]):
+                word = word[:-len(suffix)]
+                if word.endswith(('at', 'bl', 'iz')):
+                    word += 'e'
+                elif word[-1] == word[-2] and word[-1] not in 'lsz' and is_consonant(word, len(word) - 1):
+                    word = word[:-1]
+                elif measure(word) == 1 and ends_cvc(word):
+                    word += 'e'
+                break
+
+    # a final e is dropped, as the -ed and -ing forms drop it, unless it marks a short vowel's stem (i.e. "hope")
+    if word.endswith('e'):
+        m = measure(word[:-1])
+        if m > 1 or (m == 1 and not ends_cvc(word[:-1])):
+            word = word[:-1]
+    return word
+
+
+@lru_cache(maxsize=50000)
+def normalize_word(word):
+    """
+    Function to turn a word as written into the term that is indexed and searched for. The results are cached since
+    the same few thousand words make up nearly all of a user's sermons.
+
+    :param str word: The word as it appears in the text
+    """
+    word = fold(word)
+    if word.endswith('\'s'):
+        word = word[:-2]
+    return stem(word)
+
+
+def words(text):
+    """
+    Function to find the words of a text along with their character offsets in that text.
+
+    :param str text: The text to split
+    :return: a list of tuples of the word as written, its start offset, and its end offset
+    """
+    return [(match.group(), match.start(), match.end()) for match in WORD_PATTERN.finditer(text)]
+
+
+def reset_if_stale(cursor, index_name, tables):
+    """
+    Function to clear a stored index if it was built with a different version of the normalization pipeline, so that
+    it is rebuilt with the current one.
+
+    :param sqlite3.Cursor cursor: A cursor on the user's database
+    :param str index_name: The name the index is tracked under
+    :param list of str tables: The tables holding the index's data
+    :return: True if the index was cleared
+    """
+    cursor.execute('CREATE TABLE IF NOT EXISTS index_versions (name TEXT PRIMARY KEY, version INTEGER)')
+    row = cursor.execute('SELECT version FROM index_versions WHERE name = ?', (index_name,)).fetchone()
+    if row and row[0] == NORMALIZATION_VERSION:
+        return False
+
+    for table in tables:
+        cursor.execute('DELETE FROM ' + table)
+    cursor.execute('INSERT OR REPLACE INTO index_versions VALUES (?, ?)', (index_name, NORMALIZATION_VERSION))
+    return True
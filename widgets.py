@@ -1,3 +1,4 @@
+import html
 import logging
 import os
 import re
@@ -12,11 +13,14 @@ from PyQt6.QtGui import QPixmap, QFont, QAction, QTextCursor, QIcon, QStandardIt
     QTextOption, QPainter, QTextListFormat, QTextCharFormat, QFontDatabase, QSyntaxHighlighter
 from PyQt6.QtPrintSupport import QPrinter
 from PyQt6.QtWidgets import QTextEdit, QWidget, QLabel, QProgressBar, QVBoxLayout, QHBoxLayout, QPushButton, \
-    QTableView, QMessageBox, QLineEdit, QComboBox, QFileDialog, QTabWidget, QTextBrowser, QSpinBox, QDateEdit
+    QTableView, QMessageBox, QLineEdit, QComboBox, QFileDialog, QTabWidget, QTextBrowser, QSpinBox, QDateEdit, \
+    QApplication, QCheckBox, QInputDialog, QProgressDialog
 from pynput.keyboard import Key, Controller
 from symspellpy import Verbosity
 
+from search_index import field_plain_text
 from spell_check_widgets import SpellCheckLineEdit, SpellCheckTextEdit
+from text_normalization import words
 
 
 class StartupSplash(QWidget):
@@ -275,7 +279,12 @@ class Toolbar(QWidget):
 
         :param str text: The user's search term(s)
         """
-        result_list = self.main.get_search_results(text)
+        # the search index is brought up to date on the first search, which can take a moment
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            result_list = self.main.get_search_results(text)
+        finally:
+            QApplication.restoreOverrideCursor()
         if len(result_list) == 0:
             QMessageBox.information(
                 None,
@@ -447,10 +456,35 @@ class MenuBar:
         import_action.setToolTip('Import sermons that have been saved as .docx, .odt, or .txt')
         import_action.triggered.connect(self.import_from_files)
 
-        bible_action = file_menu.addAction('Import Zefania XML Bible')
-        bible_action.setToolTip('Import a bible file saved in the Zefania XML format to use with your program')
+        records_action = file_menu.addAction('Import Sermons from CSV or JSON Lines')
+        records_action.setToolTip('Import sermons exported from another program as a .csv or .jsonl file')
+        records_action.triggered.connect(self.import_from_records)
+
+        self.watch_folder_action = file_menu.addAction('Watch a Folder for New Sermons')
+        self.watch_folder_action.setToolTip('Automatically import sermons as they are saved into a folder')
+        self.watch_folder_action.setCheckable(True)
+        if self.main.user_settings.get('watch_folder'):
+            self.watch_folder_action.setChecked(True)
+        else:
+            self.watch_folder_action.setChecked(False)
+        self.watch_folder_action.triggered.connect(self.watch_folder)
+
+        bible_action = file_menu.addAction('Import Bible')
+        bible_action.setToolTip('Import a Zefania XML, OSIS XML, or USFM bible to use with your program')
         bible_action.triggered.connect(self.import_bible)
 
+        translation_action = file_menu.addAction('Add Bible Translation')
+        translation_action.setToolTip('Import another bible to read alongside your main bible')
+        translation_action.triggered.connect(self.add_translation)
+
+        remove_translation_action = file_menu.addAction('Remove Bible Translation')
+        remove_translation_action.setToolTip('Remove one of the bible translations you have added')
+        remove_translation_action.triggered.connect(self.remove_translation)
+
+        concordance_action = file_menu.addAction('Bible Concordance')
+        concordance_action.setToolTip('Find every verse of your bible containing a word or phrase')
+        concordance_action.triggered.connect(self.show_concordance)
+
         file_menu.addSeparator()
 
         exit_action = file_menu.addAction('Exit (Ctrl-Q)')
@@ -469,6 +503,10 @@ class MenuBar:
         paste_action = edit_menu.addAction('Paste (Ctrl-V)')
         paste_action.triggered.connect(self.press_ctrl_v)
 
+        expand_action = edit_menu.addAction('Expand Scripture Reference (Ctrl-Shift-E)')
+        expand_action.setToolTip('Insert the text of the scripture reference at the cursor after the reference')
+        expand_action.triggered.connect(self.gui.expand_reference)
+
         edit_menu.addSeparator()
 
         config_menu = edit_menu.addMenu('Configure')
@@ -579,6 +617,20 @@ class MenuBar:
         del_rec_action = record_menu.addAction('Delete Current Record')
         del_rec_action.triggered.connect(self.main.del_rec)
 
+        record_menu.addSeparator()
+
+        similar_action = record_menu.addAction('Find Similar Sermons')
+        similar_action.setToolTip('Show the past sermons whose content is most like this record\'s')
+        similar_action.triggered.connect(self.find_similar)
+
+        coverage_action = record_menu.addAction('Scripture Coverage Report')
+        coverage_action.setToolTip('See how much of the bible your sermons have covered')
+        coverage_action.triggered.connect(self.show_coverage)
+
+        backfill_action = record_menu.addAction('Fill In Missing Sermon Texts')
+        backfill_action.setToolTip('Fill in the sermon text of every record that has a reference but no text')
+        backfill_action.triggered.connect(self.backfill_scripture)
+
         help_menu = menu_bar.addMenu('Help')
 
         help_action = help_menu.addAction('Help Topics')
@@ -590,6 +642,159 @@ class MenuBar:
     def print_rec(self):
         PrintHandler(self.gui)
 
+    def find_similar(self):
+        """
+        Method to show the sermons most similar in content to the current record in a new tab.
+        """
+        if self.gui.changes:
+            QMessageBox.information(
+                self.gui,
+                'Unsaved Changes',
+                'Similar sermons are found using the saved version of this record. Save your changes to include them.',
+                QMessageBox.StandardButton.Ok
+            )
+
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            result_list = self.main.get_similar_sermons()
+        finally:
+            QApplication.restoreOverrideCursor()
+
+        if len(result_list) == 0:
+            QMessageBox.information(
+                None,
+                'No Results',
+                'No similar sermons were found.',
+                QMessageBox.StandardButton.Ok
+            )
+        else:
+            similar_box = SimilarSermonsBox(self.gui)
+            self.gui.tab_widget.addTab(similar_box, QIcon('resources/svg/spSearchIcon.svg'), 'Similar')
+            similar_box.show_results(result_list)
+            self.gui.tab_widget.setCurrentWidget(similar_box)
+
+    def show_coverage(self):
+        """
+        Method to show the report of the user's scripture coverage in a new tab.
+        """
+        if self.gui.changes:
+            QMessageBox.information(
+                self.gui,
+                'Unsaved Changes',
+                'The coverage report uses the saved version of this record. Save your changes to include them.',
+                QMessageBox.StandardButton.Ok
+            )
+
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            report = self.main.coverage_index.get_report()
+        except Exception as ex:
+            self.main.write_to_log('MenuBar.show_coverage: ' + str(ex))
+            QMessageBox.warning(
+                self.gui,
+                'Coverage Error',
+                'There was a problem reading the coverage of your sermons:\n\n' + str(ex),
+                QMessageBox.StandardButton.Ok
+            )
+            return
+        finally:
+            QApplication.restoreOverrideCursor()
+
+        coverage_box = CoverageBox(self.gui)
+        self.gui.tab_widget.addTab(coverage_box, QIcon('resources/svg/spSearchIcon.svg'), 'Coverage')
+        coverage_box.show_report(report)
+        self.gui.tab_widget.setCurrentWidget(coverage_box)
+
+    def backfill_scripture(self):
+        """
+        Method to fill in, from the user's bible, the sermon text of every record that has a reference but no text.
+        """
+        if not self.main.bible_file:
+            QMessageBox.information(
+                self.gui,
+                'No Bible',
+                'A bible needs to be imported before sermon texts can be filled in. Use "Import Bible" '
+                'from the File menu to import one.',
+                QMessageBox.StandardButton.Ok
+            )
+            return
+
+        # the current record is reloaded when the backfill is done, so its changes need saving first
+        if self.gui.changes and not self.main.ask_save():
+            return
+
+        from scripture_backfill import ScriptureBackfill
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            self.gui.bible_index_thread_pool.waitForDone()
+            if not self.main.bible_index.is_current():
+                self.main.bible_index.build()
+            backfill = ScriptureBackfill(self.main)
+            records = backfill.find_records()
+        except Exception as ex:
+            self.main.write_to_log('MenuBar.backfill_scripture: ' + str(ex))
+            QMessageBox.warning(
+                self.gui,
+                'Fill In Error',
+                'There was a problem reading your bible or database:\n\n' + str(ex),
+                QMessageBox.StandardButton.Ok
+            )
+            return
+        finally:
+            QApplication.restoreOverrideCursor()
+
+        if len(records) == 0:
+            QMessageBox.information(
+                self.gui,
+                'Nothing to Fill In',
+                'Every record with a sermon reference already has its sermon text.',
+                QMessageBox.StandardButton.Ok
+            )
+            return
+
+        from runnables import BackfillScripture
+        self.backfill_dialog = QProgressDialog('Looking up sermon texts...', 'Cancel', 0, len(records), self.gui)
+        self.backfill_dialog.setWindowTitle('Fill In Missing Sermon Texts')
+        self.backfill_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        self.backfill_dialog.setAutoClose(False)
+        self.backfill_dialog.setAutoReset(False)
+        self.backfill_dialog.setMinimumDuration(0)
+
+        self.backfill_runnable = BackfillScripture(self.main, backfill, records)
+        self.backfill_runnable.signals.progress.connect(self.backfill_dialog.setValue)
+        self.backfill_runnable.signals.status.connect(self.backfill_dialog.setLabelText)
+        self.backfill_runnable.signals.finished.connect(lambda count: self.backfill_done(count, len(records)))
+        self.backfill_dialog.canceled.connect(self.backfill_runnable.cancel)
+        self.gui.bible_index_thread_pool.start(self.backfill_runnable)
+
+    def backfill_done(self, count, num_records):
+        """
+        Method called when the backfill has finished to report how it went and show the current record's new text.
+
+        :param int count: The number of records filled, -1 if the backfill failed, or -2 if it was cancelled
+        :param int num_records: The number of records that were missing their sermon text
+        """
+        self.backfill_dialog.close()
+        self.backfill_dialog.deleteLater()
+        self.backfill_runnable = None
+
+        if count == -2:
+            return
+        if count == -1:
+            QMessageBox.warning(
+                self.gui,
+                'Fill In Error',
+                'An error occurred while filling in sermon texts. No records were changed.',
+                QMessageBox.StandardButton.Ok
+            )
+            return
+
+        self.main.get_by_index(self.main.current_rec_index)
+        message = 'The sermon text of ' + str(count) + ' record(s) has been filled in.'
+        if count < num_records:
+            message += ' The references of ' + str(num_records - count) + ' record(s) could not be found in your bible.'
+        QMessageBox.information(self.gui, 'Fill In Complete', message, QMessageBox.StandardButton.Ok)
+
     def do_backup(self):
         """
         Creates a QFileDialog where the user can save a custom backup of their database
@@ -603,7 +808,6 @@ class MenuBar:
             if len(fileName[0]) == 0:
                 return
 
-            import shutil
             shutil.copy(self.main.db_loc, fileName[0])
             self.main.write_to_log('Created Backup as ' + fileName[0])
 
@@ -632,7 +836,6 @@ class MenuBar:
 
         if dialog.selectedFiles():
             db_file = dialog.selectedFiles()[0]
-            import shutil
             shutil.copy(self.main.db_loc, self.main.app_dir + '/active-database-backup.db')
             os.remove(self.main.db_loc)
             shutil.copy(db_file, self.main.db_loc)
@@ -687,79 +890,333 @@ class MenuBar:
         Method to inform user about the best format for imported file names and to begin the import by calling
         GetFromDocx.
         """
+        if self.gui.sermon_import:
+            self.gui.sermon_import.progress_dialog.show()
+            self.gui.sermon_import.progress_dialog.raise_()
+            return
+
         QMessageBox.information(
             self.gui,
             'Import from Files',
-            'For best results, the files you are importing should be named according to this syntax:\n\n'
-            'YYYY-MM-DD.book.chapter.verse-verse\n\n'
-            'For example, a sermon preached on May 20th, 2011 on Mark 3:1-12, saved as a Microsoft Word document,'
-            'would be named:\n\n'
-            '2011-05-11.mark.3.1-12.docx', QMessageBox.StandardButton.Ok)
+            'For best results, the files you are importing should be named with the sermon\'s date and scripture '
+            'reference, for example:\n\n'
+            '2011-05-11.mark.3.1-12.docx\n'
+            'Mark 3.1-12 - May 11, 2011.docx\n\n'
+            'Where the file name doesn\'t give them, the date, reference, and title are looked for in the headings '
+            'at the start of the sermon.', QMessageBox.StandardButton.Ok)
         from get_from_docx import GetFromDocx
         GetFromDocx(self.gui)
 
+    def import_from_records(self):
+        """
+        Method to begin importing sermons from a .csv or JSON Lines file by calling GetFromRecords.
+        """
+        if self.gui.sermon_import:
+            self.gui.sermon_import.progress_dialog.show()
+            self.gui.sermon_import.progress_dialog.raise_()
+            return
+
+        from get_from_records import GetFromRecords
+        GetFromRecords(self.gui)
+
+    def watch_folder(self):
+        """
+        Method to choose a folder whose new and changed sermon files are imported automatically, or to stop watching
+        it.
+        """
+        if self.watch_folder_action.isChecked():
+            folder = QFileDialog.getExistingDirectory(
+                self.gui, 'Choose a Folder to Watch', os.path.expanduser('~'), QFileDialog.Option.ShowDirsOnly)
+            if not folder:
+                self.watch_folder_action.setChecked(False)
+                return
+
+            self.main.user_settings['watch_folder'] = folder
+            self.main.save_user_settings()
+            self.gui.folder_watcher.start(folder)
+            QMessageBox.information(
+                self.gui,
+                'Watching Folder',
+                'Sermons saved into ' + folder + ' or its subfolders will be imported automatically while the '
+                'program is open, along with any saved there while it was closed. A sermon that is changed after it '
+                'was imported will have its record updated.',
+                QMessageBox.StandardButton.Ok
+            )
+        else:
+            self.main.user_settings['watch_folder'] = ''
+            self.main.save_user_settings()
+            self.gui.folder_watcher.stop()
+
     def import_bible(self):
         """
-        Method to import and save a user's xml bible for use in the program.
+        Method to import and save a user's bible (Zefania XML, OSIS XML, or USFM) for use in the program. The bible is
+        compiled in the background, and then checked for missing books, chapters, and verses.
         """
-        file = QFileDialog.getOpenFileName(
+        files = QFileDialog.getOpenFileNames(
             self.gui,
             'Choose Bible File',
             os.path.expanduser('~'),
-            'XML Bible File (*.xml)'
+            'Bible Files (*.xml *.usfm *.sfm *.ptx);;All Files (*)'
+        )[0]
+        if len(files) == 0:
+            return
+
+        from bible_formats import bible_extension, bible_files, copy_bible, detect_files_format
+        try:
+            bible_format = detect_files_format(files)
+
+            # replace the previous bible, which may have been saved in another format
+            self.gui.bible_index_thread_pool.waitForDone()
+            for file in bible_files(self.main.app_dir, 'my_bible'):
+                os.remove(file)
+            bible_file = self.main.app_dir + '/my_bible' + bible_extension(bible_format)
+            copy_bible(files, bible_file)
+            self.main.bible_file = bible_file
+            self.main.bible_index.bible_file = bible_file
+            self.main.bible_index.name = None
+        except Exception as ex:
+            self.main.write_to_log(str(ex))
+            QMessageBox.warning(
+                self.gui,
+                'Import Error',
+                'An error occurred while importing the file ' + files[0] + ':\n\n' + str(ex),
+                QMessageBox.StandardButton.Ok
+            )
+            self.remove_bible()
+            return
+
+        self.compile_bible(self.main.bible_index, lambda result: self.import_bible_done(result, files[0]))
+
+    def compile_bible(self, index, done):
+        """
+        Method to compile a bible in the background, showing its progress.
+
+        :param BibleIndex index: The index of the bible to compile
+        :param function done: Called with the validation report, or the error message, when the bible is compiled
+        """
+        from runnables import CompileBible
+        self.compile_dialog = QProgressDialog(
+            'Compiling ' + os.path.basename(index.bible_file) + '...', '', 0, 100, self.gui)
+        self.compile_dialog.setCancelButton(None)
+        self.compile_dialog.setWindowTitle('Importing Bible')
+        self.compile_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        self.compile_dialog.setMinimumDuration(0)
+
+        compile_bible = CompileBible(self.main, index)
+        compile_bible.signals.progress.connect(self.compile_dialog.setValue)
+        compile_bible.signals.finished.connect(lambda result: self.compile_done(result, done))
+        self.gui.bible_index_thread_pool.start(compile_bible)
+
+    def compile_done(self, result, done):
+        self.compile_dialog.close()
+        self.compile_dialog.deleteLater()
+        done(result)
+
+    def validation_text(self, report):
+        """
+        Method to describe a bible's validation report to the user.
+
+        :param dict report: The report from BibleIndex.validate
+        """
+        from scripture_reference import BOOKS, OLD_TESTAMENT_BOOKS
+        text = str(report['verses']) + ' verses were imported.'
+
+        missing_books = report['missing_books']
+        if missing_books == list(range(1, OLD_TESTAMENT_BOOKS + 1)):
+            text += '\n\nThis bible has only the New Testament.'
+        elif missing_books == list(range(OLD_TESTAMENT_BOOKS + 1, len(BOOKS) + 1)):
+            text += '\n\nThis bible has only the Old Testament.'
+        elif len(missing_books) > 0:
+            text += '\n\nMissing books: ' + ', '.join(BOOKS[book - 1][0] for book in missing_books)
+
+        if len(report['missing_chapters']) > 0:
+            text += '\n\nMissing chapters: ' + '; '.join(
+                BOOKS[book - 1][0] + ' ' + ', '.join(str(chapter) for chapter in chapters)
+                for book, chapters in report['missing_chapters'])
+
+        # there can be many gaps in a bible that numbers its verses unusually, so only the first few are listed
+        gaps = report['missing_verses']
+        if len(gaps) > 0:
+            text += '\n\nMissing verses: ' + '; '.join(
+                BOOKS[book - 1][0] + ' ' + str(chapter) + ':' + ', '.join(str(verse) for verse in verses)
+                for book, chapter, verses in gaps[:10])
+            if len(gaps) > 10:
+                text += ' (and gaps in ' + str(len(gaps) - 10) + ' more chapters)'
+        return text
+
+    def import_bible_done(self, result, file):
+        """
+        Method called when a newly imported bible has been compiled to report how the import went.
+
+        :param dict result: The bible's validation report, or the error message if it couldn't be compiled
+        :param str file: The file the user chose
+        """
+        if isinstance(result, str) or result['verses'] == 0:
+            QMessageBox.warning(
+                self.gui,
+                'Bad Format',
+                'There is a problem with your bible: ' + file + '. Try downloading it again or ensuring that it is '
+                'formatted according to the Zefania, OSIS, or USFM standards.'
+                + ('\n\n' + result if isinstance(result, str) else ''),
+                QMessageBox.StandardButton.Ok
+            )
+            self.remove_bible()
+            return
+
+        from get_scripture import GetScripture
+        self.gui.gs = GetScripture(self.main)
+        self.main.bible_library.indexes = None
+        self.gui.update_parallel_views(True)
+
+        QMessageBox.information(
+            self.gui,
+            'Import Complete',
+            'Bible file has been successfully imported.\n\n' + self.validation_text(result),
+            QMessageBox.StandardButton.Ok
         )
         try:
-            if file[0]:
-                shutil.copy(file[0], self.main.app_dir + '/my_bible.xml')
-                self.main.bible_file = self.main.app_dir + '/my_bible.xml'
-
-                # verify the file by attempting to get a passage from the new file
-                from get_scripture import GetScripture
-                self.gui.gs = GetScripture(self.main)
-                passage = self.gui.gs.get_passage('John 3:16')
-
-                if not passage or passage == -1 or passage == '':
-                    QMessageBox.warning(
-                        self.gui,
-                        'Bad Format',
-                        'There is a problem with your XML bible: '
-                            + file[0]
-                            + '. Try downloading it again or ensuring '
-                            'that it is formatted according to Zefania standards.',
-                        QMessageBox.StandardButton.Ok
-                    )
-
-                    # we're just not going to worry about the option to have multiple bibles
-                    if exists(self.main.app_dir + '/my_bible.xml'):
-                        os.remove(self.main.app_dir + '/my_bible.xml')
-                else:
-                    QMessageBox.information(
-                        self.gui,
-                        'Import Complete',
-                        'Bible file has been successfully imported',
-                        QMessageBox.StandardButton.Ok
-                    )
-                    try:
-                        self.gui.tab_widget.removeTab(0)
-                        self.gui.build_scripture_tab(True)
-                        self.gui.auto_fill_checkbox.setChecked(True)
-                        self.gui.set_style_sheets()
-                        self.gui.tab_widget.setCurrentIndex(0)
-                        self.main.get_by_index(self.main.current_rec_index)
-                    except Exception:
-                        logging.exception('')
+            self.gui.tab_widget.removeTab(0)
+            self.gui.build_scripture_tab(True)
+            self.gui.auto_fill_checkbox.setChecked(True)
+            self.gui.set_style_sheets()
+            self.gui.tab_widget.setCurrentIndex(0)
+            self.main.get_by_index(self.main.current_rec_index)
+        except Exception:
+            logging.exception('')
+
+    def remove_bible(self):
+        """
+        Method to remove a bible that failed to import, along with its compiled index.
+        """
+        self.main.bible_file = None
+        self.gui.gs = None
+        for file in [self.main.bible_index.bible_file, self.main.bible_index.index_loc]:
+            if exists(file):
+                os.remove(file)
+        self.main.bible_library.indexes = None
+        self.gui.update_parallel_views(True)
+
+    def add_translation(self):
+        """
+        Method to import an additional bible into the user's library of translations.
+        """
+        if not self.main.bible_file:
+            QMessageBox.information(
+                self.gui,
+                'No Bible',
+                'Import your main bible with "Import Bible" before adding other translations.',
+                QMessageBox.StandardButton.Ok
+            )
+            return
 
+        files = QFileDialog.getOpenFileNames(
+            self.gui,
+            'Choose Bible File',
+            os.path.expanduser('~'),
+            'Bible Files (*.xml *.usfm *.sfm *.ptx);;All Files (*)'
+        )[0]
+        if len(files) == 0:
+            return
+
+        try:
+            self.gui.bible_index_thread_pool.waitForDone()
+            index = self.main.bible_library.add(files)
         except Exception as ex:
-            self.main.write_to_log(str(ex))
+            self.main.write_to_log('MenuBar.add_translation: ' + str(ex))
             QMessageBox.warning(
                 self.gui,
                 'Import Error',
-                'An error occurred while importing the file ' + file[0] + ':\n\n' + str(ex),
+                'An error occurred while importing the file ' + files[0] + ':\n\n' + str(ex),
                 QMessageBox.StandardButton.Ok
             )
+            return
 
-            if exists(self.main.app_dir + '/my_bible.xml'):
-                os.remove(self.main.app_dir + '/my_bible.xml')
+        self.compile_bible(index, lambda result: self.add_translation_done(result, index, files[0]))
+
+    def add_translation_done(self, result, index, file):
+        """
+        Method called when an added translation has been compiled to report how the import went.
+
+        :param dict result: The translation's validation report, or the error message if it couldn't be compiled
+        :param BibleIndex index: The translation's index
+        :param str file: The file the user chose
+        """
+        if isinstance(result, str) or result['verses'] == 0:
+            self.main.bible_library.remove(index)
+            QMessageBox.warning(
+                self.gui,
+                'Import Error',
+                'An error occurred while importing the file ' + file + ':\n\n'
+                + (result if isinstance(result, str) else 'No verses were found in it.'),
+                QMessageBox.StandardButton.Ok
+            )
+            return
+
+        self.gui.update_parallel_views(True)
+        QMessageBox.information(
+            self.gui,
+            'Import Complete',
+            index.get_name() + ' has been added to your bible translations.\n\n' + self.validation_text(result),
+            QMessageBox.StandardButton.Ok
+        )
+
+    def remove_translation(self):
+        """
+        Method to let the user choose one of their added translations to remove from the library.
+        """
+        indexes = [index for index in self.main.bible_library.get_indexes() if index is not self.main.bible_index]
+        if len(indexes) == 0:
+            QMessageBox.information(
+                self.gui,
+                'No Translations',
+                'You have not added any bible translations besides your main bible.',
+                QMessageBox.StandardButton.Ok
+            )
+            return
+
+        names = [index.get_name() for index in indexes]
+        name, ok = QInputDialog.getItem(
+            self.gui, 'Remove Bible Translation', 'Choose the translation to remove:', names, 0, False)
+        if ok:
+            self.main.bible_library.remove(indexes[names.index(name)])
+            self.gui.update_parallel_views(True)
+
+    def show_concordance(self):
+        """
+        Method to open a new tab for searching the concordance of the user's bible.
+        """
+        if not self.main.bible_file:
+            QMessageBox.information(
+                self.gui,
+                'No Bible',
+                'A bible needs to be imported before its concordance can be searched. Use "Import Bible" '
+                'from the File menu to import one.',
+                QMessageBox.StandardButton.Ok
+            )
+            return
+
+        # the concordance may still be compiling in the background, or may never have been compiled
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            self.gui.bible_index_thread_pool.waitForDone()
+            if not self.main.bible_index.is_current():
+                self.main.bible_index.build()
+        except Exception as ex:
+            self.main.write_to_log('MenuBar.show_concordance: ' + str(ex))
+            QMessageBox.warning(
+                self.gui,
+                'Concordance Error',
+                'There was a problem compiling the concordance of your bible:\n\n' + str(ex),
+                QMessageBox.StandardButton.Ok
+            )
+            return
+        finally:
+            QApplication.restoreOverrideCursor()
+
+        concordance_box = ConcordanceBox(self.gui)
+        self.gui.tab_widget.addTab(concordance_box, QIcon('resources/svg/spSearchIcon.svg'), 'Concordance')
+        self.gui.tab_widget.setCurrentWidget(concordance_box)
+        concordance_box.search_field.setFocus()
 
     def rename_labels(self):
         """
@@ -1217,23 +1674,42 @@ class ShowHelp(QTabWidget):
             'files, or plain text .txt files.<br><br>This function has the ability to import the sermon\'s date, '
             'scripture reference, and sermon manuscript into the Sermon Prep Database. In order to do so, a little '
             'legwork is needed. It is best to copy all of your sermon files into one folder, as this will go through '
-            'all the files in the folder you choose, pulling the manuscript from each file. In order to also import '
+            'all the files in the folder you choose, pulling the manuscript from each file along with its paragraphs, '
+            'lists, and bold, italic, and underlined text. In order to also import '
             'the date and reference for each sermon, the files should be named in a particular way. The file name '
             'should start with the date in <strong>YYYY-MM-DD</strong> format folowed by a period. After the period, '
             'the scripture reference follows in the format book.chapter.verse-verse. Finally is the proper suffix '
             'for your file type (.docx, .odt, or .txt).<br><br>For example, a sermon preached on Sunday, March 19th, '
             '2025 on Mark 9:1-12, saved as a Microsoft Word document would have the file name <strong>2025-03-19.mark.'
-            '9.1-12.docx</strong>. If the file names aren\'t renamed in this way, the program can still import your '
-            'sermons, it just won\'t be able to automatically save the corresponding date and reference information '
-            'as well<br><br>Next, if you have your favorite bible downloaded as a Zefaniah XML file '
+            '9.1-12.docx</strong>. Other common ways of writing the date and reference, such as <strong>Mark 9.1-12 - '
+            'March 19, 2025.docx</strong>, are recognized too, and any other words in the file name are used as the '
+            'sermon\'s title. Where the file name doesn\'t give the date, reference, or title, they are looked for in '
+            'the headings at the start of the sermon. Failing that, the program can still import your sermons, it just '
+            'won\'t be able to automatically save the corresponding date and reference information as well.'
+            '<br><br>The import runs in the background, so you can keep working while a large folder is imported. '
+            'It can be cancelled at any time; importing the same folder again picks up where it left off, skipping '
+            'files that were already imported and flagging any sermon that is already in your database.'
+            '<br><br>Sermons kept in another program can be brought in with <strong>Import Sermons from CSV or JSON '
+            'Lines</strong>, if that program can export them as a .csv file with a header row or as a .jsonl file. '
+            'After choosing the file, you will be asked which field each of its columns should be imported into; '
+            'each row becomes a new record.'
+            '<br><br>If you keep your sermons in one folder, choose <strong>Watch a Folder for New Sermons</strong> '
+            'and the program will import each sermon you save there, or in its subfolders, without being asked. A '
+            'sermon you change after it was imported has its manuscript updated, keeping any date, reference, or '
+            'title you have filled in yourself.'
+            '<br><br>Next, if you have your favorite bible downloaded as a Zefaniah XML file '
             '(<a href="https://sourceforge.net/projects/zefania-sharp/files/Bibles/">'
-            'https://sourceforge.net/projects/zefania-sharp/files/Bibles/</a>), you can import that file '
-            'into the program by clicking <strong>Import XML Bible</strong>. This will allow the program to '
+            'https://sourceforge.net/projects/zefania-sharp/files/Bibles/</a>), an OSIS XML file, or USFM files, you '
+            'can import it into the program by clicking <strong>Import Bible</strong>. This will allow the program to '
             'automatically insert your sermon text into the "Sermon Text" area of the "Scripture" tab. This has only '
             'been tested with Zephania bible files in particular, but others may work.<br><br>'
             '<strong>Edit</strong><br>In the Edit menu, you will find the customary <strong>Cut</strong>, <strong>Copy'
             '</strong>, and <strong>Paste</strong> commands. Again, <strong>Ctrl-X</strong>, <strong>Ctrl-C</strong>, '
-            'and <strong>Ctrl-V</strong> will also perform these same functions.<br><br>In this menu you will '
+            'and <strong>Ctrl-V</strong> will also perform these same functions.<br><br>Scripture references typed '
+            'into any text box (i.e. "Rom 5:8" or "1 Cor 13:4-7") are underlined, and resting the mouse on one will '
+            'show its text from your bible. <strong>Expand Scripture Reference</strong> (<strong>Ctrl-Shift-E'
+            '</strong>) inserts the text of the reference at the cursor, in quotes, after the reference.'
+            '<br><br>In this menu you will '
             'also find a <strong>Configure</strong> menu. This contains commands to change the colors used in the '
             'program as well as what the labels say, the font that is used, and the line spacing of the editors.'
             '<br><br>First, you\'ll see a menu that lets you set the color theme of the program, or to change '
@@ -1299,7 +1775,9 @@ class ShowHelp(QTabWidget):
             'database, allowing you to see what you\'ve preached on in the past or how you\'ve dealt with particular '
             'texts.<br><br>Next to these is a search box. By entering a passage or keyword into this box and pressing '
             'Enter, you can search for scripture passages or words you\'ve used in past sermons.<br><br>To search for '
-            'phrases, use double quotes. For example, "empty tomb" or "Matthew 1:". The search will create a new tab '
+            'phrases, use double quotes. For example, "empty tomb" or "Matthew 1:". To search for words that appear '
+            'near each other, join them with NEAR and the greatest number of words that may be between them. For '
+            'example, grace NEAR/5 law. The search will create a new tab '
             'showing any records where your search term(s) appear, and double-clicking any of the results '
             'will bring up that particular sermon\'s record. The search results are sorted with exact matches first,'
             ' followed by results in order of how many search terms were found. This new tab can be closed by pressing '
@@ -1336,9 +1814,12 @@ class ShowHelp(QTabWidget):
             'can always change the headings of any of the entries on the scripture tab by selecting "Rename Labels" '
             'under the "Edit" menu.<br><br>The first box you can enter text into is the "Pericope" box. An example of '
             'what goes here would be, "Second Sunday of Easter". Below that is where you can enter the recommended '
-            'texts for that Pericope.<br><br>Next, you can enter the passage of the text you\'ll be using for your '
-            'sermon, entering the text of that passage underneath.<br><br>If you have previously imported a Zefania '
-            'XML bible file, the text of the passage you typed in will be automatically filled in. To turn this '
+            'texts for that Pericope. When you change the sermon date of a record whose pericope is empty, the day and '
+            'readings of the Revised Common Lectionary for that date are filled in for you, along with the text of the '
+            'readings if you have imported a bible.<br><br>Next, you can enter the passage of the text you\'ll be '
+            'using for your '
+            'sermon, entering the text of that passage underneath.<br><br>If you have previously imported a bible '
+            'file, the text of the passage you typed in will be automatically filled in. To turn this '
             'feature off, simply uncheck the box labeled "Auto-fill ' + self.gui.main.user_settings['label4'] + '".'
         )
         scripture_text.setFont(self.gui.standard_font)
@@ -1836,8 +2317,10 @@ class SpellCheckHighlighter(QSyntaxHighlighter):
 class ScriptureBox(QWidget):
     """
     Creates an independent QWidget that can be added or removed from layouts based on user's input.
+
+    :param GUI gui: The GUI object
     """
-    def __init__(self):
+    def __init__(self, gui):
         super().__init__()
         self.setObjectName('text_box')
         self.setMaximumWidth(300)
@@ -1846,17 +2329,126 @@ class ScriptureBox(QWidget):
         text_title = QLabel()
         text_title.setObjectName('text_title')
         text_layout.addWidget(text_title)
+
+        # with a bible imported, the sermon text can be swapped for the passage in parallel translations
+        self.view_combo = QComboBox()
+        self.view_combo.addItems(['Sermon Text', 'Parallel Translations'])
+        self.view_combo.currentIndexChanged.connect(self.change_view)
+        text_layout.addWidget(self.view_combo)
+        if not gui.main.bible_file:
+            self.view_combo.hide()
+
         self.text_edit = QTextEdit()
         self.text_edit.setObjectName('text_box_text_edit')
         self.text_edit.setReadOnly(True)
         text_layout.addWidget(self.text_edit)
+        self.parallel_box = ParallelTextBox(gui)
+        self.parallel_box.hide()
+        text_layout.addWidget(self.parallel_box)
         self.hide()
 
+    def change_view(self):
+        """
+        Method to switch between showing the sermon text and the parallel translations.
+        """
+        parallel = self.view_combo.currentIndex() == 1
+        self.text_edit.setVisible(not parallel)
+        self.parallel_box.setVisible(parallel)
+
     def clear(self):
         self.text_edit.clear()
 
 
-class SearchBox(QWidget):
+class ParallelTextBox(QWidget):
+    """
+    Creates a QWidget that shows the current sermon text reference side by side in the user's bible translations.
+    Passages are read from each translation's compiled index, so switching translations never reparses a bible.
+
+    :param GUI gui: The GUI object
+    """
+    def __init__(self, gui):
+        super().__init__()
+        self.gui = gui
+        self.reference = ''
+        self.checkboxes = []
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.setLayout(layout)
+
+        translation_widget = QWidget()
+        self.translation_layout = QHBoxLayout()
+        self.translation_layout.setContentsMargins(0, 0, 0, 0)
+        translation_widget.setLayout(self.translation_layout)
+        layout.addWidget(translation_widget)
+
+        self.text_browser = QTextBrowser()
+        layout.addWidget(self.text_browser)
+
+        self.refresh_translations()
+
+    def refresh_translations(self):
+        """
+        Method to (re)build the checkboxes used to choose which translations are shown.
+        """
+        while self.translation_layout.count() > 0:
+            item = self.translation_layout.takeAt(0)
+            if item.widget():
+                item.widget().deleteLater()
+
+        self.checkboxes = []
+        for index in self.gui.main.bible_library.get_indexes():
+            checkbox = QCheckBox(index.get_name())
+            checkbox.setChecked(True)
+            checkbox.stateChanged.connect(self.show_passage)
+            self.translation_layout.addWidget(checkbox)
+            self.checkboxes.append((checkbox, index))
+        self.translation_layout.addStretch()
+
+    def set_reference(self, reference):
+        """
+        Method to change the passage shown, which is only read while the box is visible.
+
+        :param str reference: The scripture reference
+        """
+        self.reference = reference
+        if self.isVisible():
+            self.show_passage()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.show_passage()
+
+    def show_passage(self):
+        """
+        Method to read the passage from each chosen translation and lay them out side by side.
+        """
+        indexes = [index for checkbox, index in self.checkboxes if checkbox.isChecked() and exists(index.index_loc)]
+        if not self.gui.gs:
+            from get_scripture import GetScripture
+            self.gui.gs = GetScripture(self.gui.main)
+
+        table = self.gui.gs.get_parallel(self.reference, indexes)
+        if table == -1:
+            self.text_browser.clear()
+        else:
+            self.text_browser.setHtml(table)
+
+
+class TabBox(QWidget):
+    """
+    Base class of the independent QWidgets that are added to the main tabbed widget and can be closed by the user.
+    """
+    def remove_self(self):
+        """
+        Method to remove this widget's tab from the GUI's tabbed widget.
+        """
+        self.gui.tab_widget.removeTab(self.gui.tab_widget.indexOf(self))
+        self.gui.tab_widget.setCurrentWidget(self.gui.tab_widget.widget(0))
+        self.destroy()
+
+
+class SearchBox(TabBox):
     """
     Creates an independent QWidget to be added to the main tabbed widget when the user performs a search.
 
@@ -1909,7 +2501,7 @@ class SearchBox(QWidget):
                 line[0][3],
                 line[0][16],
                 line[0][17],
-                line[0][21][0:100] + '...'))
+                self.get_snippet(line)))
 
         model = QStandardItemModel(len(filtered_results), 5)
         for i in range(len(filtered_results)):
@@ -1947,6 +2539,22 @@ class SearchBox(QWidget):
             results_label.setText(str(len(
                 filtered_results)) + ' results found.\nDouble-click a result below to open it.')
 
+    def get_snippet(self, line):
+        """
+        Method to get the text surrounding the first match of a search result, or the beginning of the manuscript if
+        the result has no match positions.
+
+        :param list line: One search result from Main.get_search_results
+        """
+        if len(line) > 3 and len(line[3]) > 0:
+            column, start, end = line[3][0]
+            text = field_plain_text(line[0][column])
+            snippet = text[max(start - 40, 0):end + 60].replace('\n', ' ')
+            if start > 40:
+                snippet = '...' + snippet
+            return snippet + '...'
+        return line[0][21][0:100] + '...'
+
     def retrieve_selection(self, model, selection):
         """
         Method to pull up whichever record the user selects
@@ -1968,13 +2576,279 @@ class SearchBox(QWidget):
             self.gui.main.get_by_index(index)
             self.gui.tab_widget.setCurrentWidget(self.gui.tab_widget.widget(0))
 
-    def remove_self(self):
+
+class SimilarSermonsBox(SearchBox):
+    """
+    Creates an independent QWidget to be added to the main tabbed widget that shows the sermons most similar to the
+    current record.
+
+    :param GUI gui: The GUI object
+    """
+    def show_results(self, result_list):
         """
-        Method to remove this widget's tab from the GUI's tabbed widget.
+        Method to build the results widget.
+
+        :param list result_list: The list of [record, similarity score, shared terms] lists from get_similar_sermons
         """
-        self.gui.tab_widget.removeTab(5)
-        self.gui.tab_widget.setCurrentWidget(self.gui.tab_widget.widget(0))
-        self.destroy()
+        results_widget_layout = QVBoxLayout()
+        self.setLayout(results_widget_layout)
+
+        results_header = QWidget()
+        header_layout = QHBoxLayout()
+        results_header.setLayout(header_layout)
+
+        results_label = QLabel('Sermons most similar to this record.\nDouble-click a result below to open it.')
+        header_layout.addWidget(results_label)
+
+        close_button = QPushButton()
+        close_button.setIcon(QIcon('resources/svg/spCloseIconDark.svg'))
+        close_button.setToolTip('Close this tab')
+        close_button.pressed.connect(self.remove_self)
+        header_layout.addStretch()
+        header_layout.addWidget(close_button)
+
+        results_widget_layout.addWidget(results_header)
+
+        model = QStandardItemModel(len(result_list), 7)
+        for i in range(len(result_list)):
+            record, score, shared_terms = result_list[i]
+            manuscript = re.sub('<.*?>', '', str(record[21]))
+            values = (
+                str(record[0]),
+                str(round(score * 100)) + '%',
+                ', '.join(shared_terms),
+                record[3],
+                record[16],
+                record[17],
+                manuscript[0:100] + '...'
+            )
+            for n in range(len(values)):
+                item = QStandardItem(values[n])
+                item.setEditable(False)
+                model.setItem(i, n, item)
+        model.setHeaderData(0, Qt.Orientation.Horizontal, 'ID')
+        model.setHeaderData(1, Qt.Orientation.Horizontal, 'Similarity')
+        model.setHeaderData(2, Qt.Orientation.Horizontal, 'Shared Terms')
+        model.setHeaderData(3, Qt.Orientation.Horizontal, 'Sermon Text')
+        model.setHeaderData(4, Qt.Orientation.Horizontal, 'Sermon Title')
+        model.setHeaderData(5, Qt.Orientation.Horizontal, 'Sermon Date')
+        model.setHeaderData(6, Qt.Orientation.Horizontal, 'Sermon Snippet')
+
+        results_table_view = QTableView()
+        results_table_view.setModel(model)
+        results_table_view.setColumnWidth(0, 30)
+        results_table_view.setColumnWidth(1, 70)
+        results_table_view.setColumnWidth(2, 200)
+        results_table_view.setColumnWidth(3, 200)
+        results_table_view.setColumnWidth(4, 200)
+        results_table_view.setColumnWidth(5, 100)
+        results_table_view.setColumnWidth(6, 500)
+        results_table_view.setShowGrid(False)
+        results_table_view.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        results_table_view.doubleClicked.connect(
+            lambda: self.retrieve_selection(model, results_table_view.selectionModel().currentIndex().row()))
+        results_widget_layout.addWidget(results_table_view)
+
+
+class ConcordanceBox(TabBox):
+    """
+    Creates an independent QWidget to be added to the main tabbed widget that lists every verse of the user's bible
+    containing a word or phrase.
+
+    :param GUI gui: The GUI object
+    """
+    max_shown = 500
+
+    def __init__(self, gui):
+        self.gui = gui
+        super().__init__()
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        header = QWidget()
+        header_layout = QHBoxLayout()
+        header.setLayout(header_layout)
+
+        self.search_field = QLineEdit()
+        self.search_field.setPlaceholderText('Word or phrase')
+        self.search_field.returnPressed.connect(self.do_search)
+        header_layout.addWidget(self.search_field)
+
+        search_button = QPushButton('Search')
+        search_button.pressed.connect(self.do_search)
+        header_layout.addWidget(search_button)
+
+        close_button = QPushButton()
+        close_button.setIcon(QIcon('resources/svg/spCloseIconDark.svg'))
+        close_button.setToolTip('Close the concordance tab')
+        close_button.pressed.connect(self.remove_self)
+        header_layout.addStretch()
+        header_layout.addWidget(close_button)
+        layout.addWidget(header)
+
+        self.results_label = QLabel()
+        layout.addWidget(self.results_label)
+
+        self.results_browser = QTextBrowser()
+        layout.addWidget(self.results_browser)
+
+    def do_search(self):
+        """
+        Method to look up the user's word or phrase in the concordance and list the verses, with the matching words
+        in bold.
+        """
+        text = self.search_field.text().strip()
+        if len(text) == 0:
+            return
+
+        try:
+            num_found, results = self.gui.main.bible_index.search(text, self.max_shown)
+        except Exception as ex:
+            self.gui.main.write_to_log('ConcordanceBox.do_search: ' + str(ex))
+            self.results_label.setText('There was a problem searching the concordance: ' + str(ex))
+            return
+
+        if num_found == 1:
+            self.results_label.setText('1 verse found.')
+        elif num_found > self.max_shown:
+            self.results_label.setText(
+                str(num_found) + ' verses found. Showing the first ' + str(self.max_shown) + '.')
+        else:
+            self.results_label.setText(str(num_found) + ' verses found.')
+
+        result_html = []
+        for reference, verse_text, positions in results:
+            # rebuild the verse, bolding the words at the matched positions
+            verse_html = ''
+            last_end = 0
+            verse_words = words(verse_text)
+            for i in range(len(verse_words)):
+                word, start, end = verse_words[i]
+                if i in positions:
+                    verse_html += html.escape(verse_text[last_end:start]) + '<b>' + html.escape(word) + '</b>'
+                    last_end = end
+            verse_html += html.escape(verse_text[last_end:])
+            result_html.append('<p><b>' + html.escape(reference) + '</b> ' + verse_html + '</p>')
+        self.results_browser.setHtml(''.join(result_html))
+
+
+class CoverageBox(TabBox):
+    """
+    Creates an independent QWidget to be added to the main tabbed widget that reports how much of the canon the user
+    has preached on, read from the summaries kept by CoverageIndex.
+
+    :param GUI gui: The GUI object
+    """
+    # shades of the heatmap, from a chapter preached on once to one preached on often
+    heat_colors = ['#d6e9f8', '#a9cfee', '#6fa8dc', '#3d85c6', '#1c4587']
+
+    def __init__(self, gui):
+        self.gui = gui
+        super().__init__()
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        header = QWidget()
+        header_layout = QHBoxLayout()
+        header.setLayout(header_layout)
+
+        header_layout.addWidget(QLabel('Scripture coverage of your sermons, by chapter and book.'))
+
+        close_button = QPushButton()
+        close_button.setIcon(QIcon('resources/svg/spCloseIconDark.svg'))
+        close_button.setToolTip('Close this tab')
+        close_button.pressed.connect(self.remove_self)
+        header_layout.addStretch()
+        header_layout.addWidget(close_button)
+        layout.addWidget(header)
+
+        self.report_browser = QTextBrowser()
+        layout.addWidget(self.report_browser)
+
+    def show_report(self, report):
+        """
+        Method to lay out the coverage report.
+
+        :param dict report: The report from CoverageIndex.get_report
+        """
+        from scripture_reference import BOOKS, CHAPTER_COUNTS, OLD_TESTAMENT_BOOKS
+
+        books = report['books']
+        chapters_preached = sum(book[2] for book in books)
+        old_chapters = sum(book[2] for book in books[:OLD_TESTAMENT_BOOKS])
+        new_chapters = chapters_preached - old_chapters
+        old_total = sum(CHAPTER_COUNTS[:OLD_TESTAMENT_BOOKS])
+        new_total = sum(CHAPTER_COUNTS) - old_total
+        old_sermons, new_sermons = report['testaments']
+
+        parts = ['<h2>Coverage</h2>']
+        parts.append(
+            '<p>' + str(chapters_preached) + ' of ' + str(sum(CHAPTER_COUNTS)) + ' chapters preached ('
+            + self.percent(chapters_preached, sum(CHAPTER_COUNTS)) + ').</p>')
+        parts.append(
+            '<p>Old Testament: ' + str(old_sermons) + ' sermons, ' + str(old_chapters) + ' of ' + str(old_total)
+            + ' chapters (' + self.percent(old_chapters, old_total) + ')<br>New Testament: ' + str(new_sermons)
+            + ' sermons, ' + str(new_chapters) + ' of ' + str(new_total) + ' chapters ('
+            + self.percent(new_chapters, new_total) + ')</p>')
+
+        parts.append('<h2>Sermons per Year</h2>')
+        if len(report['years']) == 0:
+            parts.append('<p>None of your sermons are dated.</p>')
+        else:
+            most = max(sermons for year, sermons in report['years'])
+            parts.append('<table cellpadding="2">')
+            for year, sermons in report['years']:
+                parts.append(
+                    '<tr><td>' + str(year) + '</td><td><table cellspacing="0"><tr><td bgcolor="' + self.heat_colors[3]
+                    + '" width="' + str(max(1, round(400 * sermons / most))) + '"></td></tr></table></td><td>'
+                    + str(sermons) + '</td></tr>')
+            parts.append('</table>')
+
+        parts.append('<h2>Longest Untouched Books</h2><table cellpadding="2">')
+        for book, sermons, num_preached, num_chapters, last_date in report['untouched'][:10]:
+            parts.append(
+                '<tr><td>' + html.escape(BOOKS[book - 1][0]) + '</td><td>'
+                + ('last preached ' + html.escape(last_date) if last_date else 'never preached') + '</td></tr>')
+        parts.append('</table>')
+
+        parts.append('<h2>Books and Chapters</h2><table cellpadding="2">')
+        for book, sermons, num_preached, num_chapters, last_date in books:
+            parts.append(
+                '<tr><td valign="top"><b>' + html.escape(BOOKS[book - 1][0]) + '</b><br>' + str(sermons)
+                + ' sermons, ' + str(num_preached) + '/' + str(num_chapters) + ' chapters</td><td valign="top">'
+                + self.chapter_heatmap(book, num_chapters, report['chapters']) + '</td></tr>')
+        parts.append('</table>')
+
+        self.report_browser.setHtml(''.join(parts))
+
+    def chapter_heatmap(self, book, num_chapters, chapters):
+        """
+        Method to lay out a book's chapters as a grid of cells shaded by how often each was preached on.
+
+        :param int book: The book's number
+        :param int num_chapters: The number of chapters in the book
+        :param dict chapters: The report's (book, chapter) -> (sermons, last date) summaries
+        """
+        cells = ['<table cellspacing="1" cellpadding="2"><tr>']
+        for chapter in range(1, num_chapters + 1):
+            sermons = chapters.get((book, chapter), (0, None))[0]
+            if sermons == 0:
+                color = '#f3f3f3'
+            else:
+                color = self.heat_colors[min(sermons, len(self.heat_colors)) - 1]
+            text_color = '#ffffff' if sermons >= 3 else '#000000'
+            cells.append(
+                '<td bgcolor="' + color + '" align="center" width="24"><font size="2" color="' + text_color + '">'
+                + str(chapter) + '</font></td>')
+            if chapter % 25 == 0 and chapter < num_chapters:
+                cells.append('</tr><tr>')
+        cells.append('</tr></table>')
+        return ''.join(cells)
+
+    def percent(self, part, whole):
+        return str(round(100 * part / whole)) + '%' if whole else '0%'
 
 
 class SermonView(QWidget):